@@ -0,0 +1,99 @@
+"""Import-time benchmark for the non-UI modules of both apps.
+
+Each module is imported in a fresh interpreter, several times, and the best
+time is compared against a budget. The script also fails if a module pulls
+in one of the heavy UI/client dependencies at import time, which is the
+regression that actually slows worker startup.
+
+    python benchmarks/import_time.py [--repeat 5] [--budget-ms 100]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (app directory, module) pairs that must import quickly
+CORE_MODULES = [
+    ('sentiment-analysis-app', 'classifier'),
+    ('sentiment-analysis-app', 'cli'),
+    ('sentiment-analysis-app', 'bulk'),
+    ('sentiment-analysis-app', 'cache'),
+    ('sentiment-analysis-app', 'client'),
+    ('sentiment-analysis-app', 'constraints'),
+    ('sentiment-analysis-app', 'prompts'),
+    ('sentiment-analysis-app', 'rate_limit'),
+    ('sentiment-analysis-app', 'resilience'),
+    ('sentiment-analysis-app', 'metrics'),
+    ('sentiment-analysis-app', 'history'),
+    ('sentiment-analysis-app', 'compare'),
+    ('sentiment-analysis-app', 'semantic_cache'),
+    ('sentiment-analysis-app', 'polarity'),
+    ('sentiment-analysis-app', 'dedup'),
+    ('sentiment-analysis-app', 'chunking'),
+    ('sentiment-analysis-app', 'batch_job'),
+    ('chat-gpt-clone', 'app'),
+    ('chat-gpt-clone', 'context'),
+    ('chat-gpt-clone', 'render'),
+    ('chat-gpt-clone', 'cache'),
+    ('chat-gpt-clone', 'client'),
+    ('chat-gpt-clone', 'resilience'),
+    ('chat-gpt-clone', 'metrics'),
+    ('chat-gpt-clone', 'store'),
+    ('chat-gpt-clone', 'compare'),
+    ('chat-gpt-clone', 'engine'),
+]
+
+# Modules that may only be imported lazily, on first use
+HEAVY_MODULES = ['streamlit', 'pandas', 'numpy', 'openai', 'httpx', 'pyarrow', 'tiktoken']
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def measure(app_dir, module, repeat):
+    best = None
+    heavy = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=os.path.join(ROOT, app_dir),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        best = result['seconds'] if best is None else min(best, result['seconds'])
+        heavy = result['heavy']
+    return best, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=100.0)
+    args = parser.parse_args()
+
+    failures = 0
+    for app_dir, module in CORE_MODULES:
+        seconds, heavy = measure(app_dir, module, args.repeat)
+        status = 'ok'
+        if heavy:
+            status = f"FAIL imports {', '.join(heavy)}"
+        elif seconds * 1000 > args.budget_ms:
+            status = f"FAIL over {args.budget_ms:.0f} ms budget"
+        failures += status != 'ok'
+        print(f"{app_dir + '/' + module:<40} {seconds * 1000:8.1f} ms  {status}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
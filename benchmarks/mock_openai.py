@@ -0,0 +1,368 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Speaks enough of ``POST /v1/chat/completions`` for both apps: plain and
+streamed (SSE) responses, usage, logprobs for constrained classification
+and the numbered batch format. ``POST /v1/embeddings`` returns
+bag-of-words vectors, so texts sharing words are similar. The Files and
+Batches endpoints accept a batch input file and complete it in the
+background after ``--batch-seconds``, answering each line like a chat
+completion (injected errors become failed lines). Latency and errors can be injected, so the
+request paths can be measured and exercised on a machine with no network.
+
+    python benchmarks/mock_openai.py --port 8000 --latency-ms 200 --error-rate 0.05
+    OPENAI_API_KEY=sk-mock OPENAI_BASE_URL=http://127.0.0.1:8000/v1 streamlit run chat-gpt-clone/streamlit_app.py
+
+Answers are deterministic: a classification picks the label from the
+``Emotions:`` line of the system prompt by hashing the text, and a chat
+reply is filler text sized from ``max_tokens``.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = ('the quick brown fox jumps over the lazy dog while a mock server '
+          'streams tokens at a steady pace for benchmarking purposes').split()
+
+# Longest chat reply in words, whatever max_tokens says
+MAX_REPLY_WORDS = 60
+
+EMBEDDING_DIMENSIONS = 64
+
+BATCH_LINE = re.compile(r'^\s*(\d+)\s*:\s*(.*)$')
+
+
+def _stable_hash(text):
+    return int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def _labels(messages):
+    # The emotion set is the last line of the sentiment system prompts
+    for message in messages:
+        if message.get('role') == 'system':
+            for line in reversed((message.get('content') or '').splitlines()):
+                if line.startswith('Emotions:'):
+                    return [label.strip() for label in line[len('Emotions:'):].split(',') if label.strip()]
+    return []
+
+
+def _is_batch(messages):
+    # Batched classification prompts ask for one numbered line per text
+    return any('numbered text' in (m.get('content') or '') for m in messages if m.get('role') == 'system')
+
+
+def _answer(messages, max_tokens):
+    labels = _labels(messages)
+    user = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+    if labels:
+        lines = [BATCH_LINE.match(line) for line in user.splitlines()]
+        if _is_batch(messages) and lines and all(lines):
+            # Numbered batch request, even of one text: one "<number>: <label>" line per text
+            return '\n'.join(f"{m.group(1)}: {labels[_stable_hash(m.group(2)) % len(labels)]}" for m in lines), labels
+        return labels[_stable_hash(user) % len(labels)], labels
+    words = min(MAX_REPLY_WORDS, max(1, (max_tokens or 16) // 2))
+    return ' '.join(FILLER[i % len(FILLER)] for i in range(words)), labels
+
+
+def _embedding(text):
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in re.findall(r"[a-z0-9']+", text.lower()):
+        vector[_stable_hash(word) % EMBEDDING_DIMENSIONS] += 1.0
+    return vector
+
+
+def _logprobs(answer, labels):
+    # First token is the whole answer; the other labels share the remaining mass
+    others = [label for label in labels if label != answer][:19]
+    top = [{'token': answer, 'logprob': -0.05, 'bytes': None}]
+    top += [{'token': label, 'logprob': -3.0 - i, 'bytes': None} for i, label in enumerate(others)]
+    return {'content': [{'token': answer, 'logprob': -0.05, 'bytes': None, 'top_logprobs': top}]}
+
+
+def _completion(body):
+    # Non-streamed chat completion payload for a request body
+    messages = body.get('messages') or []
+    answer, labels = _answer(messages, body.get('max_tokens'))
+    prompt_tokens = sum(len(m.get('content') or '') for m in messages) // 4 + 1
+    choice = {'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}
+    if body.get('logprobs'):
+        choice['logprobs'] = _logprobs(answer, labels)
+    completion_tokens = len(answer.split())
+    return {
+        'id': 'chatcmpl-mock',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'mock'),
+        'choices': [choice],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': 0}
+        }
+    }
+
+
+def _multipart_fields(content_type, data):
+    # {name: (filename, bytes)} from a multipart/form-data body
+    message = BytesParser(policy=default_policy).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + data)
+    return {part.get_param('name', header='content-disposition'): (part.get_filename(), part.get_payload(decode=True))
+            for part in message.iter_parts()}
+
+
+class MockConfig:
+    """Injected behaviour and stored files/batches, shared by all handler threads."""
+
+    def __init__(self, latency_ms=50.0, jitter_ms=0.0, token_delay_ms=5.0, error_rate=0.0,
+                 error_status=500, batch_seconds=2.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_delay_ms = token_delay_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.batch_seconds = batch_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.files = {}
+        self.batches = {}
+
+    def draw(self):
+        # (latency in seconds, inject an error?) for one request
+        with self.lock:
+            self.requests += 1
+            latency = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+        return latency / 1000, failed
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+    config = MockConfig()
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].rstrip('/').split('/')
+        with self.config.lock:
+            if len(parts) >= 2 and parts[-2] == 'batches' and parts[-1] in self.config.batches:
+                return self._json(200, self.config.batches[parts[-1]])
+            if len(parts) >= 3 and parts[-1] == 'content' and parts[-3] == 'files' and parts[-2] in self.config.files:
+                return self._raw(200, self.config.files[parts[-2]]['content'], 'application/octet-stream')
+        self._not_found()
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        path = self.path.rstrip('/')
+        if path.endswith('/files'):
+            return self._upload(data)
+        body = json.loads(data or b'{}')
+        if path.endswith('/batches'):
+            return self._create_batch(body)
+        if not path.endswith(('/chat/completions', '/embeddings')):
+            return self._not_found()
+
+        latency, failed = self.config.draw()
+        time.sleep(latency)
+        if failed:
+            status = self.config.error_status
+            return self._json(status, {'error': {'message': 'Injected failure', 'type': 'server_error', 'code': status}})
+
+        if path.endswith('/embeddings'):
+            return self._embeddings(body)
+
+        if body.get('stream'):
+            return self._stream(body, _answer(body.get('messages') or [], body.get('max_tokens'))[0])
+        self._json(200, _completion(body))
+
+    def _store_file(self, filename, content, purpose):
+        with self.config.lock:
+            file_id = f"file-mock{len(self.config.files) + 1}"
+            self.config.files[file_id] = {
+                'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                'filename': filename, 'purpose': purpose, 'status': 'processed', 'content': content
+            }
+            return {key: value for key, value in self.config.files[file_id].items() if key != 'content'}
+
+    def _upload(self, data):
+        fields = _multipart_fields(self.headers.get('Content-Type', ''), data)
+        filename, content = fields.get('file', (None, None))
+        if content is None:
+            return self._json(400, {'error': {'message': 'Missing file', 'type': 'invalid_request_error'}})
+        purpose = fields.get('purpose', (None, b''))[1].decode('utf-8')
+        self._json(200, self._store_file(filename or 'upload.jsonl', content, purpose))
+
+    def _create_batch(self, body):
+        with self.config.lock:
+            source = self.config.files.get(body.get('input_file_id'))
+            if source is None:
+                return self._json(404, {'error': {'message': 'No such file', 'type': 'invalid_request_error'}})
+            batch_id = f"batch_mock{len(self.config.batches) + 1}"
+            lines = [json.loads(line) for line in source['content'].decode('utf-8').splitlines() if line.strip()]
+            batch = {
+                'id': batch_id, 'object': 'batch', 'endpoint': body.get('endpoint'), 'errors': None,
+                'input_file_id': source['id'], 'completion_window': body.get('completion_window', '24h'),
+                'status': 'in_progress', 'output_file_id': None, 'error_file_id': None,
+                'created_at': int(time.time()), 'in_progress_at': int(time.time()), 'completed_at': None,
+                'request_counts': {'total': len(lines), 'completed': 0, 'failed': 0},
+                'metadata': body.get('metadata')
+            }
+            self.config.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch, lines), daemon=True).start()
+        self._json(200, batch)
+
+    def _run_batch(self, batch, lines):
+        # Answer every line after the configured delay, like the real API's completion window
+        time.sleep(self.config.batch_seconds)
+        outputs, errors = [], []
+        for line in lines:
+            _, failed = self.config.draw()
+            if failed:
+                status = self.config.error_status
+                errors.append({'id': f"batch_req_{line['custom_id']}", 'custom_id': line['custom_id'],
+                               'response': {'status_code': status, 'request_id': '', 'body': {
+                                   'error': {'message': 'Injected failure', 'type': 'server_error'}}},
+                               'error': None})
+            else:
+                outputs.append({'id': f"batch_req_{line['custom_id']}", 'custom_id': line['custom_id'],
+                                'response': {'status_code': 200, 'request_id': '', 'body': _completion(line['body'])},
+                                'error': None})
+        encode = lambda rows: ''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8')
+        output_file = self._store_file(f"{batch['id']}_output.jsonl", encode(outputs), 'batch_output')
+        error_file = self._store_file(f"{batch['id']}_errors.jsonl", encode(errors), 'batch_output') if errors else None
+        with self.config.lock:
+            batch.update(status='completed', completed_at=int(time.time()), output_file_id=output_file['id'],
+                         error_file_id=error_file['id'] if error_file else None,
+                         request_counts={'total': len(lines), 'completed': len(outputs), 'failed': len(errors)})
+
+    def _embeddings(self, body):
+        texts = body.get('input') or []
+        texts = [texts] if isinstance(texts, str) else texts
+        tokens = sum(len(text) for text in texts) // 4 + 1
+        # The openai client asks for base64 (little-endian float32) unless told otherwise
+        encode = ((lambda vector: base64.b64encode(struct.pack(f'<{len(vector)}f', *vector)).decode('ascii'))
+                  if body.get('encoding_format') == 'base64' else (lambda vector: vector))
+        self._json(200, {
+            'object': 'list',
+            'data': [{'object': 'embedding', 'index': i, 'embedding': encode(_embedding(text))}
+                     for i, text in enumerate(texts)],
+            'model': body.get('model', 'mock'),
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+        })
+
+    def _stream(self, body, answer):
+        # No Content-Length, so the connection closes when the stream ends
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        words = answer.split(' ')
+        try:
+            for i, word in enumerate(words):
+                self._event({'index': 0, 'delta': {'content': word if i == 0 else ' ' + word}, 'finish_reason': None},
+                            body)
+                time.sleep(self.config.token_delay_ms / 1000)
+            self._event({'index': 0, 'delta': {}, 'finish_reason': 'stop'}, body)
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early (e.g. a cancelled reply)
+            pass
+
+    def _event(self, choice, body):
+        chunk = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                 'model': body.get('model', 'mock'), 'choices': [choice]}
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def _json(self, status, payload):
+        self._raw(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _raw(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self):
+        self._json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer:
+    """Run the mock API in a background thread; ``base_url`` is ready for OPENAI_BASE_URL."""
+
+    def __init__(self, host='127.0.0.1', port=0, **config):
+        handler = type('ConfiguredMockHandler', (MockHandler,), {'config': MockConfig(**config)})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.config = handler.config
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Delay before each response')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Extra random delay, uniform in [0, jitter]')
+    parser.add_argument('--token-delay-ms', type=float, default=5.0, help='Delay between streamed chunks')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=500, help='Status code of injected failures (e.g. 429)')
+    parser.add_argument('--batch-seconds', type=float, default=2.0, help='Time a submitted batch takes to complete')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = MockServer(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                        token_delay_ms=args.token_delay_ms, error_rate=args.error_rate,
+                        error_status=args.error_status, batch_seconds=args.batch_seconds, seed=args.seed)
+    print(f"Mock OpenAI API on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
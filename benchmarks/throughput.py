@@ -0,0 +1,272 @@
+"""Throughput and latency benchmark for both apps against the mock API.
+
+Starts ``mock_openai.MockServer`` in-process, then drives the real request
+paths of each app at several concurrency levels and reports throughput and
+latency percentiles. No API key or network is needed.
+
+    python benchmarks/throughput.py [--concurrency 1,4,16] [--requests 100] [--latency-ms 50]
+    python benchmarks/throughput.py --save baseline.json
+    python benchmarks/throughput.py --baseline baseline.json --tolerance 0.25
+
+Scenarios:
+    sentiment  classify             gpt_classify_sentiment, one call per text
+               classify_constrained classify_with_confidence (logit bias + logprobs)
+               classify_concurrent  classify_concurrent with ``workers`` = concurrency
+               classify_batch       classify_batch, 20 texts per request
+    chat       chat                 gpt_chat, i.e. Conversation.send on the chat engine
+               chat_stream          Conversation.stream, the streaming path of both frontends
+               chat_async           ``concurrency`` conversations awaited together on the
+                                    engine loop, without a thread per request
+
+Each app runs in its own interpreter because both have modules with the same
+names (cache, client, metrics, resilience). With ``--baseline`` the run
+fails if throughput drops or p95 latency grows by more than ``--tolerance``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from mock_openai import MockServer
+
+APPS = {
+    'sentiment': 'sentiment-analysis-app',
+    'chat': 'chat-gpt-clone',
+}
+
+SCENARIOS = {
+    'sentiment': ['classify', 'classify_constrained', 'classify_concurrent', 'classify_batch'],
+    'chat': ['chat', 'chat_stream', 'chat_async'],
+}
+
+EMOTIONS = 'Happy, Sad, Angry, Surprised, Neutral'
+
+
+def _summary(latencies_ms, percentile):
+    ordered = sorted(latencies_ms)
+    return {q: percentile(ordered, int(q[1:])) for q in ('p50', 'p95', 'p99')}
+
+
+def _drive(call, items, concurrency):
+    # Run call(item) for every item with ``concurrency`` threads; return (latencies, errors)
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            ok = call(item)
+        except Exception:
+            ok = False
+        return (time.perf_counter() - started) * 1000, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, items))
+    return [latency for latency, _ in results], sum(not ok for _, ok in results)
+
+
+def run_worker(app, scenarios, levels, requests):
+    """Runs inside the app directory; prints one JSON list of results."""
+    sys.path.insert(0, os.getcwd())
+    from metrics import metrics, percentile
+    from resilience import default_breaker
+
+    # One untimed request first, so importing openai and building the client is not measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        _run_scenario(app, scenarios[0], ['warm-up request'], 1)
+
+    results = []
+    for scenario in scenarios:
+        for concurrency in levels:
+            default_breaker.record_success()
+            texts = [f"benchmark {scenario} c{concurrency} #{i}: what a day it has been" for i in range(requests)]
+            first_record = len(metrics.records)
+            started = time.perf_counter()
+            # Replies streamed or printed by the app code are not part of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                latencies, errors, units = _run_scenario(app, scenario, texts, concurrency)
+            seconds = time.perf_counter() - started
+
+            records = list(metrics.records)[first_record:]
+            if latencies is None:
+                # The function schedules its own requests; use the per-request metrics
+                latencies = [r['latency_ms'] for r in records if not r.get('cache_hit')]
+            ttft = [r['ttft_ms'] for r in records if 'ttft_ms' in r]
+            result = {
+                'app': app,
+                'scenario': scenario,
+                'concurrency': concurrency,
+                'items': units,
+                'requests': len(latencies),
+                'errors': errors,
+                'retries': sum(r.get('retries', 0) for r in records),
+                'seconds': seconds,
+                'throughput': units / seconds if seconds else 0.0,
+                **_summary(latencies, percentile)
+            }
+            if ttft:
+                result['ttft_p50'] = _summary(ttft, percentile)['p50']
+            results.append(result)
+    print(json.dumps(results))
+
+
+def _run_scenario(app, scenario, texts, concurrency):
+    # Returns (per-call latencies or None, error count, items processed)
+    if app == 'sentiment':
+        from classifier import classify_batch, classify_concurrent, classify_with_confidence, gpt_classify_sentiment
+
+        if scenario == 'classify':
+            latencies, errors = _drive(lambda text: gpt_classify_sentiment(text, EMOTIONS) != 'N/A', texts, concurrency)
+            return latencies, errors, len(texts)
+        if scenario == 'classify_constrained':
+            latencies, errors = _drive(lambda text: classify_with_confidence(text, EMOTIONS)[0] != 'N/A',
+                                       texts, concurrency)
+            return latencies, errors, len(texts)
+        if scenario == 'classify_concurrent':
+            labels = classify_concurrent(texts, EMOTIONS, workers=concurrency)
+            return None, labels.count('N/A'), len(texts)
+        if scenario == 'classify_batch':
+            # Batches run sequentially inside classify_batch; concurrency splits the texts across callers
+            shards = [texts[i::concurrency] for i in range(concurrency)]
+            labels = []
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for shard_labels in pool.map(lambda shard: classify_batch(shard, EMOTIONS, batch_size=20), shards):
+                    labels.extend(shard_labels)
+            return None, labels.count('N/A'), len(texts)
+
+    if app == 'chat':
+        import asyncio
+
+        from app import gpt_chat
+        from engine import Conversation, iterate, run
+
+        if scenario == 'chat':
+            latencies, errors = _drive(lambda text: bool(gpt_chat(text)), texts, concurrency)
+            return latencies, errors, len(texts)
+        if scenario == 'chat_stream':
+            latencies, errors = _drive(lambda text: bool(''.join(iterate(Conversation(persist=False).stream(text)))),
+                                       texts, concurrency)
+            return latencies, errors, len(texts)
+        if scenario == 'chat_async':
+            async def chat_all():
+                slots = asyncio.Semaphore(concurrency)
+
+                async def chat(text):
+                    async with slots:
+                        return await Conversation(persist=False).send(text)
+                return await asyncio.gather(*(chat(text) for text in texts), return_exceptions=True)
+
+            replies = run(chat_all())
+            return None, sum(not isinstance(reply, str) or not reply for reply in replies), len(texts)
+
+    raise ValueError(f"Unknown scenario {app}/{scenario}")
+
+
+def run_app(app, scenarios, levels, requests, base_url, cache_dir):
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY='sk-mock',
+        OPENAI_BASE_URL=base_url,
+        # Fresh, throwaway caches per app so every request reaches the server
+        RESPONSE_CACHE_PATH=os.path.join(cache_dir, f'{app}.sqlite3'),
+        SEMANTIC_CACHE_PATH=os.path.join(cache_dir, f'{app}-semantic.sqlite3'),
+        SEMANTIC_CACHE_THRESHOLD='0',
+        METRICS_LOG_PATH=''
+    )
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', app, '--scenarios', ','.join(scenarios),
+         '--concurrency', ','.join(map(str, levels)), '--requests', str(requests)],
+        cwd=os.path.join(os.path.dirname(ROOT), APPS[app]),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"{app} benchmark failed:\n{output.stderr}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    # Regressions against a saved run, matched on (app, scenario, concurrency)
+    previous = {(r['app'], r['scenario'], r['concurrency']): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['app'], result['scenario'], result['concurrency']))
+        if before is None:
+            continue
+        name = f"{result['app']}/{result['scenario']} c={result['concurrency']}"
+        if result['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:.1f}/s vs {before['throughput']:.1f}/s")
+        if before['p95'] and result['p95'] and result['p95'] > before['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95']:.0f} ms vs {before['p95']:.0f} ms")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':<32} {'conc':>4} {'items/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'ttft':>6} {'reqs':>5} {'err':>4} {'retry':>5}")
+    for r in results:
+        ttft = f"{r['ttft_p50']:.0f}" if 'ttft_p50' in r else '-'
+        p = {q: f"{r[q]:.0f}" if r[q] is not None else '-' for q in ('p50', 'p95', 'p99')}
+        print(f"{r['app'] + '/' + r['scenario']:<32} {r['concurrency']:>4} {r['throughput']:>9.1f} "
+              f"{p['p50']:>8} {p['p95']:>8} {p['p99']:>8} {ttft:>6} {r['requests']:>5} {r['errors']:>4} "
+              f"{r['retries']:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apps', default='sentiment,chat', help='Comma separated: sentiment, chat')
+    parser.add_argument('--scenarios', default=None, help='Comma separated subset of the scenarios above')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=100, help='Items per scenario and concurrency level')
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=20.0)
+    parser.add_argument('--token-delay-ms', type=float, default=2.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--save', help='Write the results as JSON')
+    parser.add_argument('--baseline', help='Compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    if args.worker:
+        run_worker(args.worker, args.scenarios.split(','), levels, args.requests)
+        return 0
+
+    selected = set(args.scenarios.split(',')) if args.scenarios else None
+    results = []
+    with MockServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, token_delay_ms=args.token_delay_ms,
+                    error_rate=args.error_rate, error_status=args.error_status) as server, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        for app in args.apps.split(','):
+            scenarios = [s for s in SCENARIOS[app] if selected is None or s in selected]
+            if scenarios:
+                results.extend(run_app(app, scenarios, levels, args.requests, server.base_url, cache_dir))
+        print(f"Mock API: {args.latency_ms:.0f} ms (+{args.jitter_ms:.0f} ms jitter), "
+              f"{args.error_rate:.0%} errors, {server.config.requests} requests served")
+
+    print_table(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
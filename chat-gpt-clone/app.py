@@ -1,42 +1,56 @@
-import streamlit as st
-from openai import OpenAI
-import os
+import argparse
+import sys
 import time
 
+from engine import DEFAULT_SYSTEM_PROMPT, Conversation, iterate, run
+from store import LOCAL_OWNER, get_store
+
 def gpt_chat(prompt):
-    client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-    messages = list()
-    system_prompt = "Answer as concisely as possible"
-    messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
-    
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=messages,
-        temperature=0.7,
-        max_tokens=300
-    )
-    current_response = response.choices[0].message.content
-    return current_response
+    # One question, one answer; nothing is stored
+    return run(Conversation(persist=False).send(prompt))
 
-def interactive_chat():
-    client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-    questions = list()
-    bot_responses = list()
-    messages = list()
-    
-    # Get system prompt from user
-    print("Enter system prompt (or press Enter for default):")
+def stream_reply(conversation, question):
+    """Print the reply to stdout as it streams in.
+
+    Ctrl+C stops the current answer and closes the request; whatever arrived
+    so far is kept. Returns the reply details (see ``Conversation.last_reply``).
+    """
+    interrupted = False
     try:
-        system_prompt = input("System: ").strip()
-        if not system_prompt:
-            system_prompt = "Answer as concisely as possible"
-        print(f"Using system prompt: '{system_prompt}'")
-    except EOFError:
-        system_prompt = "Answer as concisely as possible"
-        print(f"Using default system prompt: '{system_prompt}'")
-    
-    messages.append({"role": "system", "content": system_prompt})
+        for delta in iterate(conversation.stream(question)):
+            print(delta, end='', flush=True)
+    except KeyboardInterrupt:
+        interrupted = True
+    print()
+    reply = conversation.last_reply or {'content': '', 'tokens': 0, 'elapsed': 0.0, 'interrupted': True}
+    reply['interrupted'] = reply['interrupted'] or interrupted
+    return reply
+
+def interactive_chat(stream=True, conversation_id=None):
+    # Keeps each request within the context budget by summarizing older turns
+    conversation = Conversation()
+
+    resumed = conversation.resume(conversation_id) if conversation_id else None
+    if conversation_id and resumed is None:
+        print(f"No stored conversation '{conversation_id}', starting a new one")
+
+    if resumed:
+        # Only the tail and the context summary are loaded
+        print(f"Resuming '{resumed['title']}' ({resumed['message_count']} messages)")
+        for msg in conversation.messages[-4:]:
+            print(f"{'Me' if msg['role'] == 'user' else 'Bot'}: {msg['content']}")
+    else:
+        # Get system prompt from user
+        print("Enter system prompt (or press Enter for default):")
+        try:
+            system_prompt = input("System: ").strip()
+            if not system_prompt:
+                system_prompt = DEFAULT_SYSTEM_PROMPT
+            print(f"Using system prompt: '{system_prompt}'")
+        except EOFError:
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+            print(f"Using default system prompt: '{system_prompt}'")
+        conversation.system_prompt = system_prompt
     print("-" * 50)
     
     try:
@@ -52,10 +66,8 @@ def interactive_chat():
                 try:
                     new_prompt = input("System: ").strip()
                     if new_prompt:
-                        system_prompt = new_prompt
-                        # Update the system message
-                        messages[0] = {"role": "system", "content": system_prompt}
-                        print(f"System prompt updated to: '{system_prompt}'")
+                        conversation.system_prompt = new_prompt
+                        print(f"System prompt updated to: '{new_prompt}'")
                     else:
                         print("System prompt unchanged.")
                 except EOFError:
@@ -64,35 +76,70 @@ def interactive_chat():
                 continue
             if current_question=='':
                 continue
-            messages.append({"role": "user", "content": current_question})
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=300
-            )
-            current_response = response.choices[0].message.content
-            print(f"Bot: {current_response}")
-            bot_responses.append(current_response)
-            messages.append({"role": "assistant", "content": current_response})
-            questions.append(current_question)
+            # The conversation keeps answered turns (and stores them); unanswered questions are dropped
+            try:
+                if stream:
+                    print("Bot: ", end='', flush=True)
+                    reply = stream_reply(conversation, current_question)
+                    if reply['interrupted']:
+                        print("[Response interrupted]")
+                    if reply['content']:
+                        rate = reply['tokens'] / reply['elapsed'] if reply['elapsed'] > 0 else 0.0
+                        print(f"[{reply['tokens']} tokens in {reply['elapsed']:.1f}s, {rate:.1f} tokens/s]")
+                else:
+                    print(f"Bot: {run(conversation.send(current_question))}")
+            except Exception as e:
+                print(f"\n[Error: {e}]")
             print('\n'+'-'*50+'\n')
     except EOFError:
         print("\nInteractive chat ended (EOF detected).")
         print("To use interactive chat, run this script in a terminal where you can type input.")
     except KeyboardInterrupt:
         print("\n\nChat ended by user (Ctrl+C).")
+    if conversation.conversation_id:
+        print(f"Conversation saved; resume it with: python app.py --resume {conversation.conversation_id}")
+
+
+def list_conversations():
+    for conversation in get_store().conversations(LOCAL_OWNER):
+        updated = time.strftime('%Y-%m-%d %H:%M', time.localtime(conversation['updated']))
+        print(f"{conversation['id']}  {updated}  {conversation['message_count']:>4} messages  {conversation['title']}")
+
+
+def search_conversations(query):
+    matches = get_store().search(LOCAL_OWNER, query)
+    if not matches:
+        print("No matching messages")
+    for match in matches:
+        print(f"{match['conversation_id']}  {match['title']}\n    {match['role']}: {match['snippet']}")
 
 
 if __name__ == "__main__":
     # Set API key - Replace with your actual API key
     # os.environ['OPENAI_API_KEY'] = 'your-openai-api-key-here'
     # Or set it as an environment variable: export OPENAI_API_KEY="your-key-here"
+    parser = argparse.ArgumentParser(description="Terminal ChatGPT clone")
+    parser.add_argument('--no-stream', action='store_true', help="Wait for complete answers")
+    parser.add_argument('--resume', metavar='ID', help="Continue a stored conversation")
+    parser.add_argument('--list', action='store_true', help="List stored conversations and exit")
+    parser.add_argument('--search', metavar='QUERY', help="Search stored conversations and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        list_conversations()
+        sys.exit(0)
+    if args.search:
+        search_conversations(args.search)
+        sys.exit(0)
+
     print("Welcome to ChatGPT Clone!")
     print("Features:")
     print("- Set custom system prompt at startup")
     print("- Change system prompt during chat with '/system' or '/prompt'")
     print("- Type 'exit', 'quit', or 'bye' to end the conversation")
-    print("- Press Ctrl+C for emergency exit")
+    print("- Answers stream as they are generated; Ctrl+C stops the current answer")
+    print("- Press Ctrl+C at the prompt for emergency exit")
+    print("- Run with --no-stream to wait for complete answers")
+    print("- Conversations are saved; continue one with --resume ID (see --list, --search)")
     print("=" * 50)
-    interactive_chat()
\ No newline at end of file
+    interactive_chat(stream=not args.no_stream, conversation_id=args.resume)
@@ -0,0 +1,50 @@
+import os
+import threading
+import weakref
+
+# Connection pool shared by every request in the process. Keep-alive connections are
+# reused across calls, so only the first request to the API pays the TLS handshake.
+MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 100))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20))
+KEEPALIVE_EXPIRY = 60.0
+
+_client_lock = threading.Lock()
+# One async client per event loop: httpx connections belong to the loop that opened them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _pool_options():
+    # httpx and openai are imported on first use so importing this module stays cheap
+    import httpx
+
+    return {
+        'limits': httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        'timeout': httpx.Timeout(60.0, connect=5.0)
+    }
+
+
+def build_async_http_client():
+    import httpx
+
+    return httpx.AsyncClient(**_pool_options())
+
+
+def get_async_client():
+    # AsyncOpenAI client for the running event loop, shared by every coroutine on it;
+    # retries are handled by the resilience layer, not by the client
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'), http_client=build_async_http_client(),
+                                 max_retries=0)
+            _async_clients[loop] = client
+        return client
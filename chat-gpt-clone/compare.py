@@ -0,0 +1,152 @@
+"""Send the same chat turn to several models at once and compare them.
+
+Each model gets its own request, all in flight together on the chat
+engine's event loop, so a comparison takes as long as the slowest model
+rather than the sum. Agreement between
+free-text replies is measured as text similarity (difflib ratio).
+
+    python compare.py --models gpt-3.5-turbo,gpt-4o-mini --slo-ms 3000
+"""
+import argparse
+import asyncio
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from client import get_async_client
+from engine import run
+from metrics import metrics, note_usage, percentile
+from resilience import async_create_completion
+
+# USD per million (prompt, completion) tokens, for cost estimates only
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-3.5-turbo-16k': (3.00, 4.00),
+    'gpt-4': (30.00, 60.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+}
+
+SAMPLE_PROMPTS = [
+    "Explain what a hash table is in two sentences.",
+    "Suggest three names for a coffee shop run by robots.",
+    "What is the capital of Australia?",
+    "Summarize the plot of Romeo and Juliet in one sentence.",
+    "Give me a one-line tip for writing clearer emails.",
+    "Convert 72 degrees Fahrenheit to Celsius.",
+]
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def similarity(a, b):
+    return SequenceMatcher(None, a or '', b or '').ratio()
+
+
+async def fan_out(messages, models, temperature=0.7, max_tokens=1000):
+    """Send ``messages`` to every model concurrently.
+
+    Returns one dict per model, in ``models`` order: content (None on error),
+    latency_ms, prompt/completion tokens, cost and error. Synchronous
+    callers run it on the engine loop with ``engine.run``.
+    """
+    client = get_async_client()
+
+    async def ask(model):
+        with metrics.track('compare', model=model) as record:
+            try:
+                response = await async_create_completion(client, model=model, messages=messages,
+                                                         temperature=temperature, max_tokens=max_tokens)
+                note_usage(response.usage)
+                content = response.choices[0].message.content
+            except Exception as e:
+                record['error'] = f"{type(e).__name__}: {e}"
+                content = None
+        return {
+            'model': model,
+            'content': content,
+            'latency_ms': record['latency_ms'],
+            'prompt_tokens': record.get('prompt_tokens', 0),
+            'completion_tokens': record.get('completion_tokens', 0),
+            'cost': estimate_cost(model, record.get('prompt_tokens', 0), record.get('completion_tokens', 0)),
+            'error': record.get('error')
+        }
+
+    return list(await asyncio.gather(*(ask(model) for model in models)))
+
+
+def compare_models(prompts, models, system_prompt="Answer as concisely as possible", temperature=0.7,
+                   max_tokens=300):
+    """Run every prompt on every model (prompts in parallel too) and summarize per model.
+
+    Returns a dict with ``models`` (latency percentiles, tokens, cost and
+    errors per model), ``agreement`` (mean pairwise reply similarity) and
+    ``replies`` (one fan_out result list per prompt).
+    """
+    conversations = [[{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}]
+                     for prompt in prompts]
+
+    async def fan_out_all():
+        return await asyncio.gather(*(fan_out(messages, models, temperature, max_tokens)
+                                      for messages in conversations))
+
+    replies = list(run(fan_out_all()))
+
+    summary = {}
+    for position, model in enumerate(models):
+        results = [reply[position] for reply in replies]
+        latencies = sorted(result['latency_ms'] for result in results)
+        prompt_tokens = sum(result['prompt_tokens'] for result in results)
+        completion_tokens = sum(result['completion_tokens'] for result in results)
+        summary[model] = {
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cost': estimate_cost(model, prompt_tokens, completion_tokens),
+            'errors': sum(result['error'] is not None for result in results)
+        }
+
+    agreement = {}
+    for a, b in combinations(range(len(models)), 2):
+        scores = [similarity(reply[a]['content'], reply[b]['content']) for reply in replies]
+        agreement[(models[a], models[b])] = sum(scores) / len(scores) if scores else 0.0
+
+    return {'models': summary, 'agreement': agreement, 'replies': replies}
+
+
+def recommend(comparison, slo_ms):
+    """The cheapest model whose p95 latency meets ``slo_ms``, or None."""
+    candidates = [(entry['cost'], entry['p95_ms'], model) for model, entry in comparison['models'].items()
+                  if entry['p95_ms'] is not None and entry['p95_ms'] <= slo_ms and entry['cost'] is not None
+                  and not entry['errors']]
+    return min(candidates)[2] if candidates else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', required=True, help='Comma separated model names')
+    parser.add_argument('--prompts', help='Text file with one prompt per line (default: built-in sample)')
+    parser.add_argument('--slo-ms', type=float, help='p95 latency target for the recommendation')
+    args = parser.parse_args()
+
+    prompts = SAMPLE_PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding='utf-8') as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    comparison = compare_models(prompts, args.models.split(','))
+    print(f"{'model':<22} {'p50 ms':>8} {'p95 ms':>8} {'tokens':>9} {'cost $':>10} {'errors':>7}")
+    for model, entry in comparison['models'].items():
+        cost = f"{entry['cost']:.5f}" if entry['cost'] is not None else '-'
+        print(f"{model:<22} {entry['p50_ms'] or 0:>8.0f} {entry['p95_ms'] or 0:>8.0f} "
+              f"{entry['prompt_tokens'] + entry['completion_tokens']:>9} {cost:>10} {entry['errors']:>7}")
+    for (a, b), score in comparison['agreement'].items():
+        print(f"reply similarity {a} / {b}: {score:.0%}")
+    if args.slo_ms is not None:
+        print(f"cheapest model with p95 <= {args.slo_ms:.0f} ms: {recommend(comparison, args.slo_ms) or 'none'}")
@@ -0,0 +1,155 @@
+from functools import lru_cache
+
+from metrics import metrics, note_usage
+from resilience import async_create_completion
+
+# Context window (prompt + completion) of the models offered in the sidebar
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000
+}
+
+# Prompt budget used unless the user picks another one. Keeping it well below the
+# context window keeps per-turn latency and cost flat on long conversations.
+DEFAULT_CONTEXT_BUDGET = 4000
+
+# Tokens added by the chat format around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_MODEL = "gpt-3.5-turbo"
+
+
+def max_context_budget(model, max_tokens):
+    # Largest prompt that still leaves room for the completion
+    return max(500, MODEL_CONTEXT_WINDOWS.get(model, 4096) - max_tokens)
+
+
+def default_context_budget(model, max_tokens):
+    return min(DEFAULT_CONTEXT_BUDGET, max_context_budget(model, max_tokens))
+
+
+_encoder = None
+
+
+def _get_encoder():
+    # tiktoken gives exact counts when installed and its encoding is available
+    # (it is downloaded on first use); otherwise fall back to an estimate
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    return _encoder
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    # Cached per message text, so each message is only tokenized once per process
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text))
+    return max(1, len(text) // 4)
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summary_request(summary, messages, model=SUMMARY_MODEL):
+    transcript = "\n".join(f"{msg['role'].title()}: {msg['content']}" for msg in messages)
+    prompt = (
+        "Update the summary of an ongoing conversation with the new turns below. "
+        "Keep names, facts, decisions and open questions; stay under 200 words.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    return {'model': model, 'messages': [{"role": "user", "content": prompt}], 'temperature': 0.0, 'max_tokens': 400}
+
+
+async def summarize_messages_async(client, summary, messages, model=SUMMARY_MODEL):
+    # Fold older turns into the running summary with one short completion (AsyncOpenAI client)
+    with metrics.track('summarize', model=model):
+        response = await async_create_completion(client, **summary_request(summary, messages, model))
+        note_usage(response.usage)
+    return response.choices[0].message.content.strip()
+
+
+class ConversationContext:
+    """Keeps the prompt sent for a conversation within a token budget.
+
+    When the history no longer fits, the oldest turns are folded into a
+    rolling summary (via ``summarize``) down to ``low_water`` of the budget.
+    The most recent ``keep_recent`` messages are never folded, so compaction
+    only happens once every several turns while they and the summary stay
+    well under the low-water mark. With a budget close to a few long
+    messages they do not, and every turn that overflows folds the oldest
+    message or two with a summarization call of its own; keep the budget
+    several times the size of a typical exchange.
+    """
+
+    def __init__(self, budget_tokens=DEFAULT_CONTEXT_BUDGET, summarize=None, keep_recent=4, low_water=0.6):
+        self.budget_tokens = budget_tokens
+        self.summarize = summarize
+        self.keep_recent = keep_recent
+        self.low_water = low_water
+        self.reset()
+
+    def reset(self):
+        self.summary = ""
+        # Number of history messages already folded into the summary
+        self.summarized = 0
+
+    async def build_async(self, system_prompt, history):
+        """Return the API messages for ``history`` (role/content dicts, oldest first).
+
+        ``summarize`` is a coroutine function taking the summary so far and
+        the turns to fold in.
+        """
+        folded = self._to_fold(system_prompt, history)
+        if folded and self.summarize is not None:
+            try:
+                self.summary = await self.summarize(self.summary, folded)
+            except Exception as e:
+                # Without a summary the folded turns are simply dropped
+                print(f"Error while summarizing conversation: {e}")
+        self.summarized += len(folded)
+        return self._messages(system_prompt, history)
+
+    def _to_fold(self, system_prompt, history):
+        # The oldest turns to fold into the summary so the prompt fits the budget again
+        if self.summarized > len(history):
+            # The history was cleared or replaced since the last turn
+            self.reset()
+
+        fixed = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        if self.summary:
+            fixed += count_tokens(self.summary) + MESSAGE_OVERHEAD_TOKENS
+        total = fixed + sum(message_tokens(msg) for msg in history[self.summarized:])
+        if total <= self.budget_tokens:
+            return []
+
+        # Fold down to the low-water mark, always keeping the recent messages
+        target = self.budget_tokens * self.low_water
+        end = self.summarized
+        while total > target and end < len(history) - self.keep_recent:
+            total -= message_tokens(history[end])
+            end += 1
+        return history[self.summarized:end]
+
+    def _messages(self, system_prompt, history):
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        recent = [{"role": msg["role"], "content": msg["content"]} for msg in history[self.summarized:]]
+
+        # Last resort when even the recent turns overflow: drop the oldest of them
+        total = sum(message_tokens(msg) for msg in messages + recent)
+        while len(recent) > 1 and total > self.budget_tokens:
+            total -= message_tokens(recent.pop(0))
+
+        return messages + recent
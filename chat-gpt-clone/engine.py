@@ -0,0 +1,363 @@
+"""Async chat engine shared by the terminal chat and the Streamlit app.
+
+A ``Conversation`` owns one chat: the system prompt, the history, the
+context budget that folds older turns into a summary and the transcript in
+the conversation store. ``send`` answers a message, ``stream`` yields the
+answer as it arrives and ``cancel`` stops the request in flight. Requests
+go through ``AsyncOpenAI``, with per-call timeouts, retries and the circuit
+breaker from ``resilience.py``, deterministic replies served from the
+response cache and every request recorded in the metrics, so a single
+event loop serves many conversations at once without a thread per waiting
+request.
+
+Synchronous frontends share one engine loop running on a daemon thread and
+call into it with ``run`` and ``iterate``; an async server awaits the
+conversation methods on its own loop.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from cache import get_cache
+from client import get_async_client
+from context import ConversationContext, default_context_budget, message_tokens, summarize_messages_async
+from metrics import metrics, note_usage
+from resilience import async_call_with_resilience, async_create_completion
+from store import LOCAL_OWNER, get_store
+
+DEFAULT_SYSTEM_PROMPT = "Answer as concisely as possible"
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+def chat_cache_request(messages, model, temperature, max_tokens):
+    # Normalized chat request used as the response cache key
+    return {
+        'task': 'chat',
+        'messages': [{"role": msg["role"], "content": msg["content"]} for msg in messages],
+        'model': model,
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }
+
+
+class Conversation:
+    """One chat and its history.
+
+    ``messages`` holds the loaded history (role/content dicts; extra keys
+    such as a timestamp are kept and stored). Answered turns are appended
+    to the conversation store, which creates the conversation on the first
+    one. A question that gets no answer is taken out of the history again,
+    so failed turns are never resent to the model. ``model``,
+    ``temperature`` and ``max_tokens`` can be changed between turns.
+    ``owner`` is who the stored conversation is listed, searched and resumed for.
+    """
+
+    def __init__(self, system_prompt=DEFAULT_SYSTEM_PROMPT, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300,
+                 budget_tokens=None, persist=True, owner=LOCAL_OWNER):
+        self.system_prompt = system_prompt
+        self.owner = owner
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.context = ConversationContext(
+            budget_tokens=budget_tokens or default_context_budget(model, max_tokens),
+            summarize=lambda summary, turns: summarize_messages_async(get_async_client(), summary, turns)
+        )
+        self.store = get_store() if persist else None
+        self.messages = []
+        self.conversation_id = None
+        # Number of older stored messages that are not loaded
+        self.offset = 0
+        # content, ttft, tokens, elapsed, interrupted and cache_hit of the last turn
+        self.last_reply = None
+        self._busy = False
+        self._request = None
+        self._cancelled = False
+
+    def reset(self):
+        # Start over; a stored conversation stays in the store
+        self.cancel()
+        self.messages = []
+        self.context.reset()
+        self.conversation_id = None
+        self.offset = 0
+        self.last_reply = None
+
+    def resume(self, conversation_id):
+        """Load the tail of a stored conversation and its context summary.
+
+        Returns the stored conversation (title, message_count, ...) or None
+        if ``owner`` has no such conversation.
+        """
+        loaded = self.store.resume(conversation_id, self.owner) if self.store is not None else None
+        if loaded is None:
+            return None
+        conversation, offset, messages = loaded
+        self.reset()
+        self.system_prompt = conversation['system_prompt']
+        self.messages = messages
+        self.context.summary = conversation['summary']
+        self.context.summarized = conversation['summarized'] - offset
+        self.conversation_id = conversation_id
+        self.offset = offset
+        return conversation
+
+    def load_older(self, count):
+        # Page up to ``count`` earlier messages in from the store; returns how many were loaded
+        start = max(0, self.offset - count)
+        older = self.store.messages(self.conversation_id, start=start, end=self.offset)
+        self.messages = older + self.messages
+        self.context.summarized += len(older)
+        self.offset = start
+        return len(older)
+
+    def add(self, *messages):
+        # Append messages without asking the model (e.g. a question answered later)
+        self.messages.extend(messages)
+        self._persist(list(messages))
+
+    def _persist(self, messages):
+        if self.store is None:
+            return
+        if self.conversation_id is None:
+            self.conversation_id = self.store.create_conversation(self.system_prompt, owner=self.owner)
+        self.store.append(self.conversation_id, messages)
+        self.store.save_context(self.conversation_id, self.system_prompt, self.context.summary,
+                                self.context.summarized + self.offset)
+
+    async def request_messages(self, *pending):
+        """API messages for the history plus ``pending`` messages, compacting older turns if needed."""
+        return await self.context.build_async(self.system_prompt, self.messages + list(pending))
+
+    async def send(self, text, **fields):
+        """Answer ``text`` and return the reply (None if it was cancelled before any of it arrived).
+
+        ``fields`` (e.g. a timestamp) are stored on both messages of the turn.
+        """
+        return (await self._turn(text, fields, None))['content'] or None
+
+    async def stream(self, text, **fields):
+        """Answer ``text``, yielding the reply as it arrives.
+
+        Cancelling, or closing the generator early, stops the request and
+        keeps what arrived so far. ``last_reply`` describes the finished turn.
+        """
+        deltas = asyncio.Queue()
+        turn = asyncio.ensure_future(self._turn(text, fields, deltas))
+        turn.add_done_callback(lambda _: deltas.put_nowait(None))
+        try:
+            while True:
+                delta = await deltas.get()
+                if delta is None:
+                    break
+                yield delta
+        finally:
+            if not turn.done():
+                # Stops the request, or the turn itself if the request was not sent yet
+                turn.cancel()
+            try:
+                await turn
+            except asyncio.CancelledError:
+                if not turn.cancelled():
+                    raise
+
+    def cancel(self):
+        """Stop the request in flight, if any. Safe to call from any thread."""
+        request = self._request
+        if request is not None and not request.done():
+            self._cancelled = True
+            request.get_loop().call_soon_threadsafe(request.cancel)
+
+    async def _turn(self, text, fields, deltas):
+        if self._busy:
+            raise RuntimeError("This conversation is already waiting for a reply")
+        self._busy = True
+        try:
+            return await self._answer_turn(text, fields, deltas)
+        finally:
+            self._busy = False
+
+    async def _answer_turn(self, text, fields, deltas):
+        question = {"role": "user", "content": text, **fields}
+        self.messages.append(question)
+        self.last_reply = None
+        started = time.perf_counter()
+        try:
+            messages = await self.request_messages()
+            self._cancelled = False
+            self._request = asyncio.ensure_future(self._answer(messages, deltas))
+            try:
+                reply = await self._request
+            except asyncio.CancelledError:
+                # cancel() stopped the request before any of the reply arrived
+                if not (self._cancelled and self._request.cancelled()):
+                    raise
+                reply = {'content': '', 'ttft': None, 'tokens': 0, 'interrupted': True, 'cache_hit': False,
+                         'error': None}
+        except BaseException:
+            self._drop(question)
+            raise
+
+        reply['elapsed'] = time.perf_counter() - started
+        self.last_reply = reply
+        if reply['content']:
+            # A partial reply (interrupted or failed midway) is kept as well
+            self.messages.append({"role": "assistant", "content": reply['content'], "ttft": reply['ttft'],
+                                  **fields})
+            await asyncio.to_thread(self._persist, self.messages[-2:])
+        else:
+            self._drop(question)
+        if reply['error'] is not None:
+            raise reply['error']
+        return reply
+
+    def _drop(self, question):
+        # Take an unanswered question out of the history
+        if self.messages and self.messages[-1] is question:
+            self.messages.pop()
+
+    async def _answer(self, messages, deltas):
+        # One reply from the response cache or the API, streamed into ``deltas`` when given
+        started = time.perf_counter()
+        model, temperature, max_tokens = self.model, self.temperature, self.max_tokens
+        reply = {'content': '', 'ttft': None, 'tokens': 0, 'interrupted': False, 'cache_hit': False, 'error': None}
+        cache_request = chat_cache_request(messages, model, temperature, max_tokens)
+
+        with metrics.track('chat' if deltas is None else 'chat_stream', model=model) as record:
+            # Deterministic (temperature 0) requests are answered from the response cache when possible
+            cached = get_cache().get(cache_request) if temperature == 0 else None
+            if cached is not None:
+                record['cache_hit'] = True
+                reply.update(content=cached, cache_hit=True)
+                if deltas is not None:
+                    deltas.put_nowait(cached)
+                return reply
+
+            client = get_async_client()
+            if deltas is None:
+                response = await async_create_completion(client, model=model, messages=messages,
+                                                         temperature=temperature, max_tokens=max_tokens)
+                note_usage(response.usage)
+                reply['content'] = response.choices[0].message.content or ''
+            else:
+                # Retries and the timeout cover opening the stream, i.e. up to the response headers
+                stream = await async_call_with_resilience(lambda timeout: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    timeout=timeout
+                ))
+                parts = []
+                try:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if not parts:
+                                reply['ttft'] = time.perf_counter() - started
+                                record['ttft_ms'] = reply['ttft'] * 1000
+                            parts.append(chunk.choices[0].delta.content)
+                            deltas.put_nowait(chunk.choices[0].delta.content)
+                except asyncio.CancelledError:
+                    reply['interrupted'] = True
+                    record['error'] = 'CancelledError'
+                except Exception as e:
+                    # Keep the part that arrived; the error is raised once the turn is recorded
+                    reply['error'] = e
+                    record['error'] = type(e).__name__
+                finally:
+                    await stream.close()
+                    # Streamed responses carry no usage, so tokens are counted locally
+                    record['prompt_tokens'] = sum(message_tokens(msg) for msg in messages)
+                    record['completion_tokens'] = len(parts)
+                # Each content chunk carries one token
+                reply.update(content=''.join(parts), tokens=len(parts))
+
+        if temperature == 0 and reply['content'] and not reply['interrupted'] and reply['error'] is None:
+            get_cache().set(cache_request, reply['content'])
+        return reply
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    # Event loop shared by every conversation of the process, on a daemon thread
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='chat-engine', daemon=True).start()
+        return _loop
+
+
+def _spawn(coro):
+    # Start ``coro`` as a task on the engine loop; returns the task and an event set when it is done
+    loop = get_loop()
+    finished = threading.Event()
+    created = Future()
+
+    def start():
+        task = loop.create_task(coro)
+        task.add_done_callback(lambda _: finished.set())
+        created.set_result(task)
+
+    loop.call_soon_threadsafe(start)
+    return created.result(), finished
+
+
+def _stop(task, finished):
+    # Cancel a spawned task and wait until it has cleaned up (e.g. kept a partial reply)
+    task.get_loop().call_soon_threadsafe(task.cancel)
+    finished.wait()
+
+
+def run(coro):
+    """Run a coroutine on the engine loop and return its result.
+
+    If the caller is interrupted (Ctrl+C), the coroutine is cancelled and
+    allowed to finish cleaning up before the interruption is raised.
+    """
+    task, finished = _spawn(coro)
+    try:
+        finished.wait()
+    except BaseException:
+        _stop(task, finished)
+        raise
+    return task.result()
+
+
+_DONE = object()
+
+
+def iterate(agen):
+    """Iterate an async generator on the engine loop from synchronous code.
+
+    Items are handed over through a queue. If the caller stops early (break,
+    Ctrl+C, a Streamlit rerun), the generator is cancelled on the loop and
+    has finished before control returns.
+    """
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        finally:
+            items.put(_DONE)
+
+    task, finished = _spawn(pump())
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            yield item
+    except BaseException:
+        _stop(task, finished)
+        raise
+    finished.wait()
+    task.result()
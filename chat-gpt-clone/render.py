@@ -0,0 +1,75 @@
+# Messages per rendered history page. Full pages never change, so their HTML is
+# built once and re-emitted as a single element on every rerun.
+PAGE_SIZE = 20
+
+
+def assistant_message_html(content, footer=""):
+    return f'''
+        <div class="message-assistant">
+            <strong>🤖 Assistant:</strong><br>
+            {content}
+            <div class="timestamp">{footer}</div>
+        </div>
+        '''
+
+
+def assistant_message_footer(message):
+    # Timestamp plus time-to-first-token for streamed answers
+    footer = message.get("timestamp", "")
+    if message.get("ttft") is not None:
+        footer += f" • first token {message['ttft']:.2f}s"
+    return footer
+
+
+def message_html(message):
+    if message["role"] == "user":
+        return f'''
+        <div class="message-user">
+            <strong>You:</strong><br>
+            {message["content"]}
+            <div class="timestamp">{message.get("timestamp", "")}</div>
+        </div>
+        '''
+    elif message["role"] == "assistant":
+        return assistant_message_html(message["content"], assistant_message_footer(message))
+    elif message["role"] == "system":
+        return f'''
+        <div class="message-system">
+            <strong>System:</strong> {message["content"]}
+        </div>
+        '''
+    return ""
+
+
+class TranscriptRenderer:
+    """Caches the rendered HTML of a chat transcript between reruns.
+
+    History is split into pages of ``PAGE_SIZE`` messages. Each full page is
+    rendered once and cached; only the trailing, still-growing page is
+    rendered per message, so the work per rerun does not grow with the
+    length of the conversation.
+    """
+
+    def __init__(self):
+        self.messages = None
+        self.pages = []
+
+    def render(self, messages, visible_pages):
+        """Return (hidden_count, page_html, tail_html) for the visible part of ``messages``.
+
+        ``visible_pages`` is the number of full pages shown above the tail;
+        ``hidden_count`` is how many older messages are left out.
+        """
+        # A new list (e.g. after clearing the chat) invalidates every cached page
+        if messages is not self.messages or len(messages) < len(self.pages) * PAGE_SIZE:
+            self.messages = messages
+            self.pages = []
+
+        full_pages = len(messages) // PAGE_SIZE
+        for page in range(len(self.pages), full_pages):
+            chunk = messages[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+            self.pages.append("".join(message_html(message) for message in chunk))
+
+        first_page = max(0, full_pages - visible_pages)
+        tail = [message_html(message) for message in messages[full_pages * PAGE_SIZE:]]
+        return first_page * PAGE_SIZE, self.pages[first_page:], tail
@@ -0,0 +1,174 @@
+import asyncio
+import random
+import threading
+import time
+
+from metrics import current_request, metrics
+
+# Chat answers can be long, so the default timeout is generous
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast once the API looks degraded.
+
+    After ``failure_threshold`` consecutive retryable failures the circuit
+    opens and calls fail immediately for ``reset_timeout`` seconds. Then a
+    single trial call is let through: success closes the circuit, failure
+    opens it again. A trial that ends any other way (rate limited,
+    interrupted, cancelled) is released, and the next call becomes the trial.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        # Raises CircuitOpenError while open; returns True if this call is the half-open trial
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                raise CircuitOpenError("OpenAI API circuit is open after repeated failures; try again shortly")
+            self.trial_in_flight = True
+            return True
+
+    def release(self):
+        # End a trial that gave no verdict on the API's health
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+default_breaker = CircuitBreaker()
+
+
+# backoff_delay and retry_after_seconds are kept in step with the other app's
+# copy (see tests/test_shared_copies.py)
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(error):
+    # Read the Retry-After header from an OpenAI API error, if the server sent one
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+                          openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def is_rate_limit(error):
+    import openai
+
+    return isinstance(error, openai.RateLimitError)
+
+
+def _failed_attempt(error, attempt, max_attempts, breaker):
+    # Record a failed attempt and return the delay before the next one;
+    # errors that should not be retried (and the last attempt) are raised
+    if not is_retryable(error):
+        # The API answered (e.g. a 400), so it is not degraded
+        breaker.record_success()
+        raise error
+    if not is_rate_limit(error):
+        # Rate limiting is back-pressure, not a sign of a degraded API
+        breaker.record_failure()
+    if attempt == max_attempts - 1:
+        raise error
+    record = current_request()
+    if record is not None:
+        record['retries'] += 1
+    return retry_after_seconds(error) or backoff_delay(attempt, base=0.5, cap=10.0)
+
+
+async def async_call_with_resilience(call, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                                     breaker=default_breaker):
+    """Await ``call(timeout)`` with the circuit breaker and retries.
+
+    Retryable errors (timeouts, connection errors, 429 and 5xx) are retried
+    with jittered exponential backoff, honouring Retry-After; other errors
+    are raised immediately. Backoff waits without blocking the event loop,
+    and cancelling the caller cancels the request in flight.
+    """
+    for attempt in range(max_attempts):
+        trial = breaker.allow()
+        try:
+            result = await call(timeout)
+        except Exception as e:
+            delay = _failed_attempt(e, attempt, max_attempts, breaker)
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            if trial:
+                # Whatever happened, the trial is over (a no-op after success or failure)
+                breaker.release()
+        await asyncio.sleep(delay)
+
+
+async def async_create_completion(client, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                                  breaker=default_breaker, **kwargs):
+    # chat.completions.create on an AsyncOpenAI client behind the resilience layer, with a per-call timeout
+    return await async_call_with_resilience(
+        lambda call_timeout: client.chat.completions.create(timeout=call_timeout, **kwargs),
+        timeout=timeout,
+        max_attempts=max_attempts,
+        breaker=breaker
+    )
+
+
+def api_status(breaker=default_breaker):
+    # Status shown in the UI, from the circuit breaker and the last API request
+    state = breaker.state
+    if state == 'open':
+        return "🔴 Circuit open"
+    if state == 'half-open':
+        return "🟠 Recovering"
+    if not metrics.has_requests():
+        return "⚪ No requests yet"
+    if metrics.last_error():
+        return "⚠️ Last request failed"
+    return "✅ Connected"
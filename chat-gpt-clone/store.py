@@ -0,0 +1,224 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'conversations.sqlite3')
+
+# Messages loaded when a conversation is resumed (plus any not yet summarized)
+RESUME_TAIL = 20
+
+# Owner of the terminal chat's conversations (and of those stored before owners existed)
+LOCAL_OWNER = 'local'
+
+
+def new_owner_id():
+    return uuid.uuid4().hex[:12]
+
+
+def fts_query(text):
+    # Quote every word so user input is never parsed as FTS5 syntax
+    words = [word.replace('"', '""') for word in text.split()]
+    return ' '.join(f'"{word}"' for word in words if word)
+
+
+class ConversationStore:
+    """Append-only conversation history in SQLite (WAL mode).
+
+    Messages are numbered per conversation (``seq``) and indexed on
+    (conversation, seq), so the tail of a long conversation or any older
+    page loads without reading the rest. Each conversation also keeps the
+    context summary state, so a resumed chat does not need its full
+    transcript to build the next request. Message text is indexed with
+    FTS5 for search when SQLite provides it. Every conversation has an
+    owner (a browser session, or the terminal user), and loading, listing
+    and searching only ever see the owner's conversations.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL DEFAULT 'local',
+                title TEXT NOT NULL,
+                system_prompt TEXT NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized INTEGER NOT NULL DEFAULT 0,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                conversation_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT,
+                ttft REAL,
+                created REAL NOT NULL,
+                UNIQUE (conversation_id, seq)
+            );
+        ''')
+        columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(conversations)')}
+        if 'owner' not in columns:
+            # Stores from before owners: their conversations belong to the terminal user
+            self.conn.execute(f"ALTER TABLE conversations ADD COLUMN owner TEXT NOT NULL DEFAULT '{LOCAL_OWNER}'")
+        self.conn.execute('DROP INDEX IF EXISTS conversations_updated')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS conversations_owner ON conversations (owner, updated)')
+        self.fts = self._create_fts()
+        self.conn.commit()
+
+    def _create_fts(self):
+        try:
+            self.conn.executescript('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+                    USING fts5(content, content='messages', content_rowid='id');
+                CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+                END;
+            ''')
+            return True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE
+            return False
+
+    def create_conversation(self, system_prompt, title='New chat', owner=LOCAL_OWNER):
+        conversation_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO conversations (id, owner, title, system_prompt, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (conversation_id, owner, title, system_prompt, now, now)
+            )
+            self.conn.commit()
+        return conversation_id
+
+    def append(self, conversation_id, messages):
+        """Append messages (role/content dicts, optional timestamp and ttft); returns the new count."""
+        now = time.time()
+        with self.lock:
+            count = self.conn.execute('SELECT message_count FROM conversations WHERE id = ?',
+                                      (conversation_id,)).fetchone()[0]
+            self.conn.executemany(
+                'INSERT INTO messages (conversation_id, seq, role, content, timestamp, ttft, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(conversation_id, count + i, msg['role'], msg['content'], msg.get('timestamp'), msg.get('ttft'), now)
+                 for i, msg in enumerate(messages)]
+            )
+            count += len(messages)
+            # The first user message names the conversation
+            title = next((msg['content'] for msg in messages if msg['role'] == 'user'), None)
+            self.conn.execute(
+                "UPDATE conversations SET message_count = ?, updated = ?, "
+                "title = CASE WHEN title = 'New chat' AND ? IS NOT NULL THEN ? ELSE title END WHERE id = ?",
+                (count, now, title, ' '.join((title or '').split())[:60], conversation_id)
+            )
+            self.conn.commit()
+        return count
+
+    def save_context(self, conversation_id, system_prompt, summary, summarized):
+        # ``summarized`` counts messages from the start of the conversation
+        with self.lock:
+            self.conn.execute(
+                'UPDATE conversations SET system_prompt = ?, summary = ?, summarized = ? WHERE id = ?',
+                (system_prompt, summary, summarized, conversation_id)
+            )
+            self.conn.commit()
+
+    def conversation(self, conversation_id, owner):
+        # None unless the conversation exists and belongs to ``owner``
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM conversations WHERE id = ? AND owner = ?',
+                                    (conversation_id, owner)).fetchone()
+        return dict(row) if row else None
+
+    def conversations(self, owner, limit=20):
+        # The owner's conversations, most recently active first
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, title, message_count, updated FROM conversations '
+                'WHERE owner = ? AND message_count > 0 ORDER BY updated DESC LIMIT ?', (owner, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def messages(self, conversation_id, start=0, end=None):
+        """Messages with ``start <= seq < end``, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT role, content, timestamp, ttft FROM messages '
+                'WHERE conversation_id = ? AND seq >= ? AND seq < ? ORDER BY seq',
+                (conversation_id, start, end if end is not None else 2 ** 62)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def resume(self, conversation_id, owner, tail=RESUME_TAIL):
+        """Load what is needed to continue a conversation without its full transcript.
+
+        Returns (conversation, offset, messages): the last ``tail`` messages,
+        extended back to the first one not yet folded into the summary, and
+        the ``seq`` of the first loaded message. None if the id is unknown
+        or belongs to another owner.
+        """
+        conversation = self.conversation(conversation_id, owner)
+        if conversation is None:
+            return None
+        offset = max(0, min(conversation['summarized'], conversation['message_count'] - tail))
+        return conversation, offset, self.messages(conversation_id, start=offset)
+
+    def search(self, owner, query, limit=20):
+        """Messages matching ``query`` in the owner's conversations, best matches first."""
+        if not query.strip():
+            return []
+        with self.lock:
+            if self.fts:
+                rows = self.conn.execute(
+                    "SELECT m.conversation_id, c.title, m.seq, m.role, "
+                    "snippet(messages_fts, 0, '**', '**', '…', 12) AS snippet "
+                    "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                    "JOIN conversations c ON c.id = m.conversation_id "
+                    "WHERE messages_fts MATCH ? AND c.owner = ? ORDER BY rank LIMIT ?",
+                    (fts_query(query), owner, limit)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT m.conversation_id, c.title, m.seq, m.role, substr(m.content, 1, 120) AS snippet "
+                    "FROM messages m JOIN conversations c ON c.id = m.conversation_id "
+                    "WHERE m.content LIKE ? AND c.owner = ? ORDER BY m.id DESC LIMIT ?",
+                    (f"%{query.strip()}%", owner, limit)
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def export(self, conversation_id, out, page_size=500):
+        # Write the transcript as text, one page of messages at a time
+        start = 0
+        while True:
+            page = self.messages(conversation_id, start=start, end=start + page_size)
+            for msg in page:
+                out.write(f"{msg['role'].title()}: {msg['content']}\n\n")
+            if len(page) < page_size:
+                return
+            start += page_size
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store():
+    # Process-wide store shared by every session (and every Streamlit rerun)
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ConversationStore(os.environ.get('CONVERSATION_STORE_PATH', DEFAULT_STORE_PATH))
+        return _default_store
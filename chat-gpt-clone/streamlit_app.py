@@ -1,26 +1,42 @@
 import streamlit as st
-from openai import OpenAI
-import os
-import time
+import tempfile
 from datetime import datetime
 
-# Initialize OpenAI client
-def get_client():
-    return OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-
-# Function to get AI response
-def get_ai_response(messages, model="gpt-3.5-turbo", temperature=0.7, max_tokens=1000):
-    client = get_client()
-    try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
+from cache import get_cache
+from compare import SAMPLE_PROMPTS, compare_models, fan_out, recommend, similarity
+from context import default_context_budget, max_context_budget
+from engine import Conversation, iterate, run
+from metrics import metrics
+from render import PAGE_SIZE, TranscriptRenderer, assistant_message_html
+from resilience import api_status
+from store import get_store, new_owner_id
+
+def reset_chat():
+    # Start a new conversation; the previous one stays in the store
+    st.session_state.conversation.reset()
+    st.session_state.chat_count = 0
+    st.session_state.history_pages = 1
+    st.session_state.last_comparison = None
+    st.query_params.pop("conversation", None)
+
+def open_conversation(conversation_id):
+    # Resume a stored conversation, loading only its tail and the context summary
+    stored = st.session_state.conversation.resume(conversation_id)
+    if stored is None:
+        return False
+    st.session_state.chat_count = stored['message_count'] // 2
+    st.session_state.history_pages = 1
+    st.session_state.last_comparison = None
+    st.session_state.system_prompt = stored['system_prompt']
+    st.query_params["conversation"] = conversation_id
+    return True
+
+def add_message(message):
+    # Add a message without asking for a reply; the stored conversation is created on the first one
+    conversation = st.session_state.conversation
+    conversation.system_prompt = st.session_state.system_prompt
+    conversation.add(message)
+    st.query_params["conversation"] = conversation.conversation_id
 
 # Custom CSS for beautiful styling
 st.markdown("""
@@ -150,12 +166,27 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if 'messages' not in st.session_state:
-    st.session_state.messages = []
 if 'system_prompt' not in st.session_state:
     st.session_state.system_prompt = "You are a helpful AI assistant. Answer questions clearly and concisely."
 if 'chat_count' not in st.session_state:
     st.session_state.chat_count = 0
+if 'renderer' not in st.session_state:
+    st.session_state.renderer = TranscriptRenderer()
+if 'history_pages' not in st.session_state:
+    st.session_state.history_pages = 1
+if 'owner' not in st.session_state:
+    # Stored conversations are listed and searched per browser session, kept in the URL across reloads
+    st.session_state.owner = st.query_params.get("session") or new_owner_id()
+    st.query_params["session"] = st.session_state.owner
+if 'conversation' not in st.session_state:
+    # History, context budget and stored transcript of the chat (see engine.py)
+    st.session_state.conversation = Conversation(st.session_state.system_prompt, owner=st.session_state.owner)
+    # A reload keeps the conversation id in the URL, so the chat resumes from the store
+    if st.query_params.get("conversation") and not open_conversation(st.query_params["conversation"]):
+        # Unknown, or another session's conversation
+        st.query_params.pop("conversation", None)
+if 'last_comparison' not in st.session_state:
+    st.session_state.last_comparison = None
 
 # Set API key - Replace with your actual API key
 # os.environ['OPENAI_API_KEY'] = 'your-openai-api-key-here'
@@ -208,6 +239,31 @@ with st.sidebar:
         step=100,
         help="Maximum length of response"
     )
+
+    # Prompt budget: older turns are summarized once the history exceeds it
+    context_budget = st.slider(
+        "Context Budget (tokens):",
+        min_value=500,
+        max_value=max_context_budget(model_choice, max_tokens),
+        value=default_context_budget(model_choice, max_tokens),
+        step=100,
+        help="Maximum prompt size sent per message. Older turns are compacted into a summary beyond this."
+    )
+    st.session_state.conversation.context.budget_tokens = context_budget
+
+    # Streaming renders tokens as they arrive instead of waiting for the full answer
+    stream_responses = st.checkbox(
+        "Stream responses",
+        value=True,
+        help="Show the answer token by token as it is generated"
+    )
+
+    # Side-by-side mode: the same turn goes to every selected model at once
+    compare_with = st.multiselect(
+        "Compare with models:",
+        [model for model in model_options if model != model_choice],
+        help="Send each message to these models too, in parallel. The selected model's reply stays in the chat."
+    )
     
     st.markdown("---")
     st.markdown("### 🎯 System Prompt")
@@ -230,40 +286,91 @@ with st.sidebar:
     
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Messages", len(st.session_state.messages))
+        st.metric("Messages", len(st.session_state.conversation.messages))
     with col2:
         st.metric("Model", model_choice)
+
+    # Response cache counters (process wide, persisted on disk)
+    cache_stats = get_cache().stats()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Cache Hits", cache_stats['hits'])
+    with col2:
+        st.metric("Cache Misses", cache_stats['misses'])
+    st.caption(f"🗄️ {cache_stats['entries']} cached responses • {cache_stats['hit_rate']:.0%} hit rate")
     
-    # API status
-    try:
-        client = get_client()
-        st.success("🟢 API Connected")
-    except:
-        st.error("🔴 API Error")
+    # Request latency percentiles over the recent window (see metrics.py)
+    latency = metrics.summary('chat_stream') if stream_responses else metrics.summary('chat')
+    if latency['count']:
+        st.markdown("**⏱️ Response Latency**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("p50", f"{latency['p50'] / 1000:.1f} s")
+        with col2:
+            st.metric("p95", f"{latency['p95'] / 1000:.1f} s")
+        with col3:
+            st.metric("p99", f"{latency['p99'] / 1000:.1f} s")
+        ttft = metrics.summary('chat_stream', field='ttft_ms')
+        if stream_responses and ttft['count']:
+            st.caption(f"⚡ First token p50 {ttft['p50']:.0f} ms • p95 {ttft['p95']:.0f} ms")
+
+    # API status from the circuit breaker and the last request
+    st.metric("API Status", api_status())
     
     st.markdown("---")
     st.markdown("### 🛠️ Actions")
     
     # Clear chat button
-    if st.button("🗑️ Clear Chat", help="Clear all messages"):
-        st.session_state.messages = []
-        st.session_state.chat_count = 0
+    if st.button("🗑️ Clear Chat", help="Start a new chat (the current one stays in the history)"):
+        reset_chat()
         st.success("Chat cleared!")
         st.rerun()
     
     # Export chat button
     if st.button("📥 Export Chat"):
-        if st.session_state.messages:
-            chat_text = "\n\n".join([f"{msg['role'].title()}: {msg['content']}" for msg in st.session_state.messages])
+        if st.session_state.conversation.conversation_id:
+            # The full transcript comes from the store, written out page by page
+            export_file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+            get_store().export(st.session_state.conversation.conversation_id, export_file)
+            export_file.seek(0)
             st.download_button(
                 label="Download Chat",
-                data=chat_text,
+                data=export_file,
                 file_name=f"chat_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
                 mime="text/plain"
             )
         else:
             st.warning("No messages to export")
 
+    st.markdown("---")
+    st.markdown("### 💾 Conversations")
+
+    if st.button("➕ New Chat"):
+        reset_chat()
+        st.rerun()
+
+    # Recent conversations, resumed from the store with only their latest messages
+    recent_conversations = get_store().conversations(st.session_state.owner)
+    if recent_conversations:
+        selected = st.selectbox(
+            "Recent chats:",
+            recent_conversations,
+            format_func=lambda c: f"{c['title']} ({c['message_count']} messages)"
+        )
+        if st.button("📂 Open Chat") and open_conversation(selected['id']):
+            st.rerun()
+
+    # Full-text search across this session's stored conversations
+    search_query = st.text_input("🔎 Search history:", placeholder="Words to find...")
+    if search_query:
+        matches = get_store().search(st.session_state.owner, search_query, limit=10)
+        if not matches:
+            st.caption("No matching messages")
+        for i, match in enumerate(matches):
+            st.markdown(f"**{match['title']}** · {match['role']}: {match['snippet']}")
+            if st.button("Open", key=f"search_result_{i}") and open_conversation(match['conversation_id']):
+                st.rerun()
+
 # System Prompt Section
 st.markdown("### 🎯 System Prompt Configuration")
 with st.expander("🔧 Customize AI Behavior", expanded=False):
@@ -325,33 +432,50 @@ if st.session_state.system_prompt != "You are a helpful AI assistant. Answer que
     </div>
     ''', unsafe_allow_html=True)
 
-# Display chat messages
-for message in st.session_state.messages:
-    if message["role"] == "user":
-        st.markdown(f'''
-        <div class="message-user">
-            <strong>You:</strong><br>
-            {message["content"]}
-            <div class="timestamp">{message.get("timestamp", "")}</div>
-        </div>
-        ''', unsafe_allow_html=True)
-    elif message["role"] == "assistant":
-        st.markdown(f'''
-        <div class="message-assistant">
-            <strong>🤖 Assistant:</strong><br>
-            {message["content"]}
-            <div class="timestamp">{message.get("timestamp", "")}</div>
-        </div>
-        ''', unsafe_allow_html=True)
-    elif message["role"] == "system":
-        st.markdown(f'''
-        <div class="message-system">
-            <strong>System:</strong> {message["content"]}
-        </div>
-        ''', unsafe_allow_html=True)
+# Display chat messages: cached full pages of older history, then the latest messages
+hidden_count, history_pages, recent_messages = st.session_state.renderer.render(
+    st.session_state.conversation.messages, st.session_state.history_pages
+)
+
+# Older messages are either rendered-but-hidden pages or still only in the store
+if hidden_count or st.session_state.conversation.offset:
+    if st.button(f"⬆️ Show older messages ({hidden_count + st.session_state.conversation.offset} hidden)"):
+        if not hidden_count:
+            st.session_state.conversation.load_older(PAGE_SIZE)
+        st.session_state.history_pages += 1
+        st.rerun()
+
+for page_html in history_pages:
+    st.markdown(page_html, unsafe_allow_html=True)
+
+for message_html in recent_messages:
+    st.markdown(message_html, unsafe_allow_html=True)
 
 st.markdown('</div>', unsafe_allow_html=True)
 
+# Replies of the other models to the last compared message
+if st.session_state.last_comparison:
+    comparison = st.session_state.last_comparison
+    st.markdown(f"### ⚖️ Model Comparison: *{comparison['prompt']}*")
+    columns = st.columns(len(comparison['results']))
+    for column, result in zip(columns, comparison['results']):
+        with column:
+            st.markdown(f"**{result['model']}**")
+            cost = f" • ${result['cost']:.5f}" if result['cost'] is not None else ""
+            st.caption(f"⏱️ {result['latency_ms']:.0f} ms • "
+                       f"{result['prompt_tokens'] + result['completion_tokens']} tokens{cost}")
+            if result['error']:
+                st.error(result['error'])
+            else:
+                st.markdown(result['content'])
+    primary, others = comparison['results'][0], [r for r in comparison['results'][1:] if not r['error']]
+    if not primary['error'] and others:
+        scores = [similarity(primary['content'], other['content']) for other in others]
+        st.caption(f"🤝 Reply similarity to {primary['model']}: {sum(scores) / len(scores):.0%}")
+    if st.button("✖️ Hide comparison"):
+        st.session_state.last_comparison = None
+        st.rerun()
+
 # Floating System Prompt Panel
 if st.session_state.get('show_system_prompt', False):
     st.markdown("### 🎯 Quick System Prompt Editor")
@@ -403,8 +527,7 @@ with col_input2:
 with col_input3:
     # Clear chat button
     if st.button("🗑️", help="Clear Chat"):
-        st.session_state.messages = []
-        st.session_state.chat_count = 0
+        reset_chat()
         st.success("Chat cleared!")
         st.rerun()
 
@@ -419,36 +542,55 @@ st.markdown('</div>', unsafe_allow_html=True)
 
 # Handle send button
 if send_button and user_input:
-    # Add user message
+    conversation = st.session_state.conversation
+    conversation.system_prompt = st.session_state.system_prompt
+    conversation.model = model_choice
+    conversation.temperature = temperature
+    conversation.max_tokens = max_tokens
     timestamp = datetime.now().strftime("%H:%M:%S")
-    st.session_state.messages.append({
-        "role": "user", 
-        "content": user_input,
-        "timestamp": timestamp
-    })
-    
-    # Prepare messages for API call
-    api_messages = [{"role": "system", "content": st.session_state.system_prompt}]
-    api_messages.extend([{"role": msg["role"], "content": msg["content"]} for msg in st.session_state.messages])
-    
-    # Get AI response
-    with st.spinner("🤖 AI is thinking..."):
-        ai_response = get_ai_response(api_messages, model_choice, temperature, max_tokens)
-    
-    # Add assistant message
-    st.session_state.messages.append({
-        "role": "assistant", 
-        "content": ai_response,
-        "timestamp": timestamp
-    })
-    
-    st.session_state.chat_count += 1
-    st.rerun()
+
+    # The conversation keeps the turn (possibly partial if the stream failed midway) and stores it;
+    # a question that got no answer is dropped, so errors are never resent to the model
+    ai_response = ""
+    error = None
+    try:
+        if compare_with:
+            question = {"role": "user", "content": user_input, "timestamp": timestamp}
+            # Same request as a normal turn, with older turns compacted to the context budget
+            api_messages = run(conversation.request_messages(question))
+            # All models answer concurrently, so this takes as long as the slowest one
+            with st.spinner(f"🤖 Asking {len(compare_with) + 1} models..."):
+                results = run(fan_out(api_messages, [model_choice] + compare_with, temperature, max_tokens))
+            st.session_state.last_comparison = {'prompt': user_input, 'results': results}
+            if results[0]['error']:
+                raise RuntimeError(results[0]['error'])
+            ai_response = results[0]['content']
+            conversation.add(question, {"role": "assistant", "content": ai_response, "timestamp": timestamp,
+                                        "ttft": None})
+        elif stream_responses:
+            # Render tokens into the assistant bubble as they arrive
+            placeholder = st.empty()
+            for delta in iterate(conversation.stream(user_input, timestamp=timestamp)):
+                ai_response += delta
+                placeholder.markdown(assistant_message_html(ai_response + "▌", timestamp), unsafe_allow_html=True)
+        else:
+            with st.spinner("🤖 AI is thinking..."):
+                ai_response = run(conversation.send(user_input, timestamp=timestamp))
+    except Exception as e:
+        error = e
+
+    if ai_response:
+        st.session_state.chat_count += 1
+    if conversation.conversation_id:
+        st.query_params["conversation"] = conversation.conversation_id
+
+    if error is None:
+        st.rerun()
+    st.error(f"❌ Could not get a response: {str(error)}")
 
 # Handle clear button
 if clear_button:
-    st.session_state.messages = []
-    st.session_state.chat_count = 0
+    reset_chat()
     st.rerun()
 
 # Quick actions
@@ -457,44 +599,81 @@ col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     if st.button("💡 Explain"):
-        if st.session_state.messages:
-            st.session_state.messages.append({
+        if st.session_state.conversation.messages:
+            quick_message = {
                 "role": "user", 
                 "content": "Please explain this in simple terms",
                 "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
+            }
+            add_message(quick_message)
             st.rerun()
 
 with col2:
     if st.button("📝 Summarize"):
-        if st.session_state.messages:
-            st.session_state.messages.append({
+        if st.session_state.conversation.messages:
+            quick_message = {
                 "role": "user", 
                 "content": "Please summarize our conversation",
                 "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
+            }
+            add_message(quick_message)
             st.rerun()
 
 with col3:
     if st.button("🔍 More Details"):
-        if st.session_state.messages:
-            st.session_state.messages.append({
+        if st.session_state.conversation.messages:
+            quick_message = {
                 "role": "user", 
                 "content": "Please provide more details about this topic",
                 "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
+            }
+            add_message(quick_message)
             st.rerun()
 
 with col4:
     if st.button("❓ Ask Question"):
-        if st.session_state.messages:
-            st.session_state.messages.append({
+        if st.session_state.conversation.messages:
+            quick_message = {
                 "role": "user", 
                 "content": "What questions should I ask about this topic?",
                 "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
+            }
+            add_message(quick_message)
             st.rerun()
 
+# Run every model over a fixed prompt set to pick one for a latency target
+with st.expander("⚖️ Compare Models on Sample Prompts", expanded=False):
+    sample_models = st.multiselect("Models:", list(model_options.keys()), default=[model_choice],
+                                   key="sample_models")
+    sample_prompts = st.text_area("Prompts (one per line):", value="\n".join(SAMPLE_PROMPTS), height=150)
+    latency_target = st.number_input("p95 latency target (ms):", min_value=100, max_value=60000, value=3000,
+                                     step=100)
+    if st.button("⚖️ Run Comparison") and sample_models:
+        prompts = [line.strip() for line in sample_prompts.splitlines() if line.strip()]
+        with st.spinner(f"Running {len(prompts) * len(sample_models)} requests in parallel..."):
+            st.session_state.sample_comparison = compare_models(
+                prompts, sample_models, st.session_state.system_prompt, temperature, max_tokens
+            )
+
+    if st.session_state.get('sample_comparison'):
+        sample_comparison = st.session_state.sample_comparison
+        st.dataframe([{
+            'Model': model,
+            'p50 (ms)': round(entry['p50_ms'] or 0),
+            'p95 (ms)': round(entry['p95_ms'] or 0),
+            'Tokens': entry['prompt_tokens'] + entry['completion_tokens'],
+            'Est. cost ($)': round(entry['cost'], 5) if entry['cost'] is not None else None,
+            'Errors': entry['errors'],
+            'Meets target': entry['p95_ms'] is not None and entry['p95_ms'] <= latency_target
+        } for model, entry in sample_comparison['models'].items()], use_container_width=True, hide_index=True)
+        for (a, b), score in sample_comparison['agreement'].items():
+            st.caption(f"🤝 {a} / {b}: {score:.0%} reply similarity")
+        best = recommend(sample_comparison, latency_target)
+        if best:
+            st.success(f"💡 Cheapest model within {latency_target} ms p95: **{best}**")
+        else:
+            st.warning("No model met the latency target without errors")
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The app's modules are imported by name, as when running from the app directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep test runs out of the developer's .cache
+os.environ['METRICS_LOG_PATH'] = ''
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import context
+from context import ConversationContext
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # One token per word, so budgets are easy to reason about
+    monkeypatch.setattr(context, 'count_tokens', lambda text: len(text.split()))
+    monkeypatch.setattr(context, 'MESSAGE_OVERHEAD_TOKENS', 0)
+
+
+class Summarizer:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, summary, turns):
+        self.calls.append((summary, [turn['content'] for turn in turns]))
+        if self.fail:
+            raise RuntimeError("summary failed")
+        return f"summary {len(self.calls)}"
+
+
+def message(i, words=10):
+    return {'role': 'user' if i % 2 == 0 else 'assistant', 'content': ' '.join([f'm{i}'] * words)}
+
+
+def build(ctx, history, system_prompt='be brief'):
+    return asyncio.run(ctx.build_async(system_prompt, history))
+
+
+def test_history_that_fits_is_sent_as_is():
+    summarize = Summarizer()
+    ctx = ConversationContext(budget_tokens=100, summarize=summarize)
+    history = [message(i) for i in range(4)]
+    messages = build(ctx, history)
+    assert messages[1:] == history
+    assert summarize.calls == [] and ctx.summarized == 0
+
+
+def test_compaction_folds_down_to_low_water_and_keeps_recent():
+    summarize = Summarizer()
+    ctx = ConversationContext(budget_tokens=100, summarize=summarize, keep_recent=2, low_water=0.5)
+    history = [message(i) for i in range(10)]
+    messages = build(ctx, history)
+
+    # 2 + 100 tokens: folding stops once system prompt, summary and the rest are at most 50
+    assert ctx.summarized == 6
+    assert summarize.calls == [('', [message(i)['content'] for i in range(6)])]
+    assert messages[1] == {'role': 'system', 'content': 'Summary of the earlier conversation: summary 1'}
+    assert messages[2:] == history[6:]
+
+
+def test_compaction_leaves_headroom_for_several_turns():
+    summarize = Summarizer()
+    ctx = ConversationContext(budget_tokens=200, summarize=summarize, keep_recent=2, low_water=0.5)
+    history = []
+    for i in range(40):
+        history.append(message(i))
+        build(ctx, history)
+    # Each compaction frees about half the budget, i.e. room for several 10-token messages
+    assert 0 < len(summarize.calls) <= 5
+
+
+def test_summary_is_carried_over():
+    summarize = Summarizer()
+    ctx = ConversationContext(budget_tokens=60, summarize=summarize, keep_recent=2, low_water=0.5)
+    history = [message(i) for i in range(7)]
+    build(ctx, history)
+    history += [message(i) for i in range(7, 12)]
+    messages = build(ctx, history)
+
+    assert [summary for summary, _ in summarize.calls] == ['', 'summary 1']
+    assert messages[1]['content'].endswith('summary 2')
+    # Every folded message went into exactly one summary call
+    folded = [turn for _, turns in summarize.calls for turn in turns]
+    assert folded == [msg['content'] for msg in history[:ctx.summarized]]
+
+
+def test_failed_summary_drops_the_folded_turns():
+    ctx = ConversationContext(budget_tokens=60, summarize=Summarizer(fail=True), keep_recent=2, low_water=0.5)
+    history = [message(i) for i in range(7)]
+    messages = build(ctx, history)
+    assert ctx.summary == '' and ctx.summarized > 0
+    assert messages[1:] == history[ctx.summarized:]
+
+
+def test_recent_messages_over_budget_drop_the_oldest():
+    ctx = ConversationContext(budget_tokens=30, summarize=Summarizer(), keep_recent=4)
+    history = [message(i, words=12) for i in range(4)]
+    messages = build(ctx, history)
+    assert sum(len(msg['content'].split()) for msg in messages) <= 30
+    assert messages[-1] == history[-1]
+
+
+def test_cleared_history_resets_the_summary():
+    ctx = ConversationContext(budget_tokens=60, summarize=Summarizer(), keep_recent=2, low_water=0.5)
+    build(ctx, [message(i) for i in range(7)])
+    assert ctx.summary
+    messages = build(ctx, [message(0)])
+    assert ctx.summary == '' and ctx.summarized == 0
+    assert messages[1:] == [message(0)]
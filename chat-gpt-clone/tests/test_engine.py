@@ -0,0 +1,168 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import engine
+from cache import ResponseCache
+from engine import Conversation, iterate, run
+from store import ConversationStore
+
+
+def response(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+                           usage=SimpleNamespace(prompt_tokens=5, completion_tokens=2))
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    # Streams ``parts``, then hangs until cancelled or raises ``error``
+    def __init__(self, parts, error=None, hang=False):
+        self.parts = parts
+        self.error = error
+        self.hang = hang
+        self.closed = False
+
+    async def _chunks(self):
+        for part in self.parts:
+            yield chunk(part)
+        if self.error is not None:
+            raise self.error
+        if self.hang:
+            await asyncio.Event().wait()
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """AsyncOpenAI stand-in: ``answer(request)`` returns a response or a FakeStream, or raises."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.requests.append(request)
+        result = self.answer(request)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ConversationStore(':memory:')
+    monkeypatch.setattr(engine, 'get_store', lambda: store)
+    monkeypatch.setattr(engine, 'get_cache', lambda: ResponseCache(':memory:'))
+    return store
+
+
+def use_client(monkeypatch, answer):
+    client = FakeClient(answer)
+    monkeypatch.setattr(engine, 'get_async_client', lambda: client)
+    return client
+
+
+def stored_messages(store, conversation):
+    return [(msg['role'], msg['content']) for msg in store.messages(conversation.conversation_id)]
+
+
+def test_send_answers_and_stores_the_turn(monkeypatch, store):
+    client = use_client(monkeypatch, lambda request: response("Paris."))
+    conversation = Conversation("Be brief")
+
+    assert run(conversation.send("Capital of France?")) == "Paris."
+    assert client.requests[0]['messages'] == [{'role': 'system', 'content': 'Be brief'},
+                                              {'role': 'user', 'content': 'Capital of France?'}]
+    assert [msg['content'] for msg in conversation.messages] == ["Capital of France?", "Paris."]
+    assert stored_messages(store, conversation) == [('user', 'Capital of France?'), ('assistant', 'Paris.')]
+
+
+def test_run_and_iterate_use_the_engine_loop(monkeypatch, store):
+    threads = []
+
+    def answer(request):
+        threads.append(threading.current_thread().name)
+        return FakeStream(["Hel", "lo"]) if request.get('stream') else response("Hi")
+
+    use_client(monkeypatch, answer)
+    conversation = Conversation()
+    assert run(conversation.send("one")) == "Hi"
+    assert list(iterate(conversation.stream("two"))) == ["Hel", "lo"]
+    assert threads == ['chat-engine', 'chat-engine']
+    assert conversation.last_reply['tokens'] == 2 and not conversation.last_reply['interrupted']
+
+
+def test_failed_turn_is_taken_out_of_the_history(monkeypatch, store):
+    def answer(request):
+        raise ValueError("bad request")
+
+    use_client(monkeypatch, answer)
+    conversation = Conversation()
+    with pytest.raises(ValueError):
+        run(conversation.send("Hello?"))
+    assert conversation.messages == []
+    assert conversation.conversation_id is None
+
+
+def test_cancelled_stream_keeps_the_partial_reply(monkeypatch, store):
+    stream = FakeStream(["Once ", "upon"], hang=True)
+    use_client(monkeypatch, lambda request: stream)
+    conversation = Conversation()
+
+    deltas = []
+    for delta in iterate(conversation.stream("Tell me a story")):
+        deltas.append(delta)
+        if len(deltas) == 2:
+            conversation.cancel()
+
+    assert deltas == ["Once ", "upon"]
+    assert conversation.last_reply['interrupted'] and stream.closed
+    assert conversation.messages[-1]['content'] == "Once upon"
+    assert stored_messages(store, conversation) == [('user', 'Tell me a story'), ('assistant', 'Once upon')]
+
+
+def test_closing_the_stream_early_keeps_the_partial_reply(monkeypatch, store):
+    use_client(monkeypatch, lambda request: FakeStream(["Once ", "upon"], hang=True))
+    conversation = Conversation()
+
+    for delta in iterate(conversation.stream("Tell me a story")):
+        if delta == "upon":
+            break
+
+    assert conversation.last_reply['interrupted']
+    assert [msg['content'] for msg in conversation.messages] == ["Tell me a story", "Once upon"]
+
+
+def test_cancel_before_any_reply_drops_the_question(monkeypatch, store):
+    started = threading.Event()
+
+    async def hang(request):
+        started.set()
+        await asyncio.Event().wait()
+
+    use_client(monkeypatch, hang)
+    conversation = Conversation()
+    threading.Thread(target=lambda: started.wait(5) and conversation.cancel()).start()
+
+    assert run(conversation.send("Hello?")) is None
+    assert conversation.last_reply['interrupted']
+    assert conversation.messages == []
+
+
+def test_stream_error_keeps_what_arrived_and_raises(monkeypatch, store):
+    use_client(monkeypatch, lambda request: FakeStream(["Partial"], error=RuntimeError("connection lost")))
+    conversation = Conversation()
+
+    with pytest.raises(RuntimeError):
+        list(iterate(conversation.stream("Hello?")))
+    assert conversation.messages[-1]['content'] == "Partial"
@@ -0,0 +1,59 @@
+import pytest
+
+import render
+from render import PAGE_SIZE, TranscriptRenderer
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    # Contents of every message rendered to HTML, in order
+    calls = []
+    monkeypatch.setattr(render, 'message_html', lambda message: calls.append(message['content']) or message['content'])
+    return calls
+
+
+def chat(count, start=0):
+    return [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'm{i}'} for i in range(start, start + count)]
+
+
+def test_full_pages_are_rendered_once(rendered):
+    renderer = TranscriptRenderer()
+    messages = chat(2 * PAGE_SIZE + 3)
+    hidden, pages, tail = renderer.render(messages, visible_pages=5)
+    assert hidden == 0 and len(pages) == 2 and tail == ['m40', 'm41', 'm42']
+    assert len(rendered) == len(messages)
+
+    rendered.clear()
+    messages.append({'role': 'user', 'content': 'm43'})
+    renderer.render(messages, visible_pages=5)
+    # Only the growing tail is rendered again
+    assert rendered == ['m40', 'm41', 'm42', 'm43']
+
+
+def test_only_the_visible_pages_are_returned(rendered):
+    hidden, pages, tail = TranscriptRenderer().render(chat(3 * PAGE_SIZE + 1), visible_pages=1)
+    assert hidden == 2 * PAGE_SIZE
+    assert pages == [''.join(f'm{i}' for i in range(2 * PAGE_SIZE, 3 * PAGE_SIZE))]
+    assert tail == [f'm{3 * PAGE_SIZE}']
+
+
+def test_a_new_list_invalidates_the_cache(rendered):
+    renderer = TranscriptRenderer()
+    renderer.render(chat(PAGE_SIZE + 1), visible_pages=5)
+
+    # Same length, different messages (e.g. another conversation was opened)
+    other = chat(PAGE_SIZE + 1, start=100)
+    _, pages, _ = renderer.render(other, visible_pages=5)
+    assert pages == [''.join(f'm{i}' for i in range(100, 100 + PAGE_SIZE))]
+
+
+def test_a_shrunk_list_invalidates_the_cache(rendered):
+    renderer = TranscriptRenderer()
+    messages = chat(2 * PAGE_SIZE)
+    renderer.render(messages, visible_pages=5)
+
+    # Replaced in place with a shorter transcript (e.g. the chat was cleared and restarted)
+    messages[:] = chat(PAGE_SIZE + 1, start=100)
+    _, pages, tail = renderer.render(messages, visible_pages=5)
+    assert pages == [''.join(f'm{i}' for i in range(100, 100 + PAGE_SIZE))]
+    assert tail == [f'm{100 + PAGE_SIZE}']
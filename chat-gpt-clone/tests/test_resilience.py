@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, async_call_with_resilience
+
+
+def api_error(status):
+    response = httpx.Response(status, request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+    error_class = openai.RateLimitError if status == 429 else openai.InternalServerError
+    return error_class(f"HTTP {status}", response=response, body=None)
+
+
+def call_with_resilience(call, **options):
+    return asyncio.run(async_call_with_resilience(call, **options))
+
+
+def failing(error):
+    async def call(timeout):
+        raise error
+    return call
+
+
+async def ok(timeout):
+    return 'ok'
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda attempt, base=1.0, cap=60.0: 0)
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=2, breaker=breaker)
+    assert breaker.state == 'open'
+
+    calls = []
+
+    async def call(timeout):
+        calls.append(timeout)
+
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(call, breaker=breaker)
+    assert calls == []
+
+
+def test_trial_success_closes_and_trial_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=1, breaker=breaker)
+    assert breaker.state == 'half-open'
+
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=1, breaker=breaker)
+    assert breaker.opened_at is not None and not breaker.trial_in_flight
+
+    assert call_with_resilience(ok, breaker=breaker) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_only_one_trial_at_a_time():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_rate_limited_trial_is_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=1, breaker=breaker)
+    with pytest.raises(openai.RateLimitError):
+        call_with_resilience(failing(api_error(429)), max_attempts=1, breaker=breaker)
+
+    for _ in range(3):
+        assert call_with_resilience(ok, breaker=breaker) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_interrupted_trial_is_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    with pytest.raises(KeyboardInterrupt):
+        call_with_resilience(failing(KeyboardInterrupt()), breaker=breaker)
+    assert not breaker.trial_in_flight
+    assert call_with_resilience(ok, breaker=breaker) == 'ok'
+
+
+def test_non_retryable_error_is_raised_without_retry():
+    calls = []
+
+    async def call(timeout):
+        calls.append(timeout)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_with_resilience(call, breaker=CircuitBreaker())
+    assert len(calls) == 1
+
+
+def test_cancelled_trial_is_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def hang(timeout):
+        await asyncio.sleep(60)
+
+    async def cancel_trial():
+        task = asyncio.ensure_future(async_call_with_resilience(hang, breaker=breaker))
+        await asyncio.sleep(0.01)
+        assert breaker.trial_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert not breaker.trial_in_flight
+
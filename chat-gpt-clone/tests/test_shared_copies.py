@@ -0,0 +1,45 @@
+import ast
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+APPS = ('sentiment-analysis-app', 'chat-gpt-clone')
+
+# Code both apps keep a copy of, since each app runs and deploys on its own
+IDENTICAL_FILES = ['cache.py', 'tests/test_cache.py', 'tests/test_metrics.py', 'tests/test_shared_copies.py']
+SHARED_DEFINITIONS = [
+    ({'sentiment-analysis-app': 'metrics.py', 'chat-gpt-clone': 'metrics.py'},
+     ['percentile', 'note_usage', 'RequestMetrics']),
+    ({'sentiment-analysis-app': 'rate_limit.py', 'chat-gpt-clone': 'resilience.py'},
+     ['backoff_delay', 'retry_after_seconds']),
+    ({'sentiment-analysis-app': 'resilience.py', 'chat-gpt-clone': 'resilience.py'},
+     ['is_retryable', 'is_rate_limit', 'api_status']),
+]
+
+
+def read(app, name):
+    path = os.path.join(ROOT, app, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{app} is not checked out next to this app")
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def definitions(source, names):
+    tree = ast.parse(source)
+    return {node.name: ast.get_source_segment(source, node) for node in tree.body
+            if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in names}
+
+
+@pytest.mark.parametrize('name', IDENTICAL_FILES)
+def test_copied_files_match(name):
+    assert read(APPS[0], name) == read(APPS[1], name), f"{name} differs between the apps; change both copies"
+
+
+@pytest.mark.parametrize('files, names', SHARED_DEFINITIONS)
+def test_copied_definitions_match(files, names):
+    first, second = (definitions(read(app, files[app]), names) for app in APPS)
+    assert set(first) == set(names)
+    for name in names:
+        assert first[name] == second.get(name), f"{name} differs between the apps; change both copies"
@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from store import LOCAL_OWNER, ConversationStore
+
+
+@pytest.fixture
+def store():
+    return ConversationStore(':memory:')
+
+
+def chat(store, owner, question, answer='Sure.'):
+    conversation_id = store.create_conversation('Be brief', owner=owner)
+    store.append(conversation_id, [{'role': 'user', 'content': question}, {'role': 'assistant', 'content': answer}])
+    return conversation_id
+
+
+def test_conversations_are_listed_per_owner(store):
+    alice = chat(store, 'alice', 'Plan my trip to Lisbon')
+    bob = chat(store, 'bob', 'Review my cover letter')
+
+    assert [c['id'] for c in store.conversations('alice')] == [alice]
+    assert [c['id'] for c in store.conversations('bob')] == [bob]
+    assert store.conversations(LOCAL_OWNER) == []
+
+
+def test_conversations_are_resumed_only_by_their_owner(store):
+    alice = chat(store, 'alice', 'Plan my trip to Lisbon')
+
+    assert store.conversation(alice, 'bob') is None
+    assert store.resume(alice, 'bob') is None
+    conversation, offset, messages = store.resume(alice, 'alice')
+    assert conversation['owner'] == 'alice' and offset == 0 and len(messages) == 2
+
+
+@pytest.mark.parametrize('fts', [True, False])
+def test_search_only_sees_the_owners_messages(store, fts):
+    store.fts = store.fts and fts
+    alice = chat(store, 'alice', 'What is my bank password hint?')
+    chat(store, 'bob', 'Which password manager is best?')
+
+    assert [m['conversation_id'] for m in store.search('alice', 'password')] == [alice]
+    assert len(store.search('bob', 'password')) == 1
+    assert store.search('carol', 'password') == []
+
+
+def test_conversations_from_before_owners_belong_to_the_terminal_user(tmp_path):
+    path = str(tmp_path / 'conversations.sqlite3')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE conversations (id TEXT PRIMARY KEY, title TEXT NOT NULL, system_prompt TEXT NOT NULL,
+            summary TEXT NOT NULL DEFAULT '', summarized INTEGER NOT NULL DEFAULT 0,
+            message_count INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, updated REAL NOT NULL);
+        INSERT INTO conversations (id, title, system_prompt, message_count, created, updated)
+            VALUES ('old', 'Old chat', 'Be brief', 2, 0, 0);
+    ''')
+    conn.close()
+
+    store = ConversationStore(path)
+    assert [c['id'] for c in store.conversations(LOCAL_OWNER)] == ['old']
+    assert store.conversations('alice') == []
@@ -1,37 +1,21 @@
 import streamlit as st
-import openai
 import os
 
+from cache import get_cache
+from chunking import DEFAULT_CHUNK_TOKENS, classify_long_text
+from classifier import classify_batch, classify_with_fallback
+from history import get_history, new_session_id
+from metrics import metrics
+from prompts import prompt_usage
+from rate_limit import estimate_tokens
+from resilience import api_status
+from semantic_cache import get_semantic_cache
 
+# Analyses per page in the history list
+HISTORY_PAGE_SIZE = 20
 
-def gpt_classify_sentiment(prompt, emotions, model="gpt-3.5-turbo", temperature=0.0, max_tokens=20):
-    system_prompt = f'''You are an emotionally intelligent assistant.
-Classify the sentiment of the user's text with only one of the following emotions: {emotions}
-After classifying the text, respond with the emotion only.'''
-
-    # Create OpenAI client
-    client = openai.OpenAI()
-
-    try:
-        # Make chat completion request with dynamic parameters
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-
-        # Extract the response content
-        result = response.choices[0].message.content.strip()
-
-        return result if result else 'N/A'
-
-    except Exception as e:
-        print(f"Error during classification: {e}")
-        return 'N/A'
+# Rows read per bulk chunk when duplicates are collapsed (duplicates are found within a chunk)
+BULK_DEDUP_ROWS = 500
 
 
 if __name__ == "__main__":
@@ -39,12 +23,17 @@ if __name__ == "__main__":
     # os.environ['OPENAI_API_KEY'] = 'your-openai-api-key-here'
     # Or set it as an environment variable: export OPENAI_API_KEY="your-key-here"
     
-    # Initialize session state for storing analysis history
-    if 'analysis_history' not in st.session_state:
-        st.session_state.analysis_history = []
+    # Analysis history lives in a persistent store; the session only keeps its id.
+    # The id is kept in the URL, so reloading the page keeps the history.
+    if 'history_session' not in st.session_state:
+        st.session_state.history_session = st.query_params.get("history") or new_session_id()
+        st.query_params["history"] = st.session_state.history_session
+    
+    if 'history_page' not in st.session_state:
+        st.session_state.history_page = 0
     
-    if 'total_analyses' not in st.session_state:
-        st.session_state.total_analyses = 0
+    history = get_history()
+    history_session = st.session_state.history_session
     
     # Custom CSS for professional styling
     st.markdown("""
@@ -194,12 +183,136 @@ if __name__ == "__main__":
             step=5,
             help="Maximum number of tokens in the response"
         )
+
+        # Constrained mode: labels only, with confidence from logprobs
+        constrained_labels = st.checkbox(
+            "Constrain output to labels",
+            value=False,
+            help="Restrict the answer to the emotion categories and report confidence from token probabilities. "
+                 "Max tokens is then set automatically."
+        )
         
         st.markdown("---")
         st.markdown("### 📊 Quick Stats")
-        st.metric("API Status", "✅ Connected")
+        st.metric("API Status", api_status())
         st.metric("Selected Model", model_choice)
-        st.metric("Total Analyses", st.session_state.total_analyses)
+        st.metric("Total Analyses", history.count(history_session))
+
+        # Response cache counters (process wide, persisted on disk)
+        cache_stats = get_cache().stats()
+        col_cache1, col_cache2 = st.columns(2)
+        with col_cache1:
+            st.metric("Cache Hits", cache_stats['hits'])
+        with col_cache2:
+            st.metric("Cache Misses", cache_stats['misses'])
+        st.caption(f"🗄️ {cache_stats['entries']} cached responses • {cache_stats['hit_rate']:.0%} hit rate")
+
+        # Semantic cache: labels of near-duplicate texts are reused (0 turns it off). The
+        # cache is shared by every session, so the threshold is per session and passed per call.
+        semantic_cache = get_semantic_cache()
+        semantic_threshold = st.slider(
+            "Semantic Cache Similarity:",
+            min_value=0.0,
+            max_value=1.0,
+            value=float(semantic_cache.threshold),
+            step=0.01,
+            key="semantic_threshold",
+            help="Reuse the label of a previously analysed text at least this similar (about 0.95 works well). "
+                 "0, the default, disables the semantic cache."
+        )
+        if semantic_threshold > 0:
+            semantic_stats = semantic_cache.stats()
+            lookup = (f" • lookup p95 {semantic_stats['lookup_p95_ms']:.1f} ms"
+                      if semantic_stats['lookup_p95_ms'] is not None else "")
+            index = "approximate" if semantic_stats['approximate'] else "exact"
+            st.caption(f"🧲 {semantic_stats['hits']} semantic hits • {semantic_stats['hit_rate']:.0%} hit rate • "
+                       f"{semantic_stats['entries']} texts ({index} index){lookup}")
+
+        # Provider-side prompt caching, as reported in the usage of each response
+        usage_stats = prompt_usage.stats()
+        if usage_stats['prompt_tokens']:
+            st.caption(f"🧩 {usage_stats['cached_tokens']:,} of {usage_stats['prompt_tokens']:,} prompt tokens "
+                       f"served from the prompt cache ({usage_stats['cached_ratio']:.0%})")
+
+        # Request latency percentiles over the recent window (see metrics.py)
+        latency = metrics.summary()
+        if latency['count']:
+            st.markdown("**⏱️ Request Latency**")
+            col_p50, col_p95, col_p99 = st.columns(3)
+            with col_p50:
+                st.metric("p50", f"{latency['p50']:.0f} ms")
+            with col_p95:
+                st.metric("p95", f"{latency['p95']:.0f} ms")
+            with col_p99:
+                st.metric("p99", f"{latency['p99']:.0f} ms")
+            queue = metrics.summary(field='queue_ms')
+            caption = f"{latency['count']} requests"
+            if queue['count']:
+                caption += f" • queue p95 {queue['p95']:.0f} ms"
+            st.caption(caption)
+
+        # Local model tier: answer confident texts in-process, escalate the rest to GPT
+        st.markdown("---")
+        st.markdown("### 🏠 Local Model")
+        use_local_model = st.checkbox(
+            "Try local model first",
+            value=False,
+            help="A small classifier trained on your analysis history answers confident cases without an API call"
+        )
+        local_threshold = st.slider(
+            "Local Confidence Threshold:",
+            min_value=0.5,
+            max_value=1.0,
+            value=0.9,
+            step=0.01,
+            help="Texts below this confidence are sent to the selected OpenAI model"
+        )
+
+        local_model = None
+        if use_local_model:
+            from local_model import LocalSentimentModel
+
+            # Retrain only when the history has changed since the last rerun
+            history_size = history.count(history_session)
+            if st.session_state.get('local_model_trained_on') != history_size:
+                st.session_state.local_model = LocalSentimentModel.from_history(history.entries(history_session))
+                st.session_state.local_model_trained_on = history_size
+            local_model = st.session_state.local_model
+
+            if local_model.ready:
+                st.caption(f"✅ Trained on {history_size} analyses • labels: {', '.join(local_model.labels)}")
+            else:
+                st.caption(f"⏳ Needs at least {local_model.min_examples} GPT-labelled analyses with two or more emotions")
+
+        # Long texts are split and classified chunk by chunk instead of needing an extended-context model
+        st.markdown("---")
+        st.markdown("### 📄 Long Texts")
+        chunk_long_texts = st.checkbox(
+            "Split long texts into chunks",
+            value=True,
+            help="Texts over the chunk budget are split by paragraph and sentence, classified concurrently and "
+                 "combined into one label"
+        )
+        chunk_tokens = st.slider(
+            "Chunk Budget (tokens):",
+            min_value=100,
+            max_value=2000,
+            value=DEFAULT_CHUNK_TOKENS,
+            step=50,
+            disabled=not chunk_long_texts
+        )
+        aggregation_labels = {
+            'length': "Length-weighted vote",
+            'majority': "Majority vote",
+            'confidence': "Confidence-weighted vote"
+        }
+        chunk_aggregation = st.selectbox(
+            "Combine chunk labels by:",
+            list(aggregation_labels),
+            format_func=aggregation_labels.get,
+            disabled=not chunk_long_texts,
+            help="Confidence weighting classifies chunks in constrained mode to get token probabilities"
+        )
         
         # Model performance indicator
         if model_choice.startswith("gpt-4"):
@@ -217,8 +330,8 @@ if __name__ == "__main__":
         # Clear history button
         st.markdown("---")
         if st.button("🗑️ Clear History", help="Clear all analysis history"):
-            st.session_state.analysis_history = []
-            st.session_state.total_analyses = 0
+            history.clear(history_session)
+            st.session_state.history_page = 0
             st.success("History cleared!")
             st.rerun()
     
@@ -249,7 +362,7 @@ if __name__ == "__main__":
         - **For quick analysis**: Use GPT-3.5-turbo
         - **For accuracy**: Use GPT-4 or GPT-4-turbo
         - **For cost efficiency**: Use GPT-3.5-turbo or GPT-4o-mini
-        - **For long texts**: Use GPT-3.5-turbo-16k
+        - **For long texts**: Keep "Split long texts into chunks" on and stay on GPT-3.5-turbo
         """)
     
     # Main content area
@@ -302,29 +415,52 @@ if __name__ == "__main__":
         else:
             with st.spinner("🤖 AI is analyzing your text..."):
                 try:
-                    # Update the function to use the selected parameters
-                    result = gpt_classify_sentiment(
-                        prompt_text, 
-                        emotions_input, 
-                        model=model_choice,
-                        temperature=temperature,
-                        max_tokens=max_tokens
-                    )
+                    long_result = None
+                    if chunk_long_texts and estimate_tokens(prompt_text) > chunk_tokens:
+                        # Map-reduce: classify the chunks concurrently and combine their labels
+                        long_result = classify_long_text(
+                            prompt_text,
+                            emotions_input,
+                            model=model_choice,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            chunk_tokens=chunk_tokens,
+                            method=chunk_aggregation,
+                            semantic_threshold=semantic_threshold
+                        )
+                        result, source = long_result['label'], 'gpt'
+                        distribution = long_result['scores']
+                        confidence = distribution.get(result)
+                    else:
+                        # Update the function to use the selected parameters
+                        result, source, confidence, distribution = classify_with_fallback(
+                            prompt_text,
+                            emotions_input,
+                            local_model,
+                            threshold=local_threshold,
+                            model=model_choice,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            constrained=constrained_labels,
+                            semantic_threshold=semantic_threshold
+                        )
+                    used_model = model_choice if source == 'gpt' else 'local-model'
                     
                     if result != 'N/A':
-                        # Save to session state history
+                        # Save to the persistent history (counters are updated in the same write)
                         import datetime
                         analysis_entry = {
                             'timestamp': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                             'text': prompt_text,
                             'emotions': emotions_input,
                             'result': result,
-                            'model': model_choice,
+                            'model': used_model,
+                            'source': source,
+                            'confidence': confidence,
                             'temperature': temperature,
                             'max_tokens': max_tokens
                         }
-                        st.session_state.analysis_history.append(analysis_entry)
-                        st.session_state.total_analyses += 1
+                        analysis_number = history.add(history_session, analysis_entry)
                         
                         st.markdown('<div class="result-container">', unsafe_allow_html=True)
                         st.markdown("### 🎯 Analysis Result")
@@ -339,7 +475,11 @@ if __name__ == "__main__":
                         
                         with col_result2:
                             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                            st.metric("Confidence", "High", delta=model_choice)
+                            if confidence is not None:
+                                st.metric("Confidence", f"{confidence:.0%}",
+                                          delta="local model" if source == 'local' else model_choice)
+                            else:
+                                st.metric("Confidence", "Unknown", delta=model_choice)
                             st.markdown('</div>', unsafe_allow_html=True)
                         
                         # Detailed analysis
@@ -347,10 +487,26 @@ if __name__ == "__main__":
                         st.write(f"**Original Text:** {prompt_text}")
                         st.write(f"**Emotion Categories:** {emotions_input}")
                         st.write(f"**Detected Emotion:** {result}")
-                        st.write(f"**Model Used:** {model_choice}")
+                        if len(distribution) > 1:
+                            top_labels = list(distribution.items())[:3]
+                            st.write("**Label Probabilities:** " + " • ".join(f"{label} {p:.0%}" for label, p in top_labels))
+                        st.write(f"**Model Used:** {used_model}")
+
+                        if long_result is not None:
+                            # Confidence and probabilities above are the chunks' share of the vote
+                            st.markdown(f"**📄 Chunk Breakdown** ({len(long_result['chunks'])} chunks, "
+                                        f"{aggregation_labels[chunk_aggregation].lower()})")
+                            st.dataframe([{
+                                'Chunk': i,
+                                'Tokens': chunk['tokens'],
+                                'Emotion': chunk['label'],
+                                'Confidence': f"{chunk['confidence']:.0%}" if chunk['confidence'] is not None else '',
+                                'Text': chunk['text'][:120] + ('…' if len(chunk['text']) > 120 else '')
+                            } for i, chunk in enumerate(long_result['chunks'], start=1)],
+                                use_container_width=True, hide_index=True)
                         st.write(f"**Temperature:** {temperature}")
                         st.write(f"**Max Tokens:** {max_tokens}")
-                        st.write(f"**Analysis #:** {st.session_state.total_analyses}")
+                        st.write(f"**Analysis #:** {analysis_number}")
                         
                         # Model performance indicator
                         if model_choice.startswith("gpt-4"):
@@ -365,8 +521,188 @@ if __name__ == "__main__":
                 except Exception as e:
                     st.error(f"❌ Error during analysis: {str(e)}")
     
+    # Bulk analysis section
+    with st.expander("📂 Bulk Analysis (CSV / Parquet)", expanded=False):
+        st.markdown("Upload a file of texts to classify it in chunks. Results are written to disk as they arrive; "
+                    "uploading the same file again with the same settings resumes an interrupted run.")
+
+        uploaded_file = st.file_uploader("Upload texts:", type=["csv", "parquet"])
+
+        if uploaded_file is not None:
+            from bulk import count_rows, input_format, iter_text_chunks, job_output_path, list_columns, run_bulk_job
+            from dedup import classify_unique
+
+            file_data = uploaded_file.getvalue()
+            file_format = input_format(uploaded_file.name)
+            try:
+                columns = list_columns(file_data, file_format)
+            except ImportError:
+                st.error("❌ Reading Parquet files requires pyarrow: pip install pyarrow")
+                columns = []
+
+            if columns:
+                col_bulk1, col_bulk2 = st.columns(2)
+                with col_bulk1:
+                    text_column = st.selectbox("Text column:", columns)
+                with col_bulk2:
+                    chunk_size = st.slider("Rows per request:", min_value=5, max_value=100, value=20, step=5,
+                                           help="Texts packed into each batched classification request")
+
+                dedup_mode = st.radio(
+                    "Duplicate rows:",
+                    ["Classify every row", "Collapse exact duplicates", "Also group near-duplicates"],
+                    index=1,
+                    horizontal=True,
+                    help="Rows that are identical after normalizing case, whitespace and punctuation (or, with "
+                         "near-duplicates, nearly identical) are classified once and share the label"
+                )
+
+                output_path = job_output_path(file_data, uploaded_file.name, emotions_input, model_choice)
+
+                if st.button("🚀 Run Bulk Analysis", use_container_width=True):
+                    total_rows = count_rows(file_data, file_format, text_column)
+                    progress_bar = st.progress(0.0)
+                    progress_text = st.empty()
+
+                    def show_progress(done, total, rows_per_sec):
+                        progress_bar.progress(min(1.0, done / total) if total else 1.0)
+                        progress_text.caption(f"{done:,} / {total:,} rows • {rows_per_sec:,.1f} rows/sec")
+
+                    dedup_totals = {'rows': 0, 'unique': 0, 'exact_duplicates': 0, 'near_duplicates': 0}
+
+                    def classify_bulk_chunk(texts):
+                        classify = lambda unique: classify_batch(unique, emotions_input, model=model_choice,
+                                                                 temperature=temperature, batch_size=chunk_size,
+                                                                 semantic_threshold=semantic_threshold)
+                        if dedup_mode == "Classify every row":
+                            return classify(texts)
+                        labels, groups = classify_unique(texts, classify,
+                                                         near_duplicates=dedup_mode == "Also group near-duplicates")
+                        for field in dedup_totals:
+                            dedup_totals[field] += groups[field]
+                        return labels
+
+                    read_rows = chunk_size if dedup_mode == "Classify every row" else max(chunk_size, BULK_DEDUP_ROWS)
+                    summary = run_bulk_job(
+                        iter_text_chunks(file_data, file_format, text_column, read_rows),
+                        total_rows,
+                        output_path,
+                        classify_bulk_chunk,
+                        on_progress=show_progress
+                    )
+                    progress_bar.progress(1.0)
+
+                    if dedup_totals['rows'] > dedup_totals['unique']:
+                        st.info(f"🧹 {dedup_totals['unique']:,} unique texts classified for {dedup_totals['rows']:,} "
+                                f"rows ({dedup_totals['exact_duplicates']:,} exact and "
+                                f"{dedup_totals['near_duplicates']:,} near duplicates)")
+
+                    if summary['resumed_from']:
+                        st.info(f"↩️ Resumed after {summary['resumed_from']:,} previously completed rows")
+                    if summary['skipped']:
+                        st.info(f"⏭️ {summary['skipped']:,} rows have no text and were skipped")
+                    if summary['failed']:
+                        st.warning(f"⚠️ {summary['failed']:,} rows could not be classified. Run again to retry them.")
+                    st.success(f"✅ {summary['done'] - summary['skipped']:,} of {summary['total']:,} rows classified "
+                               f"({summary['rows_per_sec']:,.1f} rows/sec)")
+
+                if os.path.exists(output_path):
+                    with open(output_path, 'rb') as f:
+                        st.download_button(
+                            label="📥 Download Results",
+                            data=f.read(),
+                            file_name=os.path.basename(output_path),
+                            mime="text/csv"
+                        )
+    
+    # Model comparison: the same texts on several models at once
+    with st.expander("⚖️ Compare Models", expanded=False):
+        st.markdown("Send the same classifications to several models concurrently and compare latency, "
+                    "token usage, cost and agreement, to find the cheapest model that meets a latency target.")
+        from compare import MODEL_PRICES, SAMPLE_DATASET, SAMPLE_EMOTIONS
+
+        compare_choices = st.multiselect(
+            "Models to compare:",
+            list(model_options.keys()),
+            default=[m for m in [model_choice, "gpt-4o-mini"] if m in model_options][:2] or [model_choice]
+        )
+        compare_source = st.radio("Texts:", ["Current text", "Sample dataset", "Upload file"], horizontal=True)
+        compare_slo = st.number_input("Latency target (p95, ms):", min_value=50, max_value=60000, value=1500, step=50)
+
+        compare_texts, compare_labels, compare_emotions = [], None, emotions_input
+        if compare_source == "Current text":
+            compare_texts = [prompt_text] if prompt_text.strip() else []
+        elif compare_source == "Sample dataset":
+            compare_texts, compare_labels = [list(column) for column in zip(*SAMPLE_DATASET)]
+            compare_emotions = SAMPLE_EMOTIONS
+            st.caption(f"{len(compare_texts)} labelled texts • emotions: {SAMPLE_EMOTIONS}")
+        else:
+            compare_file = st.file_uploader("Upload texts to compare on:", type=["csv", "parquet"], key="compare_file")
+            if compare_file is not None:
+                from bulk import input_format, list_columns
+                from compare import read_sample
+
+                compare_data = compare_file.getvalue()
+                compare_format = input_format(compare_file.name)
+                compare_columns = list_columns(compare_data, compare_format)
+                col_cmp1, col_cmp2, col_cmp3 = st.columns(3)
+                with col_cmp1:
+                    compare_text_column = st.selectbox("Text column:", compare_columns, key="compare_text_column")
+                with col_cmp2:
+                    compare_label_column = st.selectbox("Reference label column:", ["(none)"] + compare_columns)
+                with col_cmp3:
+                    compare_limit = st.number_input("Rows:", min_value=1, max_value=1000, value=50)
+                compare_texts, compare_labels = read_sample(
+                    compare_data, compare_format, compare_text_column,
+                    None if compare_label_column == "(none)" else compare_label_column, int(compare_limit)
+                )
+
+        if st.button("⚖️ Run Comparison", use_container_width=True,
+                     disabled=not compare_texts or len(compare_choices) < 2):
+            from compare import compare_models, recommend
+
+            with st.spinner(f"Running {len(compare_texts) * len(compare_choices)} requests..."):
+                comparison = compare_models(compare_texts, compare_emotions, compare_choices, labels=compare_labels,
+                                            temperature=temperature, max_tokens=max_tokens)
+
+            import pandas as pd
+
+            rows = []
+            for name, entry in comparison['models'].items():
+                rows.append({
+                    'Model': name,
+                    'p50 (ms)': round(entry['p50_ms'] or 0),
+                    'p95 (ms)': round(entry['p95_ms'] or 0),
+                    'Tokens': entry['prompt_tokens'] + entry['completion_tokens'],
+                    'Est. cost ($)': entry['cost'],
+                    'Errors': entry['errors'],
+                    'Accuracy': entry.get('accuracy'),
+                    'Meets target': entry['p95_ms'] is not None and entry['p95_ms'] <= compare_slo
+                })
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+            agreement = " • ".join(f"{a} / {b}: {rate:.0%}" for (a, b), rate in comparison['agreement'].items())
+            st.caption(f"🤝 Agreement {agreement} • all models agree on {comparison['consensus']:.0%} of texts")
+
+            best = recommend(comparison, compare_slo)
+            if best:
+                st.success(f"💡 Cheapest model meeting the {compare_slo} ms p95 target: **{best}**")
+            else:
+                st.warning("No model with known pricing met the latency target")
+            if any(name not in MODEL_PRICES for name in compare_choices):
+                st.caption("Cost is only estimated for models with known list prices (see compare.py).")
+
+            # Side by side labels per text
+            side_by_side = {'Text': [text[:80] for text in compare_texts]}
+            if compare_labels is not None:
+                side_by_side['Reference'] = compare_labels
+            for name, entry in comparison['models'].items():
+                side_by_side[name] = entry['labels']
+            st.dataframe(pd.DataFrame(side_by_side), use_container_width=True, hide_index=True)
+    
     # History Section
-    if st.session_state.analysis_history:
+    total_analyses = history.count(history_session)
+    if total_analyses:
         st.markdown("---")
         st.markdown("### 📚 Analysis History")
         
@@ -374,11 +710,25 @@ if __name__ == "__main__":
         tab1, tab2, tab3 = st.tabs(["📋 List View", "📊 Statistics", "📈 Charts"])
         
         with tab1:
-            st.markdown(f"**Total Analyses:** {len(st.session_state.analysis_history)}")
+            st.markdown(f"**Total Analyses:** {total_analyses}")
+            
+            # One page of entries at a time (newest first), read straight from the store
+            page_count = (total_analyses - 1) // HISTORY_PAGE_SIZE + 1
+            st.session_state.history_page = min(st.session_state.history_page, page_count - 1)
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                if st.button("⬅️ Newer", disabled=st.session_state.history_page == 0):
+                    st.session_state.history_page -= 1
+                    st.rerun()
+            with col_page:
+                st.caption(f"Page {st.session_state.history_page + 1} of {page_count}")
+            with col_next:
+                if st.button("Older ➡️", disabled=st.session_state.history_page >= page_count - 1):
+                    st.session_state.history_page += 1
+                    st.rerun()
             
-            # Display history in reverse order (newest first)
-            for i, entry in enumerate(reversed(st.session_state.analysis_history)):
-                with st.expander(f"Analysis #{len(st.session_state.analysis_history) - i} - {entry['timestamp']}"):
+            for entry in history.page(history_session, st.session_state.history_page, HISTORY_PAGE_SIZE):
+                with st.expander(f"Analysis #{entry['number']} - {entry['timestamp']}"):
                     col_h1, col_h2 = st.columns([2, 1])
                     
                     with col_h1:
@@ -389,32 +739,23 @@ if __name__ == "__main__":
                         st.metric("Result", entry['result'])
                         st.caption(f"Model: {entry['model']}")
         
+        # Statistics come from counters maintained on every insert
+        emotions_count = history.counts(history_session, 'result')
+        models_count = history.counts(history_session, 'model')
+        
         with tab2:
-            # Calculate statistics
-            emotions_count = {}
-            models_count = {}
-            
-            for entry in st.session_state.analysis_history:
-                # Count emotions
-                emotion = entry['result']
-                emotions_count[emotion] = emotions_count.get(emotion, 0) + 1
-                
-                # Count models
-                model = entry['model']
-                models_count[model] = models_count.get(model, 0) + 1
-            
             col_stat1, col_stat2 = st.columns(2)
             
             with col_stat1:
                 st.markdown("#### 🎭 Emotion Distribution")
-                for emotion, count in sorted(emotions_count.items(), key=lambda x: x[1], reverse=True):
-                    percentage = (count / len(st.session_state.analysis_history)) * 100
+                for emotion, count in emotions_count.items():
+                    percentage = (count / total_analyses) * 100
                     st.write(f"**{emotion}:** {count} ({percentage:.1f}%)")
             
             with col_stat2:
                 st.markdown("#### 🤖 Model Usage")
                 for model, count in models_count.items():
-                    percentage = (count / len(st.session_state.analysis_history)) * 100
+                    percentage = (count / total_analyses) * 100
                     st.write(f"**{model}:** {count} ({percentage:.1f}%)")
         
         with tab3:
@@ -430,6 +771,14 @@ if __name__ == "__main__":
             models_df = pd.DataFrame(list(models_count.items()), columns=['Model', 'Count'])
             st.markdown("#### Model Usage Chart")
             st.bar_chart(models_df.set_index('Model'))
+            
+            # Emotions over time, summed from the stored hourly buckets
+            st.markdown("#### Emotions Over Time")
+            bucket_label = st.radio("Bucket size:", ["Hour", "Day"], horizontal=True)
+            timeline = history.timeline(history_session, 3600 if bucket_label == "Hour" else 86400)
+            timeline_df = pd.DataFrame(timeline, columns=['Time', 'Emotion', 'Count'])
+            timeline_df['Time'] = pd.to_datetime(timeline_df['Time'], unit='s')
+            st.bar_chart(timeline_df.pivot(index='Time', columns='Emotion', values='Count').fillna(0))
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,300 @@
+"""Offline sentiment jobs through the OpenAI Batch API.
+
+Examples:
+    python batch_job.py submit reviews.csv --text-field review -o labelled.jsonl
+    python batch_job.py status -o labelled.jsonl
+    python batch_job.py collect -o labelled.jsonl --wait
+    python batch_job.py run reviews.jsonl --id-field review_id -o labelled.jsonl   # submit, wait, collect
+
+Classification requests are written in the batch input format (one chat
+completion per line, ``custom_id`` = row id), uploaded and submitted in
+batches of at most 50,000 requests. The job state is kept next to the
+output (``<output>.batch.json``), so status and collect can run from a
+later process. Texts that are duplicates after normalization are requested
+once, and texts already in the response cache are not requested at all.
+Submitting the same job again also skips the rows the last collect wrote
+with a label (the cache only holds temperature 0 answers), so it only sends
+the rows that are still missing. The state lists every batch of the job, and submitting
+is refused while a batch has not been collected, so no results are lost.
+Uploads and batch creation are not retried (a retry could submit the same
+requests twice); if one fails, collect what was submitted and submit
+again. To try it without an API key, start
+``benchmarks/mock_openai.py`` and point OPENAI_BASE_URL at it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from classifier import cached_sentiment, match_label, store_sentiment
+from cli import DEFAULT_EMOTIONS, detect_format, iter_records
+from client import get_client
+from dedup import deduplicate
+from prompts import parse_emotions, sentiment_system_message
+from resilience import DEFAULT_TIMEOUT, call_with_resilience
+
+ENDPOINT = '/v1/chat/completions'
+MAX_BATCH_REQUESTS = 50000
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+# Settings that identify a job; resubmitting with the same ones extends it
+JOB_FIELDS = ('input', 'format', 'text_field', 'id_field', 'emotions', 'model', 'temperature')
+
+
+def state_path(output):
+    return f"{output}.batch.json"
+
+
+def load_rows(path, fmt, text_field, id_field):
+    """(records, row ids, texts) from a JSONL or CSV file; ids default to the row number."""
+    with open(path, newline='', encoding='utf-8') as f:
+        first_line = f.readline()
+        f.seek(0)
+        records = list(iter_records(f, fmt if fmt != 'auto' else detect_format(path, first_line)))
+    ids = [str(record[id_field]) if id_field and record.get(id_field) not in (None, '') else str(i)
+           for i, record in enumerate(records)]
+    if len(set(ids)) != len(ids):
+        raise SystemExit(f"Row ids in '{id_field}' are not unique; results could not be matched back")
+    return records, ids, [str(record.get(text_field) or '') for record in records]
+
+
+def request_line(custom_id, text, emotions, model, temperature, max_tokens):
+    # Same request the synchronous path sends for one text
+    return {
+        'custom_id': custom_id,
+        'method': 'POST',
+        'url': ENDPOINT,
+        'body': {
+            'model': model,
+            'messages': [sentiment_system_message(emotions), {'role': 'user', 'content': text}],
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+    }
+
+
+def parse_results(content, labels):
+    # {custom_id: label} for the successful lines of a batch output file. Failed,
+    # malformed and off-label lines stay unclassified, so submitting again retries them.
+    results = {}
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            response = row.get('response') or {}
+            if response.get('status_code') != 200:
+                continue
+            label = match_label(response['body']['choices'][0]['message']['content'] or '', labels)
+            custom_id = row['custom_id']
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            print(f"Skipping malformed batch output line {line_number}: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+        if label is not None:
+            results[custom_id] = label
+    return results
+
+
+def labelled_rows(output, label_field, rows):
+    # Positions of the rows the last collect wrote with a label; collect writes every row in input order
+    try:
+        with open(output, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except (FileNotFoundError, ValueError):
+        return set()
+    if len(records) != rows:
+        return set()
+    return {i for i, record in enumerate(records)
+            if isinstance(record, dict) and record.get(label_field) not in (None, '', 'N/A')}
+
+
+def upload(client, path):
+    # A single attempt: a retried upload whose first try went through would leave a duplicate file
+    with open(path, 'rb') as f:
+        return client.files.create(file=f, purpose='batch', timeout=DEFAULT_TIMEOUT)
+
+
+def submit(args):
+    state = {
+        'input': os.path.abspath(args.input),
+        'format': args.format,
+        'text_field': args.text_field,
+        'id_field': args.id_field,
+        'label_field': args.label_field,
+        'emotions': args.emotions,
+        'model': args.model,
+        'temperature': args.temperature
+    }
+    previous = load_state(args.output, required=False)
+    if previous is not None:
+        waiting = [batch['id'] for batch in previous['batches'] if not batch.get('collected')]
+        if waiting:
+            raise SystemExit(f"Batches {', '.join(waiting)} of this job have not been collected yet; run collect "
+                             f"first, or delete {state_path(args.output)} to abandon them")
+
+    # The same job keeps its earlier batches, whose results are merged again on collect
+    same_job = previous is not None and all(previous.get(field) == state[field] for field in JOB_FIELDS)
+
+    records, ids, texts = load_rows(args.input, args.format, args.text_field, args.id_field)
+    groups = deduplicate(texts)
+    labelled = labelled_rows(args.output, args.label_field, len(records)) if same_job else set()
+    requests = [(ids[row], texts[row]) for row in groups['representatives'] if row not in labelled
+                and cached_sentiment(texts[row], args.emotions, args.model, args.temperature) is None]
+
+    batches = previous['batches'] if same_job else []
+    state.update(rows=len(records), batches=batches, submitted=time.time())
+    save_state(args.output, state)
+
+    client = get_client()
+    new_batches = 0
+    for number, start in enumerate(range(0, len(requests), MAX_BATCH_REQUESTS), start=len(batches)):
+        chunk = requests[start:start + MAX_BATCH_REQUESTS]
+        path = f"{args.output}.requests-{number}.jsonl"
+        with open(path, 'w', encoding='utf-8') as f:
+            for custom_id, text in chunk:
+                line = request_line(custom_id, text, args.emotions, args.model, args.temperature, args.max_tokens)
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+        uploaded = upload(client, path)
+        # Not retried either: a retry after a lost response would run the requests twice
+        batch = client.batches.create(input_file_id=uploaded.id, endpoint=ENDPOINT, completion_window='24h',
+                                      metadata={'job': os.path.basename(args.output), 'part': str(number)},
+                                      timeout=DEFAULT_TIMEOUT)
+        # Saved at once, so a failure on a later batch does not lose this one
+        batches.append({'id': batch.id, 'input_file_id': uploaded.id, 'requests': len(chunk)})
+        save_state(args.output, state)
+        new_batches += 1
+        print(batch.id)
+
+    print(f"Submitted {len(requests)} requests for {len(records)} rows in {new_batches} batch(es) "
+          f"({groups['exact_duplicates']} duplicates, {groups['unique'] - len(requests)} cached or already labelled)",
+          file=sys.stderr)
+    return 0
+
+
+def load_state(output, required=True):
+    try:
+        with open(state_path(output), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        if not required:
+            return None
+        raise SystemExit(f"No batch job for {output}; run submit first")
+
+
+def save_state(output, state):
+    with open(state_path(output), 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+
+def retrieve(client, state):
+    return [call_with_resilience(lambda timeout, batch_id=batch['id']: client.batches.retrieve(batch_id, timeout=timeout))
+            for batch in state['batches']]
+
+
+def print_status(batches):
+    for batch in batches:
+        counts = batch.request_counts
+        progress = f"{counts.completed + counts.failed}/{counts.total} done, {counts.failed} failed" if counts else ""
+        print(f"{batch.id}: {batch.status} {progress}", file=sys.stderr)
+
+
+def status(args):
+    print_status(retrieve(get_client(), load_state(args.output)))
+    return 0
+
+
+def collect(args):
+    state = load_state(args.output)
+    client = get_client()
+    while True:
+        batches = retrieve(client, state)
+        if all(batch.status in TERMINAL_STATUSES for batch in batches):
+            break
+        if not args.wait:
+            print_status(batches)
+            print("Not finished yet; run collect again later or pass --wait", file=sys.stderr)
+            return 2
+        time.sleep(args.poll_seconds)
+    print_status(batches)
+
+    labels = parse_emotions(state['emotions'])
+    results = {}
+    for batch in batches:
+        if batch.output_file_id:
+            content = call_with_resilience(lambda timeout, file_id=batch.output_file_id: client.files.content(
+                file_id, timeout=timeout)).text
+            results.update(parse_results(content, labels))
+
+    # Fan the results out to every row, keyed by row id, in input order
+    records, ids, texts = load_rows(state['input'], state['format'], state['text_field'], state['id_field'])
+    if len(records) != state['rows']:
+        raise SystemExit(f"{state['input']} changed since the job was submitted")
+    groups = deduplicate(texts)
+    emotions, model, temperature = state['emotions'], state['model'], state['temperature']
+    for row in groups['representatives']:
+        if ids[row] in results:
+            store_sentiment(texts[row], emotions, model, temperature, results[ids[row]])
+
+    failed = 0
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for record, position in zip(records, groups['assignments']):
+            label = 'N/A'
+            if position is not None:
+                row = groups['representatives'][position]
+                label = results.get(ids[row]) or cached_sentiment(texts[row], emotions, model, temperature) or 'N/A'
+            record[state['label_field']] = label
+            failed += label == 'N/A'
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    for batch in state['batches']:
+        batch['collected'] = True
+    save_state(args.output, state)
+
+    print(f"Wrote {len(records)} records to {args.output}, {failed} unclassified", file=sys.stderr)
+    if failed:
+        print("Submit the job again to retry only the unclassified rows", file=sys.stderr)
+    return 1 if records and failed == len(records) else 0
+
+
+def run(args):
+    submit(args)
+    args.wait = True
+    return collect(args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Classify JSONL or CSV records with the OpenAI Batch API.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name in ('submit', 'run'):
+        command = commands.add_parser(name, help="Write and submit the batch requests" if name == 'submit'
+                                      else "Submit, wait for completion and collect the results")
+        command.add_argument('input', help="Input JSONL or CSV file")
+        command.add_argument('--format', choices=['auto', 'jsonl', 'csv'], default='auto', help="Input format")
+        command.add_argument('--text-field', default='text', help="Field or column holding the text")
+        command.add_argument('--id-field', help="Field holding a unique row id (default: row number)")
+        command.add_argument('--label-field', default='emotion', help="Field added to each output record")
+        command.add_argument('--emotions', default=DEFAULT_EMOTIONS, help="Comma separated emotion categories")
+        command.add_argument('--model', default='gpt-3.5-turbo')
+        command.add_argument('--temperature', type=float, default=0.0)
+        command.add_argument('--max-tokens', type=int, default=20)
+
+    commands.add_parser('status', help="Show the progress of the submitted batches")
+    commands.add_parser('collect', help="Download finished results and merge them into the output")
+
+    for name, command in commands.choices.items():
+        command.add_argument('-o', '--output', required=True, help="Output JSONL file; the job state is kept beside it")
+        if name == 'collect':
+            command.add_argument('--wait', action='store_true', help="Poll until every batch has finished")
+        if name in ('collect', 'run'):
+            command.add_argument('--poll-seconds', type=float, default=30.0, help="Delay between status checks")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return {'submit': submit, 'status': status, 'collect': collect, 'run': run}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import csv
+import hashlib
+import io
+import os
+import time
+
+BULK_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bulk_results')
+OUTPUT_COLUMNS = ['row_id', 'text', 'emotion']
+
+
+def input_format(filename):
+    return 'parquet' if filename.lower().endswith('.parquet') else 'csv'
+
+
+def list_columns(data, fmt):
+    # Column names only, without loading the rows
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(io.BytesIO(data)).schema_arrow.names
+    import pandas as pd
+    return list(pd.read_csv(io.BytesIO(data), nrows=0).columns)
+
+
+def count_rows(data, fmt, text_column):
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(io.BytesIO(data)).metadata.num_rows
+    import pandas as pd
+    return sum(len(chunk) for chunk in pd.read_csv(io.BytesIO(data), usecols=[text_column], chunksize=10000))
+
+
+def iter_text_chunks(data, fmt, text_column, chunk_size):
+    """Yield (first_row_id, texts) for consecutive chunks of the input file."""
+    row_id = 0
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(io.BytesIO(data)).iter_batches(batch_size=chunk_size, columns=[text_column])
+        chunks = (batch.column(0).to_pylist() for batch in batches)
+    else:
+        import pandas as pd
+        readers = pd.read_csv(io.BytesIO(data), usecols=[text_column], chunksize=chunk_size, dtype=str)
+        chunks = (frame[text_column].tolist() for frame in readers)
+
+    for texts in chunks:
+        yield row_id, ['' if text is None or text != text else str(text) for text in texts]
+        row_id += len(texts)
+
+
+def job_output_path(data, filename, emotions, model, results_dir=BULK_RESULTS_DIR):
+    # Same file + settings map to the same output, which is what makes a job resumable
+    digest = hashlib.sha256(data)
+    digest.update(f"\0{emotions}\0{model}".encode('utf-8'))
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(results_dir, f"{stem}_{digest.hexdigest()[:12]}.csv")
+
+
+def truncate_partial_row(output_path):
+    """Cut a half-written last row (left by a crash) off the output.
+
+    Appending after it would glue the next row onto it. The file is cut
+    back to its last line break outside a quoted field, since texts may
+    contain line breaks of their own.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        end = len(data)
+        quotes = data.count(b'"')
+        while end and not (data.endswith(b'\n', 0, end) and quotes % 2 == 0):
+            cut = data.rfind(b'\n', 0, end - 1) + 1
+            quotes -= data.count(b'"', cut, end)
+            end = cut
+        if end < len(data):
+            f.truncate(end)
+
+
+def completed_row_ids(output_path):
+    """Row ids already written by a previous run, and those of them skipped as empty."""
+    done, skipped = set(), set()
+    if not os.path.exists(output_path):
+        return done, skipped
+    with open(output_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                row_id = int(row['row_id'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            done.add(row_id)
+            if not row.get('emotion'):
+                skipped.add(row_id)
+    return done, skipped
+
+
+def run_bulk_job(chunks, total_rows, output_path, classify_chunk, on_progress=None):
+    """Classify ``chunks`` and append the results to ``output_path`` as they arrive.
+
+    Rows already present in the output are skipped, so calling this again
+    after a crash resumes where the previous run stopped. Rows classified as
+    'N/A' are not written and will be retried by the next run. Rows with no
+    text are written with an empty emotion and counted as skipped, since
+    retrying them cannot help.
+    Returns a dict with done/skipped/failed/total counts and the throughput.
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    truncate_partial_row(output_path)
+    done, skipped = completed_row_ids(output_path)
+    already_done = len(done)
+    failed = 0
+    started = time.perf_counter()
+
+    write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    with open(output_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(OUTPUT_COLUMNS)
+
+        for first_row_id, texts in chunks:
+            pending = []
+            for row_id, text in enumerate(texts, start=first_row_id):
+                if row_id in done:
+                    continue
+                if not text.strip():
+                    writer.writerow([row_id, text, ''])
+                    done.add(row_id)
+                    skipped.add(row_id)
+                else:
+                    pending.append((row_id, text))
+
+            labels = classify_chunk([text for _, text in pending]) if pending else []
+            for (row_id, text), label in zip(pending, labels):
+                if label == 'N/A':
+                    failed += 1
+                    continue
+                writer.writerow([row_id, text, label])
+                done.add(row_id)
+            # Flush per chunk so a crash loses at most the chunk in flight
+            f.flush()
+
+            if on_progress is not None:
+                processed = len(done) - already_done + failed
+                elapsed = time.perf_counter() - started
+                on_progress(len(done) + failed, total_rows, processed / elapsed if elapsed > 0 else 0.0)
+
+    elapsed = time.perf_counter() - started
+    processed = len(done) - already_done + failed
+    return {
+        'done': len(done),
+        'skipped': len(skipped),
+        'resumed_from': already_done,
+        'failed': failed,
+        'total': total_rows,
+        'rows_per_sec': processed / elapsed if elapsed > 0 else 0.0
+    }
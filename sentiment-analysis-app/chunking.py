@@ -0,0 +1,122 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from classifier import classify_concurrent, classify_with_confidence
+from rate_limit import estimate_tokens, get_rate_limiter
+
+# Chunk size that keeps every request well inside the 4k context of gpt-3.5-turbo
+DEFAULT_CHUNK_TOKENS = 500
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+# CJK sentence ends are usually not followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|(?<=[。！？])\s*')
+
+AGGREGATIONS = ('length', 'majority', 'confidence')
+
+
+def _split_words(sentence, max_tokens):
+    # Last resort for a single sentence longer than the budget. Words longer
+    # than the budget (CJK text, URLs, base64) are cut by characters.
+    width = max_tokens * 4
+    words = [word[i:i + width] for word in sentence.split() for i in range(0, len(word), width)]
+    pieces, current = [], []
+    for word in words:
+        if current and estimate_tokens(' '.join(current + [word])) > max_tokens:
+            pieces.append(' '.join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(' '.join(current))
+    return pieces
+
+
+def split_text(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Split ``text`` into chunks of at most ``max_tokens`` (estimated).
+
+    Paragraphs are kept whole when they fit, otherwise split into sentences,
+    and only a sentence longer than the budget is cut between words (or
+    inside a word that alone is over the budget).
+    Consecutive pieces are then packed greedily up to the budget.
+    """
+    pieces = []
+    for paragraph in PARAGRAPH_BREAK.split(text or ''):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(('\n\n', paragraph))
+            continue
+        for i, sentence in enumerate(filter(None, SENTENCE_END.split(paragraph))):
+            separator = '\n\n' if i == 0 else ' '
+            if estimate_tokens(sentence) <= max_tokens:
+                pieces.append((separator, sentence))
+            else:
+                pieces.extend((separator if j == 0 else ' ', part)
+                              for j, part in enumerate(_split_words(sentence, max_tokens)))
+
+    chunks, current = [], ''
+    for separator, piece in pieces:
+        candidate = current + separator + piece if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            candidate = piece
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def aggregate_labels(chunks, method='length'):
+    """Combine per-chunk labels into a document label.
+
+    ``chunks`` are dicts with label, tokens and confidence. Each chunk votes
+    for its label with weight 1 ('majority'), its length in tokens
+    ('length') or its length times its confidence ('confidence'; chunks
+    without a confidence count with their length). Failed chunks do not
+    vote. Returns (label or 'N/A', {label: share of the vote}), largest first.
+    """
+    votes = {}
+    for chunk in chunks:
+        if chunk['label'] == 'N/A':
+            continue
+        weight = 1.0 if method == 'majority' else float(chunk['tokens'])
+        if method == 'confidence' and chunk.get('confidence') is not None:
+            weight *= chunk['confidence']
+        votes[chunk['label']] = votes.get(chunk['label'], 0.0) + weight
+
+    total = sum(votes.values())
+    if not total:
+        return 'N/A', {}
+    scores = dict(sorted(((label, weight / total) for label, weight in votes.items()), key=lambda item: -item[1]))
+    return next(iter(scores)), scores
+
+
+def classify_long_text(text, emotions, model="gpt-3.5-turbo", temperature=0.0, max_tokens=20,
+                       chunk_tokens=DEFAULT_CHUNK_TOKENS, method='length', workers=8, limiter=None,
+                       semantic_threshold=None):
+    """Classify a long document chunk by chunk and aggregate the labels.
+
+    Chunks are classified concurrently: with ``classify_concurrent`` (rate
+    limited through ``limiter`` or the process-wide limiter, cached) or, for
+    confidence weighting, with ``classify_with_confidence``. Returns a dict
+    with the document ``label``, the aggregated ``scores`` and the per-chunk
+    breakdown (text, tokens, label, confidence).
+    """
+    texts = split_text(text, chunk_tokens)
+    if method == 'confidence':
+        limiter = limiter or get_rate_limiter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda chunk: classify_with_confidence(
+                chunk, emotions, model=model, temperature=temperature, limiter=limiter), texts))
+        labels = [label for label, _, _ in results]
+        confidences = [confidence for _, confidence, _ in results]
+    else:
+        labels = classify_concurrent(texts, emotions, model=model, temperature=temperature, max_tokens=max_tokens,
+                                     workers=workers, limiter=limiter,
+                                     semantic_threshold=semantic_threshold) if texts else []
+        confidences = [None] * len(texts)
+
+    chunks = [{'text': chunk, 'tokens': estimate_tokens(chunk), 'label': label, 'confidence': confidence}
+              for chunk, label, confidence in zip(texts, labels, confidences)]
+    label, scores = aggregate_labels(chunks, method)
+    return {'label': label, 'scores': scores, 'chunks': chunks}
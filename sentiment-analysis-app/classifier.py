@@ -0,0 +1,373 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_cache
+from client import get_client
+from constraints import TOP_LOGPROBS, label_constraints, label_distribution, resolve_label
+from metrics import metrics, note_usage
+from prompts import batch_system_message, parse_emotions, prompt_usage, sentiment_system_message
+from rate_limit import backoff_delay, estimate_tokens, get_rate_limiter, retry_after_seconds
+from resilience import DEFAULT_MAX_ATTEMPTS, create_completion
+from semantic_cache import get_semantic_cache, semantic_namespace
+
+# Classification answers are short, so a request still pending after this many
+# seconds is likely stuck; a hedged duplicate is sent to cut tail latency
+HEDGE_AFTER = 3.0
+
+# Batched requests produce longer answers and get a longer timeout
+BATCH_TIMEOUT = 60.0
+
+
+def request_sentiment(client, prompt, emotions, model, temperature, max_tokens,
+                      max_attempts=DEFAULT_MAX_ATTEMPTS, hedge_after=HEDGE_AFTER):
+    # Make chat completion request with dynamic parameters, letting API errors propagate
+    response = create_completion(
+        client,
+        max_attempts=max_attempts,
+        hedge_after=hedge_after,
+        model=model,
+        messages=[
+            sentiment_system_message(emotions),
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens,
+        temperature=temperature
+    )
+    prompt_usage.record(response.usage)
+    note_usage(response.usage)
+
+    # Extract the response content
+    result = response.choices[0].message.content.strip()
+
+    return result if result else 'N/A'
+
+
+def sentiment_cache_request(text, emotions, model, temperature):
+    # Normalized request used as the cache key: whitespace and label order/case don't matter
+    return {
+        'task': 'sentiment',
+        'text': ' '.join(text.split()),
+        'emotions': sorted(label.lower() for label in parse_emotions(emotions)),
+        'model': model,
+        'temperature': temperature
+    }
+
+
+def cached_sentiment(text, emotions, model, temperature, semantic_threshold=None):
+    # Only deterministic (temperature 0) answers are served from the cache.
+    # semantic_threshold overrides the semantic cache's own threshold for this call.
+    if temperature != 0:
+        return None
+    request = sentiment_cache_request(text, emotions, model, temperature)
+    cached = get_cache().get(request)
+    if cached is None:
+        # Near-duplicates of texts already labelled (casing, emojis, small rewording)
+        semantic_cache = get_semantic_cache()
+        if semantic_cache.threshold_for(semantic_threshold) > 0:
+            cached = semantic_cache.get(semantic_namespace(request['emotions'], model), text, semantic_threshold)
+    return cached
+
+
+def store_sentiment(text, emotions, model, temperature, result, semantic_threshold=None):
+    if temperature == 0 and result != 'N/A':
+        request = sentiment_cache_request(text, emotions, model, temperature)
+        get_cache().set(request, result)
+        semantic_cache = get_semantic_cache()
+        if semantic_cache.threshold_for(semantic_threshold) > 0:
+            semantic_cache.set(semantic_namespace(request['emotions'], model), text, result)
+
+
+def gpt_classify_sentiment(prompt, emotions, model="gpt-3.5-turbo", temperature=0.0, max_tokens=20, client=None,
+                           semantic_threshold=None):
+    with metrics.track('classify', model=model) as record:
+        cached = cached_sentiment(prompt, emotions, model, temperature, semantic_threshold)
+        if cached is not None:
+            record['cache_hit'] = True
+            return cached
+
+        # Use the shared, connection-pooled client unless the caller passes one
+        if client is None:
+            client = get_client()
+
+        try:
+            result = request_sentiment(client, prompt, emotions, model, temperature, max_tokens)
+            store_sentiment(prompt, emotions, model, temperature, result, semantic_threshold)
+            return result
+
+        except Exception as e:
+            print(f"Error during classification: {e}")
+            record['error'] = type(e).__name__
+            return 'N/A'
+
+
+def classify_with_confidence(prompt, emotions, model="gpt-3.5-turbo", temperature=0.0, client=None, limiter=None):
+    """Classify with the output restricted to the configured emotion labels.
+
+    Label tokens are boosted with logit bias and max_tokens is capped to the
+    longest label, so the answer is always resolvable to a label. The top
+    logprobs of the first token give a probability distribution over the
+    labels at no extra request. Requests wait for ``limiter`` when one is
+    given. Returns (label, confidence, distribution), or ('N/A', None, {})
+    on failure.
+    """
+    labels = tuple(parse_emotions(emotions))
+    if not labels:
+        return 'N/A', None, {}
+
+    with metrics.track('classify_constrained', model=model) as record:
+        cache_request = dict(sentiment_cache_request(prompt, labels, model, temperature), task='sentiment-constrained')
+        if temperature == 0:
+            cached = get_cache().get(cache_request)
+            if cached is not None:
+                record['cache_hit'] = True
+                label, confidence, distribution = json.loads(cached)
+                return label, confidence, distribution
+
+        if client is None:
+            client = get_client()
+
+        logit_bias, max_tokens = label_constraints(labels, model)
+        options = {'logit_bias': logit_bias} if logit_bias else {}
+        if limiter is not None:
+            cost = estimate_tokens(sentiment_system_message(labels)["content"]) + estimate_tokens(prompt) + max_tokens
+            record['queue_ms'] = limiter.acquire(cost) * 1000
+
+        try:
+            response = create_completion(
+                client,
+                hedge_after=HEDGE_AFTER,
+                model=model,
+                messages=[
+                    sentiment_system_message(labels),
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                logprobs=True,
+                top_logprobs=TOP_LOGPROBS,
+                **options
+            )
+        except Exception as e:
+            print(f"Error during classification: {e}")
+            record['error'] = type(e).__name__
+            return 'N/A', None, {}
+        prompt_usage.record(response.usage)
+        note_usage(response.usage)
+
+    choice = response.choices[0]
+    distribution = {}
+    if choice.logprobs and choice.logprobs.content:
+        distribution = label_distribution(choice.logprobs.content[0].top_logprobs, labels)
+
+    label = resolve_label(choice.message.content, labels)
+    if label is None and distribution:
+        label = next(iter(distribution))
+    if label is None:
+        return 'N/A', None, {}
+
+    confidence = distribution.get(label)
+    if temperature == 0:
+        get_cache().set(cache_request, json.dumps([label, confidence, distribution]))
+    return label, confidence, distribution
+
+
+def classify_with_fallback(prompt, emotions, local_model, threshold=0.9, model="gpt-3.5-turbo",
+                           temperature=0.0, max_tokens=20, constrained=False, semantic_threshold=None):
+    """Answer confident cases with the local model and escalate the rest to GPT.
+
+    Returns (label, source, confidence, distribution) where source is 'local'
+    or 'gpt'. For GPT answers confidence and distribution are only known in
+    ``constrained`` mode (see ``classify_with_confidence``).
+    """
+    if local_model is not None:
+        label, confidence = local_model.predict(prompt)
+        label = match_label(label, parse_emotions(emotions)) if label else None
+        if label is not None and confidence >= threshold:
+            return label, 'local', confidence, {label: confidence}
+
+    if constrained:
+        label, confidence, distribution = classify_with_confidence(prompt, emotions, model=model, temperature=temperature)
+        return label, 'gpt', confidence, distribution
+
+    result = gpt_classify_sentiment(prompt, emotions, model=model, temperature=temperature, max_tokens=max_tokens,
+                                    semantic_threshold=semantic_threshold)
+    return result, 'gpt', None, {}
+
+
+def classify_concurrent(texts, emotions, model="gpt-3.5-turbo", temperature=0.0, max_tokens=20,
+                        workers=8, requests_per_minute=3500, tokens_per_minute=90000, max_attempts=5, limiter=None,
+                        semantic_threshold=None):
+    """Classify texts one request each, with ``workers`` requests in flight.
+
+    All workers share one client and one rate limiter, so the pool stays within
+    the requests-per-minute and tokens-per-minute budgets and backs off together
+    on 429 responses. The limiter is the process-wide one for those budgets
+    unless ``limiter`` is given, so consecutive and concurrent calls share it.
+    Returns a list of labels aligned with ``texts``.
+    """
+    from openai import RateLimitError
+
+    # The limiter owns retry timing on 429s, so each request is a single attempt
+    client = get_client()
+    limiter = limiter or get_rate_limiter(requests_per_minute, tokens_per_minute)
+    prompt_tokens = estimate_tokens(sentiment_system_message(emotions)["content"])
+
+    def classify_one(text):
+        if not text or not text.strip():
+            return 'N/A'
+
+        with metrics.track('classify', model=model, queue_ms=0.0) as record:
+            cached = cached_sentiment(text, emotions, model, temperature, semantic_threshold)
+            if cached is not None:
+                record['cache_hit'] = True
+                return cached
+
+            cost = prompt_tokens + estimate_tokens(text) + max_tokens
+            for attempt in range(max_attempts):
+                record['retries'] = attempt
+                record['queue_ms'] += limiter.acquire(cost) * 1000
+                try:
+                    # No hedging here: the pool already keeps the quota busy
+                    result = request_sentiment(client, text, emotions, model, temperature, max_tokens,
+                                               max_attempts=1, hedge_after=None)
+                    store_sentiment(text, emotions, model, temperature, result, semantic_threshold)
+                    return result
+                except RateLimitError as e:
+                    limiter.backoff(retry_after_seconds(e) or backoff_delay(attempt))
+                except Exception as e:
+                    print(f"Error during classification: {e}")
+                    record['error'] = type(e).__name__
+                    return 'N/A'
+
+            print(f"Giving up after {max_attempts} rate limited attempts")
+            record['error'] = 'RateLimitError'
+            return 'N/A'
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(classify_one, texts))
+
+
+def match_label(raw_label, labels):
+    # Map a label returned by the model back onto the configured emotion set
+    cleaned = raw_label.strip().strip('"\'.*`').strip()
+    for label in labels:
+        if cleaned.lower() == label.lower():
+            return label
+    return None
+
+
+BATCH_LINE_PATTERN = re.compile(r'^\s*\[?(\d+)\]?\s*[:.)\-]\s*(.+?)\s*$')
+
+
+def parse_batch_response(content, numbers, labels):
+    # Read "<number>: <emotion>" lines and keep only valid, expected rows
+    results = {}
+    for line in (content or '').splitlines():
+        match = BATCH_LINE_PATTERN.match(line)
+        if not match:
+            continue
+        number = int(match.group(1))
+        if number not in numbers or number in results:
+            continue
+        label = match_label(match.group(2), labels)
+        if label is not None:
+            results[number] = label
+    if not results and len(numbers) == 1:
+        # A batch of one text is often answered with the bare label
+        label = match_label(content or '', labels)
+        if label is not None:
+            results[next(iter(numbers))] = label
+    return results
+
+
+def gpt_classify_batch_request(client, texts, labels, model, temperature, tokens_per_item=10):
+    # Classify several texts with one chat completion, numbered from 1
+    # Keep every text on a single line so the numbering stays unambiguous
+    numbered = '\n'.join(f"{i}: {' '.join(text.split())}" for i, text in enumerate(texts, start=1))
+
+    response = create_completion(
+        client,
+        timeout=BATCH_TIMEOUT,
+        model=model,
+        messages=[
+            batch_system_message(labels),
+            {"role": "user", "content": numbered}
+        ],
+        max_tokens=tokens_per_item * len(texts) + 10,
+        temperature=temperature
+    )
+    prompt_usage.record(response.usage)
+    note_usage(response.usage)
+    return response.choices[0].message.content
+
+
+def classify_batch(texts, emotions, model="gpt-3.5-turbo", temperature=0.0, batch_size=20, max_retries=2,
+                   semantic_threshold=None):
+    """Classify many texts with as few requests as possible.
+
+    Texts are packed ``batch_size`` at a time into a numbered request. Rows whose
+    label is missing or not one of ``emotions`` are re-submitted in smaller
+    batches, up to ``max_retries`` times, and end up as 'N/A' otherwise.
+    Returns a list of labels aligned with ``texts``.
+    """
+    labels = parse_emotions(emotions)
+    results = ['N/A'] * len(texts)
+    pending = [i for i, text in enumerate(texts) if text and text.strip()]
+
+    if not labels:
+        return results
+
+    # Serve repeated texts from the cache and only send the rest
+    still_pending = []
+    for i in pending:
+        cached = cached_sentiment(texts[i], labels, model, temperature, semantic_threshold)
+        if cached is not None:
+            results[i] = cached
+        else:
+            still_pending.append(i)
+    pending = still_pending
+
+    if not pending:
+        return results
+
+    client = get_client()
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+
+        # Shrink the batches on every retry so a confused response affects fewer rows
+        size = max(1, batch_size // (2 ** attempt))
+        failed = []
+
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            with metrics.track('classify_batch', model=model, rows=len(chunk)) as record:
+                try:
+                    content = gpt_classify_batch_request(
+                        client,
+                        [texts[i] for i in chunk],
+                        labels,
+                        model,
+                        temperature
+                    )
+                except Exception as e:
+                    print(f"Error during batch classification: {e}")
+                    record['error'] = type(e).__name__
+                    content = None
+            if content is None:
+                failed.extend(chunk)
+                continue
+
+            parsed = parse_batch_response(content, set(range(1, len(chunk) + 1)), labels)
+            for number, index in enumerate(chunk, start=1):
+                if number in parsed:
+                    results[index] = parsed[number]
+                    store_sentiment(texts[index], labels, model, temperature, parsed[number], semantic_threshold)
+                else:
+                    failed.append(index)
+
+        pending = failed
+
+    return results
@@ -0,0 +1,193 @@
+"""Headless sentiment classification: JSONL/CSV in, JSONL out.
+
+Examples:
+    python cli.py reviews.csv --text-field review > labelled.jsonl
+    cat tickets.jsonl | python cli.py --emotions "Positive, Negative, Neutral" --workers 16
+    python cli.py scraped_reviews.jsonl --dedup near --mode batch > labelled.jsonl
+
+Only the classifier core is imported, never Streamlit or pandas.
+"""
+import argparse
+import csv
+import json
+import sys
+
+from chunking import AGGREGATIONS, classify_long_text
+from classifier import classify_batch, classify_concurrent
+from dedup import classify_unique
+from metrics import metrics
+from rate_limit import estimate_tokens, get_rate_limiter
+from semantic_cache import get_semantic_cache
+
+DEFAULT_EMOTIONS = "Happy, Sad, Angry, Fearful, Disgusted, Surprised, Neutral"
+
+
+def detect_format(path, first_line):
+    if path and path != '-':
+        if path.lower().endswith('.csv'):
+            return 'csv'
+        if path.lower().endswith(('.jsonl', '.json', '.ndjson')):
+            return 'jsonl'
+    return 'jsonl' if first_line.lstrip().startswith('{') else 'csv'
+
+
+def iter_records(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"Skipping invalid JSON on line {line_number}: {e}", file=sys.stderr)
+            continue
+        if not isinstance(record, dict):
+            print(f"Skipping line {line_number}: expected a JSON object, got {type(record).__name__}",
+                  file=sys.stderr)
+            continue
+        yield record
+
+
+def iter_chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def classify_chunk(texts, args, totals):
+    # Only one text per duplicate group reaches the classifier
+    if args.dedup == 'off':
+        return classify_texts(texts, args)
+    labels, groups = classify_unique(texts, lambda unique: classify_texts(unique, args),
+                                     near_duplicates=args.dedup == 'near', threshold=args.near_threshold)
+    for field in totals:
+        totals[field] += groups[field]
+    return labels
+
+
+def classify_texts(texts, args):
+    # Texts over the chunk budget are classified chunk by chunk, the rest as usual
+    if args.chunk_tokens:
+        long_rows = [i for i, text in enumerate(texts) if estimate_tokens(text) > args.chunk_tokens]
+        if long_rows:
+            short_rows = sorted(set(range(len(texts))) - set(long_rows))
+            labels = [None] * len(texts)
+            for i, label in zip(short_rows, classify_request_texts([texts[i] for i in short_rows], args)):
+                labels[i] = label
+            for i in long_rows:
+                labels[i] = classify_long_text(texts[i], args.emotions, model=args.model, temperature=args.temperature,
+                                               max_tokens=args.max_tokens, chunk_tokens=args.chunk_tokens,
+                                               method=args.aggregate, workers=args.workers,
+                                               limiter=get_rate_limiter(args.rpm, args.tpm))['label']
+            return labels
+    return classify_request_texts(texts, args)
+
+
+def classify_request_texts(texts, args):
+    if not texts:
+        return []
+    if args.mode == 'batch':
+        return classify_batch(texts, args.emotions, model=args.model, temperature=args.temperature,
+                              batch_size=args.batch_size)
+    return classify_concurrent(texts, args.emotions, model=args.model, temperature=args.temperature,
+                               max_tokens=args.max_tokens, workers=args.workers,
+                               limiter=get_rate_limiter(args.rpm, args.tpm))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Classify the sentiment of JSONL or CSV records and write JSONL.")
+    parser.add_argument('input', nargs='?', default='-', help="Input file (default: stdin)")
+    parser.add_argument('-o', '--output', default='-', help="Output JSONL file (default: stdout)")
+    parser.add_argument('--format', choices=['auto', 'jsonl', 'csv'], default='auto', help="Input format")
+    parser.add_argument('--text-field', default='text', help="Field or column holding the text")
+    parser.add_argument('--label-field', default='emotion', help="Field added to each output record")
+    parser.add_argument('--emotions', default=DEFAULT_EMOTIONS, help="Comma separated emotion categories")
+    parser.add_argument('--model', default='gpt-3.5-turbo')
+    parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--max-tokens', type=int, default=20)
+    parser.add_argument('--mode', choices=['concurrent', 'batch'], default='concurrent',
+                        help="One request per text in parallel, or several texts packed per request")
+    parser.add_argument('--workers', type=int, default=8, help="Requests in flight (concurrent mode)")
+    parser.add_argument('--batch-size', type=int, default=20, help="Texts per request (batch mode)")
+    parser.add_argument('--rpm', type=int, default=3500, help="Requests-per-minute budget")
+    parser.add_argument('--tpm', type=int, default=90000, help="Tokens-per-minute budget")
+    parser.add_argument('--chunk-size', type=int, default=500,
+                        help="Records read, classified and written at a time")
+    parser.add_argument('--dedup', choices=['off', 'exact', 'near'], default='exact',
+                        help="Classify each normalized text once per chunk ('near' also groups MinHash near-duplicates)")
+    parser.add_argument('--near-threshold', type=float, default=0.8,
+                        help="Estimated Jaccard similarity for --dedup near")
+    parser.add_argument('--chunk-tokens', type=int, default=0,
+                        help="Split texts longer than this many tokens into chunks and combine their labels (0: off)")
+    parser.add_argument('--aggregate', choices=AGGREGATIONS, default='length',
+                        help="How chunk labels are combined with --chunk-tokens")
+    parser.add_argument('--semantic-threshold', type=float, default=None,
+                        help="Reuse labels of texts at least this similar, e.g. 0.95 (default from "
+                             "SEMANTIC_CACHE_THRESHOLD, else 0: off)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    semantic_cache = get_semantic_cache()
+    if args.semantic_threshold is not None:
+        semantic_cache.threshold = args.semantic_threshold
+
+    source = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    try:
+        first_line = source.readline()
+        fmt = args.format if args.format != 'auto' else detect_format(args.input, first_line)
+        lines = _prepend(first_line, source)
+
+        total = failed = 0
+        totals = {'rows': 0, 'unique': 0, 'exact_duplicates': 0, 'near_duplicates': 0}
+        for chunk in iter_chunks(iter_records(lines, fmt), args.chunk_size):
+            texts = [str(record.get(args.text_field) or '') for record in chunk]
+            labels = classify_chunk(texts, args, totals)
+            for record, label in zip(chunk, labels):
+                record[args.label_field] = label
+                failed += label == 'N/A'
+                sink.write(json.dumps(record, ensure_ascii=False) + '\n')
+            sink.flush()
+            total += len(chunk)
+            print(f"Classified {total} records", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    print(f"Done: {total} records, {failed} unclassified", file=sys.stderr)
+    if totals['rows'] > totals['unique']:
+        print(f"Deduplicated: {totals['unique']} unique texts classified for {totals['rows']} records "
+              f"({totals['exact_duplicates']} exact, {totals['near_duplicates']} near duplicates)", file=sys.stderr)
+    latency = metrics.summary()
+    if latency['count']:
+        print(f"Request latency: p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, "
+              f"p99 {latency['p99']:.0f} ms over {latency['count']} requests", file=sys.stderr)
+    if semantic_cache.enabled:
+        stats = semantic_cache.stats()
+        if stats['hits'] + stats['misses']:
+            print(f"Semantic cache: {stats['hits']} hits ({stats['hit_rate']:.0%}), {stats['entries']} texts indexed, "
+                  f"lookup p95 {stats['lookup_p95_ms']:.1f} ms", file=sys.stderr)
+    return 1 if total and failed == total else 0
+
+
+def _prepend(first_line, stream):
+    # Put back the line read for format detection
+    if first_line:
+        yield first_line
+    yield from stream
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import os
+import threading
+
+# Connection pool shared by every request in the process. Keep-alive connections are
+# reused across calls, so only the first request to the API pays the TLS handshake.
+MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 100))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20))
+KEEPALIVE_EXPIRY = 60.0
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_http_client():
+    # httpx and openai are imported on first use so importing this module stays cheap
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+
+
+def get_client():
+    # Process-wide OpenAI client, created once and shared by all callers and threads
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+
+            # Retries are handled by the resilience layer, not by the client
+            _client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'), http_client=build_http_client(), max_retries=0)
+        return _client
@@ -0,0 +1,174 @@
+"""Run the same classifications on several models at once and compare them.
+
+Every (text, model) pair is one request, all dispatched concurrently. The
+result reports per-model latency percentiles, token usage, estimated cost,
+accuracy when reference labels are known, and how often the models agree.
+
+    python compare.py labelled.jsonl --models gpt-3.5-turbo,gpt-4o-mini --slo-ms 800
+    python compare.py --sample --models gpt-3.5-turbo,gpt-4o-mini,gpt-4o
+"""
+import argparse
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+from classifier import request_sentiment
+from client import get_client
+from metrics import metrics, percentile
+
+# USD per million (prompt, completion) tokens, for cost estimates only
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-3.5-turbo-16k': (3.00, 4.00),
+    'gpt-4': (30.00, 60.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+}
+
+SAMPLE_EMOTIONS = 'Happy, Sad, Angry, Surprised, Neutral'
+
+# Small labelled set for quick comparisons without a file
+SAMPLE_DATASET = [
+    ("I can't believe I finally got the job, best day ever!", 'Happy'),
+    ("My flight got cancelled again and nobody will tell me why.", 'Angry'),
+    ("We said goodbye to our old dog this morning.", 'Sad'),
+    ("Wait, the package arrived a week early?", 'Surprised'),
+    ("The meeting has been moved to 3pm on Thursday.", 'Neutral'),
+    ("This is the third time the app deleted my notes. Unacceptable.", 'Angry'),
+    ("Thank you all so much for the birthday wishes!", 'Happy'),
+    ("I miss the way things used to be before everyone moved away.", 'Sad'),
+    ("Nobody told me the concert was tonight, I had no idea!", 'Surprised'),
+    ("The report contains figures for the second quarter.", 'Neutral'),
+    ("Our team won the championship after ten years of trying!", 'Happy'),
+    ("They charged me twice and support hung up on me.", 'Angry'),
+]
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def compare_models(texts, emotions, models, labels=None, temperature=0.0, max_tokens=20, workers=16):
+    """Classify every text with every model, concurrently, and summarize per model.
+
+    Requests bypass the response cache so latencies are real. Returns a dict
+    with ``models`` (per-model labels and statistics), ``agreement``
+    (pairwise rate per model pair) and ``consensus`` (share of texts where
+    all models gave the same label); both rates are None without texts.
+    """
+    client = get_client()
+    jobs = [(i, model) for i in range(len(texts)) for model in models]
+
+    def run(job):
+        i, model = job
+        with metrics.track('compare', model=model) as record:
+            try:
+                label = request_sentiment(client, texts[i], emotions, model, temperature, max_tokens, hedge_after=None)
+            except Exception as e:
+                record['error'] = type(e).__name__
+                label = 'N/A'
+        return i, model, label, record, record.get('error')
+
+    results = {model: {'labels': ['N/A'] * len(texts), 'latency_ms': [], 'prompt_tokens': 0,
+                       'completion_tokens': 0, 'errors': 0} for model in models}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, model, label, record, error in pool.map(run, jobs):
+            entry = results[model]
+            entry['labels'][i] = label
+            entry['latency_ms'].append(record['latency_ms'])
+            entry['prompt_tokens'] += record.get('prompt_tokens', 0)
+            entry['completion_tokens'] += record.get('completion_tokens', 0)
+            # Counted from the error, not the label: 'N/A' can be a real answer
+            entry['errors'] += error is not None
+
+    for model, entry in results.items():
+        latencies = sorted(entry['latency_ms'])
+        entry['p50_ms'] = percentile(latencies, 50)
+        entry['p95_ms'] = percentile(latencies, 95)
+        entry['cost'] = estimate_cost(model, entry['prompt_tokens'], entry['completion_tokens'])
+        if labels is not None:
+            scored = [(got, want) for got, want in zip(entry['labels'], labels) if want]
+            entry['accuracy'] = (sum(got.lower() == want.lower() for got, want in scored) / len(scored)
+                                 if scored else None)
+
+    share = lambda count: count / len(texts) if texts else None
+    agreement = {}
+    for a, b in combinations(models, 2):
+        agreement[(a, b)] = share(sum(x == y for x, y in zip(results[a]['labels'], results[b]['labels'])))
+    consensus = share(sum(len({results[m]['labels'][i] for m in models}) == 1 for i in range(len(texts))))
+
+    return {'models': results, 'agreement': agreement, 'consensus': consensus}
+
+
+def recommend(comparison, slo_ms, min_accuracy=None):
+    """The cheapest model whose p95 latency meets ``slo_ms`` (and accuracy, if given), or None."""
+    candidates = []
+    for model, entry in comparison['models'].items():
+        if entry['p95_ms'] is None or entry['p95_ms'] > slo_ms or entry['cost'] is None:
+            continue
+        if min_accuracy is not None and (entry.get('accuracy') or 0) < min_accuracy:
+            continue
+        candidates.append((entry['cost'], entry['p95_ms'], model))
+    return min(candidates)[2] if candidates else None
+
+
+def read_sample(data, fmt, text_column, label_column=None, limit=100):
+    """First ``limit`` rows of an uploaded CSV/Parquet file as (texts, labels or None)."""
+    columns = [text_column] + ([label_column] if label_column else [])
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        batch = next(pq.ParquetFile(io.BytesIO(data)).iter_batches(batch_size=limit, columns=columns), None)
+        rows = batch.to_pydict() if batch is not None else {column: [] for column in columns}
+    else:
+        import pandas as pd
+        rows = pd.read_csv(io.BytesIO(data), usecols=columns, nrows=limit, dtype=str).to_dict('list')
+
+    clean = lambda value: '' if value is None or value != value else str(value)
+    texts = [clean(text) for text in rows[text_column]]
+    labels = [clean(label) for label in rows[label_column]] if label_column else None
+    return texts, labels
+
+
+def print_report(comparison, slo_ms=None):
+    print(f"{'model':<22} {'p50 ms':>8} {'p95 ms':>8} {'tokens':>9} {'cost $':>10} {'errors':>7} {'accuracy':>9}")
+    for model, entry in comparison['models'].items():
+        tokens = entry['prompt_tokens'] + entry['completion_tokens']
+        cost = f"{entry['cost']:.5f}" if entry['cost'] is not None else '-'
+        accuracy = f"{entry['accuracy']:.0%}" if entry.get('accuracy') is not None else '-'
+        print(f"{model:<22} {entry['p50_ms'] or 0:>8.0f} {entry['p95_ms'] or 0:>8.0f} {tokens:>9} {cost:>10} "
+              f"{entry['errors']:>7} {accuracy:>9}")
+    rate = lambda value: f"{value:.0%}" if value is not None else '-'
+    for (a, b), value in comparison['agreement'].items():
+        print(f"agreement {a} / {b}: {rate(value)}")
+    print(f"all models agree: {rate(comparison['consensus'])}")
+    if slo_ms is not None:
+        best = recommend(comparison, slo_ms)
+        print(f"cheapest model with p95 <= {slo_ms:.0f} ms: {best or 'none'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', nargs='?', help='JSONL with "text" and optional "label" fields')
+    parser.add_argument('--sample', action='store_true', help='Use the built-in labelled sample')
+    parser.add_argument('--models', required=True, help='Comma separated model names')
+    parser.add_argument('--emotions', default=SAMPLE_EMOTIONS)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--slo-ms', type=float, help='p95 latency target for the recommendation')
+    args = parser.parse_args()
+
+    if args.sample or not args.input:
+        texts, labels = [list(column) for column in zip(*SAMPLE_DATASET)]
+    else:
+        with open(args.input, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()][:args.limit]
+        texts = [row['text'] for row in rows]
+        labels = [row.get('label') for row in rows] if any('label' in row for row in rows) else None
+
+    comparison = compare_models(texts, args.emotions, args.models.split(','), labels=labels, workers=args.workers)
+    print_report(comparison, args.slo_ms)
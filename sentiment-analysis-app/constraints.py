@@ -0,0 +1,81 @@
+import math
+from functools import lru_cache
+
+from rate_limit import estimate_tokens
+
+# Strong positive bias on label tokens: the model effectively can only emit them
+LABEL_TOKEN_BIAS = 100
+
+# Alternatives returned for the first output token (API maximum)
+TOP_LOGPROBS = 20
+
+
+def _encoding_for(model):
+    # tiktoken is optional and downloads its encodings on first use
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=256)
+def label_constraints(labels, model):
+    """Return (logit_bias, max_tokens) restricting output to ``labels`` (a tuple).
+
+    Without tiktoken no bias can be computed; the output is then only capped
+    in length and resolved against the labels afterwards.
+    """
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return None, max(estimate_tokens(label) for label in labels) + 2
+
+    token_ids = set()
+    longest = 1
+    for label in labels:
+        # The label can start the answer as-is or after a space
+        for variant in (label, ' ' + label):
+            tokens = encoding.encode(variant)
+            token_ids.update(tokens)
+            longest = max(longest, len(tokens))
+    # The API accepts at most 300 biased tokens
+    bias = {str(token): LABEL_TOKEN_BIAS for token in sorted(token_ids)[:300]}
+    return bias, longest
+
+
+def resolve_label(content, labels):
+    """Map constrained output onto a label: exact match first, then the longest label it starts with."""
+    cleaned = (content or '').strip().strip('"\'.*`').strip().lower()
+    for label in labels:
+        if cleaned == label.lower():
+            return label
+    candidates = [label for label in labels if cleaned.startswith(label.lower())]
+    return max(candidates, key=len) if candidates else None
+
+
+def label_distribution(first_token_logprobs, labels):
+    """Turn the top logprobs of the first output token into a distribution over ``labels``.
+
+    Each alternative token's probability goes to the labels it is a prefix
+    of; labels sharing that prefix split it evenly. The result is normalized
+    over the probability mass that landed on a label.
+    """
+    scores = {label: 0.0 for label in labels}
+    for alternative in first_token_logprobs:
+        piece = alternative.token.strip().lower()
+        if not piece:
+            continue
+        matching = [label for label in labels if label.lower().startswith(piece)]
+        for label in matching:
+            scores[label] += math.exp(alternative.logprob) / len(matching)
+
+    total = sum(scores.values())
+    if total == 0:
+        return {}
+    return {label: score / total for label, score in sorted(scores.items(), key=lambda x: x[1], reverse=True)}
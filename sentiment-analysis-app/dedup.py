@@ -0,0 +1,143 @@
+import hashlib
+import re
+import unicodedata
+import zlib
+
+from polarity import polarity_words
+
+# Typographic variants folded to their plain ASCII form
+FOLD_CHARACTERS = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u201f': '"',
+    '\u2013': '-', '\u2014': '-', '\u2212': '-', '\u2026': '...',
+    '\u00a0': ' ', '\u200b': '', '\ufeff': ''
+})
+REPEATED_PUNCTUATION = re.compile(r'([!?.,;:\-*~])\1+')
+SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([!?.,;:])')
+
+# MinHash settings: 16 bands of 4 rows find pairs with Jaccard similarity
+# around 0.5 and up; candidates are then checked against the threshold
+NUM_PERMUTATIONS = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_text(text):
+    """Canonical form of a text for duplicate detection.
+
+    NFKC normalization, case folding, typographic quotes and dashes folded
+    to ASCII, runs of repeated punctuation collapsed ("!!!" -> "!") and
+    whitespace collapsed. Emojis and words are kept, as they carry sentiment.
+    """
+    text = unicodedata.normalize('NFKC', text or '').casefold().translate(FOLD_CHARACTERS)
+    text = REPEATED_PUNCTUATION.sub(r'\1', text)
+    text = SPACE_BEFORE_PUNCTUATION.sub(r'\1', text)
+    return ' '.join(text.split())
+
+
+def text_key(normalized):
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def minhash_signatures(texts, num_permutations=NUM_PERMUTATIONS, shingle_size=SHINGLE_SIZE, seed=0):
+    # One row of MinHash values per text, over its character shingles
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=(num_permutations, 1), dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=(num_permutations, 1), dtype=np.uint64)
+    signatures = np.empty((len(texts), num_permutations), dtype=np.uint64)
+    for row, text in enumerate(texts):
+        shingles = {text[i:i + shingle_size] for i in range(max(1, len(text) - shingle_size + 1))}
+        hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.uint64)
+        # 32-bit hashes times 61-bit coefficients may wrap around, which is fine for hashing
+        signatures[row] = ((a * hashes[None, :] + b) % MERSENNE_PRIME).min(axis=1)
+    return signatures
+
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def near_duplicate_groups(texts, threshold=0.8, bands=BANDS):
+    """Group texts whose estimated Jaccard similarity reaches ``threshold``.
+
+    MinHash signatures are split into ``bands``; texts sharing any band are
+    candidates, and a candidate pair is merged when the fraction of equal
+    MinHash values reaches the threshold and both texts have the same
+    negation and sentiment words: "the room was clean" and "the room was
+    not clean" share most shingles but not a label. Returns a group id per
+    text.
+    """
+    parents = list(range(len(texts)))
+    if len(texts) < 2:
+        return parents
+
+    polarity = [polarity_words(text) for text in texts]
+    signatures = minhash_signatures(texts)
+    rows = signatures.shape[1] // bands
+    for band in range(bands):
+        buckets = {}
+        for i, values in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(values.tobytes(), []).append(i)
+        for members in buckets.values():
+            for other in members[1:]:
+                first, second = _find(parents, members[0]), _find(parents, other)
+                if first != second and polarity[members[0]] == polarity[other] \
+                        and (signatures[members[0]] == signatures[other]).mean() >= threshold:
+                    parents[max(first, second)] = min(first, second)
+    return [_find(parents, i) for i in range(len(texts))]
+
+
+def deduplicate(texts, near_duplicates=False, threshold=0.8):
+    """Collapse ``texts`` into unique representatives.
+
+    Rows are grouped by the hash of their normalized text and, with
+    ``near_duplicates``, also by MinHash similarity. The first row of each
+    group represents it. Returns a dict with ``representatives`` (row
+    indices to classify), ``assignments`` (for each row, the position of its
+    representative, or None for empty rows) and row counts.
+    """
+    normalized = [normalize_text(text) for text in texts]
+    keys = [text_key(text) if text else None for text in normalized]
+    first_by_key = {}
+    unique_rows = []
+    for i, key in enumerate(keys):
+        if key is not None and first_by_key.setdefault(key, i) == i:
+            unique_rows.append(i)
+
+    groups = near_duplicate_groups([normalized[i] for i in unique_rows], threshold) if near_duplicates \
+        else list(range(len(unique_rows)))
+
+    representatives, position_of_group, position_of_row = [], {}, {}
+    for row, group in zip(unique_rows, groups):
+        if group not in position_of_group:
+            position_of_group[group] = len(representatives)
+            representatives.append(row)
+        position_of_row[row] = position_of_group[group]
+
+    assignments = [position_of_row[first_by_key[key]] if key is not None else None for key in keys]
+    return {
+        'representatives': representatives,
+        'assignments': assignments,
+        'rows': len(texts),
+        'unique': len(representatives),
+        'exact_duplicates': sum(key is not None for key in keys) - len(unique_rows),
+        'near_duplicates': len(unique_rows) - len(representatives)
+    }
+
+
+def classify_unique(texts, classify_texts, near_duplicates=False, threshold=0.8):
+    """Classify only one text per duplicate group and fan the labels back out.
+
+    ``classify_texts`` takes a list of texts and returns aligned labels
+    (e.g. ``classify_batch`` or ``classify_concurrent`` with their settings
+    bound). Returns (labels aligned with ``texts``, deduplication stats).
+    """
+    groups = deduplicate(texts, near_duplicates, threshold)
+    labels = classify_texts([texts[i] for i in groups['representatives']]) if groups['representatives'] else []
+    return [labels[position] if position is not None else 'N/A' for position in groups['assignments']], groups
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'history.sqlite3')
+
+# Width of the stored time buckets; coarser views are summed from these
+BUCKET_SECONDS = 3600
+
+
+def new_session_id():
+    return uuid.uuid4().hex[:12]
+
+
+class AnalysisHistory:
+    """Persistent analysis history with incrementally maintained aggregates.
+
+    Every analysis is one row in SQLite (WAL mode), indexed by session. The
+    per-emotion, per-model and per-source counters and the hourly
+    per-emotion buckets are updated in the same transaction as the insert,
+    so statistics and charts read a handful of rows instead of scanning the
+    history, and the list view reads one page at a time.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS analyses (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                created REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                text TEXT NOT NULL,
+                emotions TEXT NOT NULL,
+                result TEXT NOT NULL,
+                model TEXT NOT NULL,
+                source TEXT NOT NULL,
+                confidence REAL,
+                temperature REAL,
+                max_tokens INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS analyses_session ON analyses (session_id, id);
+            CREATE TABLE IF NOT EXISTS counters (
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (session_id, kind, key)
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                session_id TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (session_id, bucket, result)
+            );
+        ''')
+        self.conn.commit()
+
+    def add(self, session_id, entry):
+        """Store one analysis entry (as built by the app) and update the aggregates; returns its number."""
+        now = time.time()
+        counters = [('result', entry['result']), ('model', entry['model']), ('source', entry.get('source', 'gpt'))]
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO analyses (session_id, created, timestamp, text, emotions, result, model, source, '
+                'confidence, temperature, max_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (session_id, now, entry['timestamp'], entry['text'], entry['emotions'], entry['result'],
+                 entry['model'], entry.get('source', 'gpt'), entry.get('confidence'), entry.get('temperature'),
+                 entry.get('max_tokens'))
+            )
+            self.conn.executemany(
+                'INSERT INTO counters (session_id, kind, key, count) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT (session_id, kind, key) DO UPDATE SET count = count + 1',
+                [(session_id, kind, key) for kind, key in counters]
+            )
+            self.conn.execute(
+                'INSERT INTO buckets (session_id, bucket, result, count) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT (session_id, bucket, result) DO UPDATE SET count = count + 1',
+                (session_id, int(now // BUCKET_SECONDS) * BUCKET_SECONDS, entry['result'])
+            )
+            self.conn.commit()
+        return self.count(session_id)
+
+    def counts(self, session_id, kind):
+        """Counter values for 'result', 'model' or 'source', largest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT key, count FROM counters WHERE session_id = ? AND kind = ? ORDER BY count DESC, key',
+                (session_id, kind)
+            ).fetchall()
+        return {row['key']: row['count'] for row in rows}
+
+    def count(self, session_id):
+        # Total analyses, read from the source counters
+        return sum(self.counts(session_id, 'source').values())
+
+    def page(self, session_id, page=0, page_size=20):
+        """One page of analyses, newest first; entries carry their 1-based ``number``."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT * FROM analyses WHERE session_id = ? ORDER BY id DESC LIMIT ? OFFSET ?',
+                (session_id, page_size, page * page_size)
+            ).fetchall()
+        total = self.count(session_id)
+        offset = page * page_size
+        return [dict(row, number=total - offset - i) for i, row in enumerate(rows)]
+
+    def timeline(self, session_id, bucket_seconds=BUCKET_SECONDS):
+        """[(bucket_start, result, count)] with buckets of ``bucket_seconds`` (a multiple of BUCKET_SECONDS)."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT (bucket / ?) * ? AS start, result, SUM(count) AS count FROM buckets '
+                'WHERE session_id = ? GROUP BY start, result ORDER BY start',
+                (bucket_seconds, bucket_seconds, session_id)
+            ).fetchall()
+        return [(row['start'], row['result'], row['count']) for row in rows]
+
+    def entries(self, session_id, columns=('text', 'result', 'source')):
+        # Selected columns of every analysis, oldest first (e.g. to train the local model)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(columns)} FROM analyses WHERE session_id = ? ORDER BY id",
+                (session_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self, session_id):
+        with self.lock:
+            for table in ('analyses', 'counters', 'buckets'):
+                self.conn.execute(f'DELETE FROM {table} WHERE session_id = ?', (session_id,))
+            self.conn.commit()
+
+
+_default_history = None
+_default_history_lock = threading.Lock()
+
+
+def get_history():
+    # Process-wide history shared by every session (and every Streamlit rerun)
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = AnalysisHistory(os.environ.get('ANALYSIS_HISTORY_PATH', DEFAULT_HISTORY_PATH))
+        return _default_history
@@ -0,0 +1,141 @@
+import json
+import random
+import re
+import sys
+import time
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    words = TOKEN_PATTERN.findall(text.lower())
+    # Unigrams plus bigrams so short negations ("not good") carry signal
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class LocalSentimentModel:
+    """Multinomial naive Bayes classifier trained on previously labelled texts.
+
+    It runs in-process in microseconds, so confident predictions can skip the
+    API entirely; ``predict`` returns the label together with its posterior
+    probability so callers can escalate uncertain texts to GPT.
+    """
+
+    def __init__(self, alpha=1.0, min_examples=20):
+        self.alpha = alpha
+        self.min_examples = min_examples
+        self.labels = []
+        self.vocabulary = {}
+        self.class_log_prior = None
+        self.feature_log_prob = None
+
+    @classmethod
+    def from_history(cls, history, **kwargs):
+        # Train on the analysis history kept by the app (entries with 'text' and 'result')
+        pairs = [(entry['text'], entry['result']) for entry in history
+                 if entry.get('result') not in (None, 'N/A') and entry.get('source', 'gpt') == 'gpt']
+        model = cls(**kwargs)
+        if pairs:
+            texts, labels = zip(*pairs)
+            model.fit(texts, labels)
+        return model
+
+    @property
+    def ready(self):
+        return self.feature_log_prob is not None
+
+    def fit(self, texts, labels):
+        self.labels = sorted(set(labels))
+        if len(texts) < self.min_examples or len(self.labels) < 2:
+            self.feature_log_prob = None
+            return self
+
+        documents = [tokenize(text) for text in texts]
+        self.vocabulary = {}
+        for tokens in documents:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        counts = np.zeros((len(self.labels), len(self.vocabulary)))
+        class_counts = np.zeros(len(self.labels))
+        for tokens, label in zip(documents, labels):
+            row = label_index[label]
+            class_counts[row] += 1
+            np.add.at(counts[row], [self.vocabulary[token] for token in tokens], 1)
+
+        smoothed = counts + self.alpha
+        self.feature_log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        self.class_log_prior = np.log(class_counts) - np.log(class_counts.sum())
+        return self
+
+    def known_tokens(self, text):
+        return [self.vocabulary[token] for token in tokenize(text) if token in self.vocabulary]
+
+    def predict_proba(self, text):
+        indices = self.known_tokens(text)
+        scores = self.class_log_prior + self.feature_log_prob[:, indices].sum(axis=1)
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text):
+        """Return (label, confidence), or (None, 0.0) while the model is untrained.
+
+        Texts without a single known token also get (None, 0.0): their
+        posterior would be the class prior alone, which says nothing about the text.
+        """
+        if not self.ready or not self.known_tokens(text):
+            return None, 0.0
+        probabilities = self.predict_proba(text)
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+
+def benchmark(examples, threshold=0.9, holdout=0.2, seed=0):
+    """Train on part of ``examples`` ((text, label) pairs) and evaluate on the rest.
+
+    Reports how much traffic the local tier would answer at ``threshold``, its
+    accuracy on those answers and the per-text prediction latency.
+    """
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    split = int(len(examples) * (1 - holdout))
+    train, test = examples[:split], examples[split:]
+
+    model = LocalSentimentModel().fit([t for t, _ in train], [l for _, l in train])
+    if not model.ready or not test:
+        return {'trained': False, 'train_size': len(train), 'test_size': len(test)}
+
+    answered = correct = 0
+    started = time.perf_counter()
+    for text, label in test:
+        predicted, confidence = model.predict(text)
+        if confidence >= threshold:
+            answered += 1
+            correct += predicted == label
+    elapsed = time.perf_counter() - started
+
+    return {
+        'trained': True,
+        'train_size': len(train),
+        'test_size': len(test),
+        'threshold': threshold,
+        'coverage': answered / len(test),
+        'accuracy_when_confident': correct / answered if answered else None,
+        'latency_us': elapsed / len(test) * 1e6
+    }
+
+
+if __name__ == "__main__":
+    # Offline benchmark: python local_model.py labelled.jsonl [threshold]
+    # Each line holds {"text": ..., "label": ...} (or "result" as in the app history)
+    if len(sys.argv) < 2:
+        print("Usage: python local_model.py labelled.jsonl [threshold]")
+        sys.exit(1)
+    with open(sys.argv[1], encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    pairs = [(row['text'], row.get('label', row.get('result'))) for row in rows]
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.9
+    print(json.dumps(benchmark(pairs, threshold=threshold), indent=2))
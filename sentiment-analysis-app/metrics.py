@@ -0,0 +1,235 @@
+# Kept in step with the other app's copy, except for how the current request
+# is tracked: each app runs and deploys on its own, without a shared package.
+# Change both copies; tests/test_shared_copies.py fails when they drift.
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'metrics.jsonl')
+
+# Past this size the log is rotated to ``<log>.1`` (replacing the previous one)
+DEFAULT_LOG_MAX_BYTES = 50 * 1024 * 1024
+
+# Seconds between writes of the buffered log records
+LOG_FLUSH_SECONDS = 1.0
+
+# Numeric fields summarized with percentiles
+TIMING_FIELDS = ['latency_ms', 'queue_ms', 'ttft_ms']
+
+_local = threading.local()
+
+
+def current_request():
+    # The request record being tracked on this thread, if any
+    return getattr(_local, 'record', None)
+
+
+def _enter_request(record):
+    previous = current_request()
+    _local.record = record
+    return previous
+
+
+def _exit_request(previous):
+    _local.record = previous
+
+
+def note_usage(usage):
+    # Copy token counts from an API response onto the current request record
+    record = current_request()
+    if record is None or usage is None:
+        return
+    record['prompt_tokens'] = record.get('prompt_tokens', 0) + (usage.prompt_tokens or 0)
+    record['completion_tokens'] = record.get('completion_tokens', 0) + (usage.completion_tokens or 0)
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RequestMetrics:
+    """Per-request instrumentation: a JSONL log plus rolling percentiles.
+
+    Each tracked request produces one record with its operation, model,
+    total latency, queue time, time-to-first-token, token usage, cache hit
+    and retry count. The last ``window`` records are kept in memory for the
+    live percentile panels; all of them are appended to ``log_path``, which
+    is rotated once it reaches ``max_log_bytes`` so at most twice that is
+    kept on disk. Requests only queue their log line: a background thread
+    appends the queue every ``flush_seconds`` (and at exit), so no request
+    waits on disk I/O.
+    """
+
+    def __init__(self, log_path=DEFAULT_LOG_PATH, window=2000, max_log_bytes=DEFAULT_LOG_MAX_BYTES,
+                 flush_seconds=LOG_FLUSH_SECONDS):
+        self.log_path = log_path
+        self.max_log_bytes = max_log_bytes
+        self.flush_seconds = flush_seconds
+        self.records = deque(maxlen=window)
+        self.totals = {}
+        self.lock = threading.Lock()
+        self.server = None
+        # Log lines waiting for the writer thread, started on the first one
+        self.pending = deque()
+        self.write_lock = threading.Lock()
+        self.writer = None
+        # Size of the log file, read on the first write (which also creates its directory)
+        self.log_size = None
+
+    @contextmanager
+    def track(self, operation, **fields):
+        record = {'operation': operation, 'timestamp': time.time(), 'retries': 0, 'cache_hit': False}
+        record.update(fields)
+        token = _enter_request(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            _exit_request(token)
+            record['latency_ms'] = (time.perf_counter() - started) * 1000
+            self.add(record)
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+            totals = self.totals.setdefault(record['operation'], {
+                'requests': 0, 'errors': 0, 'cache_hits': 0, 'retries': 0,
+                'prompt_tokens': 0, 'completion_tokens': 0
+            })
+            totals['requests'] += 1
+            totals['errors'] += 'error' in record
+            totals['cache_hits'] += bool(record.get('cache_hit'))
+            totals['retries'] += record.get('retries', 0)
+            totals['prompt_tokens'] += record.get('prompt_tokens', 0)
+            totals['completion_tokens'] += record.get('completion_tokens', 0)
+            if not self.log_path:
+                return
+            self.pending.append(json.dumps(record) + '\n')
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_periodically, name='metrics-log', daemon=True)
+                self.writer.start()
+                atexit.register(self.flush)
+
+    def _write_periodically(self):
+        # Waits on an Event that is never set, rather than time.sleep, which tests patch
+        idle = threading.Event()
+        while not idle.wait(self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        """Append the queued log lines to the log file now."""
+        with self.write_lock:
+            lines = []
+            while self.pending:
+                lines.append(self.pending.popleft())
+            if not lines:
+                return
+            if self.log_size is None:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                self.log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+            f = None
+            try:
+                for line in lines:
+                    if self.max_log_bytes and self.log_size >= self.max_log_bytes:
+                        if f is not None:
+                            f.close()
+                            f = None
+                        os.replace(self.log_path, f"{self.log_path}.1")
+                        self.log_size = 0
+                    if f is None:
+                        f = open(self.log_path, 'a', encoding='utf-8')
+                    f.write(line)
+                    self.log_size += len(line.encode('utf-8'))
+            finally:
+                if f is not None:
+                    f.close()
+
+    def summary(self, operation=None, field='latency_ms'):
+        """p50/p95/p99 of ``field`` over the in-memory window (optionally one operation)."""
+        with self.lock:
+            values = sorted(r[field] for r in self.records
+                            if field in r and (operation is None or r['operation'] == operation))
+        return {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99)
+        }
+
+    def last_error(self):
+        with self.lock:
+            for record in reversed(self.records):
+                if not record.get('cache_hit'):
+                    return record.get('error')
+        return None
+
+    def has_requests(self):
+        with self.lock:
+            return any(not record.get('cache_hit') for record in self.records)
+
+    def prometheus_text(self):
+        # Prometheus text exposition format
+        lines = []
+        with self.lock:
+            totals = {op: dict(values) for op, values in self.totals.items()}
+        for name in ['requests', 'errors', 'cache_hits', 'retries', 'prompt_tokens', 'completion_tokens']:
+            lines.append(f"# TYPE openai_{name}_total counter")
+            for operation, values in sorted(totals.items()):
+                lines.append(f'openai_{name}_total{{operation="{operation}"}} {values[name]}')
+        for field in TIMING_FIELDS:
+            metric = f"openai_{field[:-3]}_milliseconds"
+            lines.append(f"# TYPE {metric} summary")
+            for operation in sorted(totals):
+                stats = self.summary(operation, field)
+                if not stats['count']:
+                    continue
+                for q, quantile in (('p50', '0.5'), ('p95', '0.95'), ('p99', '0.99')):
+                    lines.append(f'{metric}{{operation="{operation}",quantile="{quantile}"}} {stats[q]:.3f}')
+                lines.append(f'{metric}_count{{operation="{operation}"}} {stats["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def start_server(self, port, host='127.0.0.1'):
+        """Serve ``prometheus_text`` on http://<host>:<port>/metrics from a daemon thread (once).
+
+        Only local scrapers can reach it unless ``host`` is e.g. '0.0.0.0'.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.prometheus_text().encode('utf-8')
+                self.send_response(200 if self.path == '/metrics' else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.end_headers()
+                if self.path == '/metrics':
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        with self.lock:
+            if self.server is None:
+                self.server = ThreadingHTTPServer((host, port), Handler)
+                threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+
+metrics = RequestMetrics(os.environ.get('METRICS_LOG_PATH', DEFAULT_LOG_PATH),
+                         max_log_bytes=int(os.environ.get('METRICS_LOG_MAX_BYTES') or DEFAULT_LOG_MAX_BYTES))
+
+if os.environ.get('METRICS_PORT'):
+    metrics.start_server(int(os.environ['METRICS_PORT']), host=os.environ.get('METRICS_HOST') or '127.0.0.1')
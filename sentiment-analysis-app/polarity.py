@@ -0,0 +1,35 @@
+import re
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Words that flip or weaken the sentiment of what follows (apostrophes dropped)
+NEGATIONS = frozenset({
+    'not', 'no', 'never', 'none', 'nothing', 'nobody', 'nowhere', 'neither', 'nor', 'without',
+    'hardly', 'barely', 'scarcely', 'cannot', 'cant', 'dont', 'doesnt', 'didnt', 'isnt', 'wasnt',
+    'arent', 'werent', 'wont', 'wouldnt', 'shouldnt', 'couldnt', 'aint', 'hasnt', 'havent', 'hadnt'
+})
+
+# Common sentiment-bearing words; swapping one of them changes the label
+SENTIMENT_WORDS = frozenset({
+    'love', 'loved', 'loves', 'like', 'liked', 'likes', 'enjoy', 'enjoyed', 'hate', 'hated', 'hates',
+    'dislike', 'disliked', 'good', 'great', 'excellent', 'amazing', 'awesome', 'fantastic', 'wonderful',
+    'perfect', 'best', 'better', 'nice', 'happy', 'glad', 'pleased', 'satisfied', 'bad', 'worse', 'worst',
+    'terrible', 'awful', 'horrible', 'poor', 'disappointing', 'disappointed', 'sad', 'unhappy', 'angry',
+    'annoyed', 'furious', 'upset', 'scared', 'afraid', 'worried', 'disgusted', 'disgusting', 'surprised',
+    'shocked', 'clean', 'dirty', 'broken', 'useless', 'fast', 'slow', 'easy', 'recommend', 'recommended'
+})
+
+
+def polarity_words(text):
+    """Negation and sentiment words of ``text``."""
+    words = {word.replace("'", '') for word in WORD_PATTERN.findall(text.lower().replace('\u2019', "'"))}
+    return words & (NEGATIONS | SENTIMENT_WORDS)
+
+
+def polarity_differs(a, b):
+    """True if one text has a negation or sentiment word the other lacks.
+
+    "very happy" and "not very happy", or "I love it" and "I hate it", look
+    alike to a similarity measure but must not share a label.
+    """
+    return polarity_words(a) != polarity_words(b)
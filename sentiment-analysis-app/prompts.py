@@ -0,0 +1,70 @@
+import threading
+from functools import lru_cache
+
+# Static instructions come first and never change, so every request shares a
+# byte-identical prefix that the provider can serve from its prompt cache. The
+# emotion set is appended last, in one canonical spelling.
+SENTIMENT_INSTRUCTIONS = '''You are an emotionally intelligent assistant.
+Classify the sentiment of the user's text with only one of the emotions listed below.
+After classifying the text, respond with the emotion only.'''
+
+BATCH_INSTRUCTIONS = '''You are an emotionally intelligent assistant.
+Classify the sentiment of each numbered text with only one of the emotions listed below.
+Respond with exactly one line per text in the form "<number>: <emotion>", using the same numbers as the input and no other text.'''
+
+
+def parse_emotions(emotions):
+    # Accept either the comma separated string from the UI or a list of labels
+    if isinstance(emotions, str):
+        emotions = emotions.split(',')
+    return [e.strip() for e in emotions if e and e.strip()]
+
+
+@lru_cache(maxsize=256)
+def _compile(instructions, labels):
+    return {"role": "system", "content": f"{instructions}\n\nEmotions: {', '.join(labels)}"}
+
+
+def sentiment_system_message(emotions):
+    # Compiled once per emotion set; "Happy,Sad" and "Happy, Sad" share one prompt
+    return _compile(SENTIMENT_INSTRUCTIONS, tuple(parse_emotions(emotions)))
+
+
+def batch_system_message(emotions):
+    return _compile(BATCH_INSTRUCTIONS, tuple(parse_emotions(emotions)))
+
+
+class PromptUsage:
+    """Running totals of prompt tokens and how many were served from the provider's prompt cache."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage):
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None) or 0
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.cached_tokens += cached
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'cached_tokens': self.cached_tokens,
+                'uncached_tokens': self.prompt_tokens - self.cached_tokens,
+                'cached_ratio': self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            }
+
+
+prompt_usage = PromptUsage()
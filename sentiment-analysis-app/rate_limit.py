@@ -0,0 +1,94 @@
+import random
+import threading
+import time
+
+
+def estimate_tokens(text):
+    # Rough OpenAI tokenizer estimate (~4 characters per token), good enough for budgeting
+    return max(1, len(text) // 4)
+
+
+# backoff_delay and retry_after_seconds are kept in step with the other app's
+# copy (see tests/test_shared_copies.py)
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(error):
+    # Read the Retry-After header from an OpenAI API error, if the server sent one
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute`` tokens a minute."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        # Take ``amount`` tokens now and return how long the caller must wait before using them
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Schedules requests within requests-per-minute and tokens-per-minute budgets.
+
+    A 429 from any worker pauses every worker via ``backoff`` so the pool
+    backs off as a whole instead of each thread hammering the API.
+    """
+
+    def __init__(self, requests_per_minute=3500, tokens_per_minute=90000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        # Returns the seconds spent waiting for budget (the request's queue time)
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        with self.lock:
+            wait = max(wait, self.paused_until - time.monotonic())
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    def backoff(self, delay):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(requests_per_minute=3500, tokens_per_minute=90000):
+    """Process-wide limiter for these budgets.
+
+    The budgets belong to the API key, not to one call, so every caller
+    (CLI chunks, long-text chunks, Streamlit reruns) draws from, and backs
+    off on, the same limiter.
+    """
+    key = (requests_per_minute, tokens_per_minute)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return _limiters[key]
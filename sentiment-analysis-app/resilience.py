@@ -0,0 +1,189 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from metrics import current_request, metrics
+from rate_limit import backoff_delay, retry_after_seconds
+
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast once the API looks degraded.
+
+    After ``failure_threshold`` consecutive retryable failures the circuit
+    opens and calls fail immediately for ``reset_timeout`` seconds. Then a
+    single trial call is let through: success closes the circuit, failure
+    opens it again. A trial that ends any other way (rate limited,
+    interrupted) is released, and the next call becomes the trial.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        # Raises CircuitOpenError while open; returns True if this call is the half-open trial
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                raise CircuitOpenError("OpenAI API circuit is open after repeated failures; try again shortly")
+            self.trial_in_flight = True
+            return True
+
+    def release(self):
+        # End a trial that gave no verdict on the API's health
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+default_breaker = CircuitBreaker()
+
+def is_retryable(error):
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+                          openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def is_rate_limit(error):
+    import openai
+
+    return isinstance(error, openai.RateLimitError)
+
+
+def _start(call, timeout):
+    # Run call(timeout) on its own daemon thread. A shared pool would cap every
+    # hedged call in the process, and attempts queued behind it would count as
+    # slow; a thread is cheap next to an API request.
+    future = Future()
+    future.set_running_or_notify_cancel()
+
+    def run():
+        try:
+            future.set_result(call(timeout))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='hedge', daemon=True).start()
+    return future
+
+
+def _hedged(call, timeout, hedge_after):
+    # Start a duplicate request if the first has not answered within hedge_after
+    # seconds and return whichever finishes first. The loser is left to finish
+    # in the background (the sync client cannot cancel an in-flight request).
+    first = _start(call, timeout)
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    second = _start(call, timeout)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def call_with_resilience(call, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                         hedge_after=None, breaker=default_breaker):
+    """Run ``call(timeout)`` with the circuit breaker, retries and optional hedging.
+
+    Retryable errors (timeouts, connection errors, 429 and 5xx) are retried
+    with jittered exponential backoff, honouring Retry-After; other errors
+    are raised immediately. Only pass ``hedge_after`` for idempotent calls.
+    """
+    for attempt in range(max_attempts):
+        trial = breaker.allow()
+        try:
+            if hedge_after is not None:
+                result = _hedged(call, timeout, hedge_after)
+            else:
+                result = call(timeout)
+        except Exception as e:
+            if not is_retryable(e):
+                # The API answered (e.g. a 400), so it is not degraded
+                breaker.record_success()
+                raise
+            if not is_rate_limit(e):
+                # Rate limiting is back-pressure, not a sign of a degraded API
+                breaker.record_failure()
+            if attempt == max_attempts - 1:
+                raise
+            delay = retry_after_seconds(e) or backoff_delay(attempt, base=0.5, cap=10.0)
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            if trial:
+                # Whatever happened, the trial is over (a no-op after success or failure)
+                breaker.release()
+        record = current_request()
+        if record is not None:
+            record['retries'] += 1
+        time.sleep(delay)
+
+
+def create_completion(client, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS, hedge_after=None,
+                      breaker=default_breaker, **kwargs):
+    # chat.completions.create behind the resilience layer, with a per-call timeout
+    return call_with_resilience(
+        lambda call_timeout: client.chat.completions.create(timeout=call_timeout, **kwargs),
+        timeout=timeout,
+        max_attempts=max_attempts,
+        hedge_after=hedge_after,
+        breaker=breaker
+    )
+
+
+def api_status(breaker=default_breaker):
+    # Status shown in the UI, from the circuit breaker and the last API request
+    state = breaker.state
+    if state == 'open':
+        return "🔴 Circuit open"
+    if state == 'half-open':
+        return "🟠 Recovering"
+    if not metrics.has_requests():
+        return "⚪ No requests yet"
+    if metrics.last_error():
+        return "⚠️ Last request failed"
+    return "✅ Connected"
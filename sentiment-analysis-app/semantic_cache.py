@@ -0,0 +1,322 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+
+from metrics import percentile
+from polarity import polarity_differs
+
+DEFAULT_SEMANTIC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'semantic.sqlite3')
+
+# Cosine similarity above which a stored label is reused; the cache is off
+# unless a threshold is set (SEMANTIC_CACHE_THRESHOLD, the slider or the CLI)
+DEFAULT_THRESHOLD = 0.0
+
+# Suggested threshold when turning the cache on
+SUGGESTED_THRESHOLD = 0.95
+
+# Indexes up to this size are searched exactly; larger ones use LSH
+EXACT_SEARCH_LIMIT = 10000
+
+HASH_DIMENSIONS = 512
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def hashing_embed(texts, dimensions=HASH_DIMENSIONS):
+    """Local embeddings from hashed words and character trigrams.
+
+    Casing, punctuation, emojis and spacing do not change the vector, and a
+    changed word only moves part of it, so near-duplicate texts land close
+    together without an API request. Returns an L2-normalized float32 matrix.
+    """
+    import numpy as np
+
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = WORD_PATTERN.findall(text.lower())
+        joined = f" {' '.join(words)} "
+        features = words + [joined[i:i + 3] for i in range(len(joined) - 2)]
+        for feature in features:
+            vectors[row, zlib.crc32(feature.encode('utf-8')) % dimensions] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def openai_embedder(model):
+    # Embeddings from the API: one request per lookup, but robust to rewording
+    def embed(texts):
+        import numpy as np
+        from client import get_client
+        from resilience import call_with_resilience
+
+        response = call_with_resilience(lambda timeout: get_client().embeddings.create(
+            model=model, input=list(texts), timeout=timeout))
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return embed
+
+
+class VectorIndex:
+    """Nearest-neighbour search over unit vectors.
+
+    Brute force (one matrix-vector product) while small. Past
+    ``exact_limit`` vectors, random-hyperplane LSH narrows the search to the
+    vectors sharing a bucket with the query in any of ``tables`` hash
+    tables, and only those candidates are scored exactly.
+    """
+
+    def __init__(self, dimensions, exact_limit=EXACT_SEARCH_LIMIT, tables=8, bits=12, seed=0):
+        import numpy as np
+
+        self.dimensions = dimensions
+        self.exact_limit = exact_limit
+        self.vectors = np.zeros((64, dimensions), dtype=np.float32)
+        self.size = 0
+        self.planes = np.random.default_rng(seed).standard_normal((tables, bits, dimensions)).astype(np.float32)
+        self.powers = 1 << np.arange(bits)
+        self.buckets = None
+
+    @property
+    def approximate(self):
+        return self.buckets is not None
+
+    def _codes(self, vectors):
+        # One integer bucket code per (vector, table)
+        import numpy as np
+        signs = np.einsum('tbd,nd->ntb', self.planes, vectors) > 0
+        return signs.astype(np.int64) @ self.powers
+
+    def _bucket(self, ids, codes):
+        for i, row in zip(ids, codes):
+            for table, code in enumerate(row):
+                self.buckets[table].setdefault(int(code), []).append(i)
+
+    def add(self, vectors):
+        import numpy as np
+
+        first = self.size
+        needed = first + len(vectors)
+        if needed > len(self.vectors):
+            grown = np.zeros((max(needed, 2 * len(self.vectors)), self.dimensions), dtype=np.float32)
+            grown[:first] = self.vectors[:first]
+            self.vectors = grown
+        self.vectors[first:needed] = vectors
+        self.size = needed
+
+        if self.buckets is not None:
+            self._bucket(range(first, needed), self._codes(vectors))
+        elif self.size > self.exact_limit:
+            self.buckets = [{} for _ in range(len(self.planes))]
+            self._bucket(range(self.size), self._codes(self.vectors[:self.size]))
+        return list(range(first, needed))
+
+    def nearest(self, vector):
+        """(id, cosine similarity) of the closest stored vector, or (None, 0.0)."""
+        import numpy as np
+
+        if not self.size:
+            return None, 0.0
+        if self.buckets is None:
+            scores = self.vectors[:self.size] @ vector
+            best = int(np.argmax(scores))
+            return best, float(scores[best])
+
+        candidates = set()
+        for table, code in enumerate(self._codes(vector[None, :])[0]):
+            candidates.update(self.buckets[table].get(int(code), ()))
+        if not candidates:
+            return None, 0.0
+        ids = np.fromiter(candidates, dtype=np.int64)
+        scores = self.vectors[ids] @ vector
+        best = int(np.argmax(scores))
+        return int(ids[best]), float(scores[best])
+
+
+class SemanticCache:
+    """Reuse labels of near-duplicate texts.
+
+    Texts are embedded and looked up in a per-namespace ``VectorIndex``; the
+    namespace is the model and emotion set, so a label is only reused for
+    the same question. A stored label is returned when the nearest text's
+    cosine similarity reaches ``threshold`` and both texts have the same
+    negation and sentiment words (see ``polarity.py``), since a negated or
+    opposite text can be very similar and still need another label. Texts
+    and vectors persist in SQLite and the indexes are rebuilt from it on
+    startup. ``threshold`` 0 (the default) disables the cache.
+    """
+
+    def __init__(self, path=DEFAULT_SEMANTIC_PATH, threshold=DEFAULT_THRESHOLD, embed=hashing_embed,
+                 embedding_name=f'hashing-{HASH_DIMENSIONS}', exact_limit=EXACT_SEARCH_LIMIT, max_entries=50000):
+        self.path = path
+        self.threshold = threshold
+        self.embed = embed
+        self.embedding_name = embedding_name
+        self.exact_limit = exact_limit
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lookup_ms = deque(maxlen=2000)
+        self.lock = threading.Lock()
+        self.indexes = {}
+        self.labels = {}
+        self.texts = {}
+        self.entries = 0
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS semantic (
+            id INTEGER PRIMARY KEY,
+            embedding TEXT NOT NULL,
+            namespace TEXT NOT NULL,
+            text TEXT NOT NULL,
+            label TEXT NOT NULL,
+            vector BLOB NOT NULL
+        )''')
+        self.conn.commit()
+        self._loaded = False
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def _load(self):
+        # Build the indexes from disk on first use, so importing stays cheap
+        import numpy as np
+
+        if self._loaded:
+            return
+        rows = self.conn.execute('SELECT namespace, text, label, vector FROM semantic WHERE embedding = ? ORDER BY id',
+                                 (self.embedding_name,)).fetchall()
+        grouped = {}
+        for namespace, text, label, vector in rows:
+            grouped.setdefault(namespace, ([], [], []))
+            grouped[namespace][0].append(np.frombuffer(vector, dtype=np.float32))
+            grouped[namespace][1].append(text)
+            grouped[namespace][2].append(label)
+        for namespace, (vectors, texts, labels) in grouped.items():
+            self._index(namespace, np.vstack(vectors), texts, labels)
+        self._loaded = True
+
+    def _index(self, namespace, vectors, texts, labels):
+        index = self.indexes.get(namespace)
+        if index is None:
+            index = self.indexes[namespace] = VectorIndex(vectors.shape[1], exact_limit=self.exact_limit)
+            self.texts[namespace] = []
+            self.labels[namespace] = []
+        index.add(vectors)
+        self.texts[namespace].extend(texts)
+        self.labels[namespace].extend(labels)
+        self.entries += len(labels)
+
+    def _embed(self, text):
+        # The cache only saves requests, so a failing embedder counts as a miss
+        try:
+            return self.embed([text])[0]
+        except Exception as e:
+            print(f"Semantic cache embedding failed: {e}")
+            return None
+
+    def threshold_for(self, threshold=None):
+        # A caller's own threshold (e.g. one Streamlit session's slider), else the cache's
+        return self.threshold if threshold is None else threshold
+
+    def get(self, namespace, text, threshold=None):
+        """Label of the most similar stored text if it is similar enough, else None.
+
+        ``threshold`` overrides the cache's threshold for this lookup only.
+        """
+        threshold = self.threshold_for(threshold)
+        if threshold <= 0:
+            return None
+        started = time.perf_counter()
+        vector = self._embed(text)
+        with self.lock:
+            self._load()
+            label = None
+            index = self.indexes.get(namespace)
+            if index is not None and vector is not None:
+                best, score = index.nearest(vector)
+                if best is not None and score >= threshold \
+                        and not polarity_differs(text, self.texts[namespace][best]):
+                    label = self.labels[namespace][best]
+            if label is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.lookup_ms.append((time.perf_counter() - started) * 1000)
+        return label
+
+    def set(self, namespace, text, label):
+        vector = self._embed(text)
+        if vector is None:
+            return
+        with self.lock:
+            self._load()
+            if self.entries >= self.max_entries:
+                return
+            self.conn.execute(
+                'INSERT INTO semantic (embedding, namespace, text, label, vector) VALUES (?, ?, ?, ?, ?)',
+                (self.embedding_name, namespace, text, label, vector.tobytes())
+            )
+            self.conn.commit()
+            self._index(namespace, vector[None, :], [text], [label])
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM semantic')
+            self.conn.commit()
+            self.indexes = {}
+            self.texts = {}
+            self.labels = {}
+            self.entries = 0
+            self.hits = 0
+            self.misses = 0
+            self.lookup_ms.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            latencies = sorted(self.lookup_ms)
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': self.entries,
+                'approximate': any(index.approximate for index in self.indexes.values()),
+                'threshold': self.threshold,
+                'lookup_p50_ms': percentile(latencies, 50),
+                'lookup_p95_ms': percentile(latencies, 95)
+            }
+
+
+def semantic_namespace(emotions, model):
+    return json.dumps([model, emotions], separators=(',', ':'))
+
+
+_default_semantic_cache = None
+_default_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Process-wide semantic cache, shared by every caller and Streamlit rerun.
+
+    The cache is off unless SEMANTIC_CACHE_THRESHOLD sets a similarity
+    threshold (e.g. ``SUGGESTED_THRESHOLD``), and SEMANTIC_CACHE_EMBEDDINGS names an OpenAI
+    embedding model to use instead of the local hashing embeddings.
+    """
+    global _default_semantic_cache
+    with _default_semantic_cache_lock:
+        if _default_semantic_cache is None:
+            threshold = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', DEFAULT_THRESHOLD) or 0)
+            embedding_model = os.environ.get('SEMANTIC_CACHE_EMBEDDINGS')
+            options = {'embed': openai_embedder(embedding_model), 'embedding_name': embedding_model} \
+                if embedding_model else {}
+            _default_semantic_cache = SemanticCache(
+                os.environ.get('SEMANTIC_CACHE_PATH', DEFAULT_SEMANTIC_PATH), threshold=threshold, **options)
+        return _default_semantic_cache
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import batch_job
+from batch_job import parse_results, state_path
+
+LABELS = ['Happy', 'Sad']
+
+
+def output_line(custom_id, content, status_code=200):
+    body = {'choices': [{'message': {'content': content}}]} if status_code == 200 else {'error': {}}
+    return json.dumps({'custom_id': custom_id, 'response': {'status_code': status_code, 'body': body}})
+
+
+def test_parse_results_keeps_only_labels():
+    content = '\n'.join([
+        output_line('1', 'Happy'),
+        output_line('2', ' sad.'),
+        output_line('3', 'The text sounds a bit melancholic'),
+        output_line('4', ''),
+        output_line('5', 'Happy', status_code=500),
+    ])
+    assert parse_results(content, LABELS) == {'1': 'Happy', '2': 'Sad'}
+
+
+def test_submit_refuses_while_batches_are_uncollected(tmp_path, monkeypatch):
+    source = tmp_path / 'reviews.jsonl'
+    source.write_text('{"text": "great"}\n')
+    output = str(tmp_path / 'labelled.jsonl')
+    with open(state_path(output), 'w') as f:
+        json.dump({'batches': [{'id': 'batch_1', 'collected': True}, {'id': 'batch_2'}]}, f)
+    monkeypatch.setattr(batch_job, 'get_client', lambda: pytest.fail("nothing may be submitted"))
+
+    with pytest.raises(SystemExit, match='batch_2'):
+        batch_job.main(['submit', str(source), '-o', output])
+    assert json.load(open(state_path(output)))['batches'][1] == {'id': 'batch_2'}
+
+
+def test_malformed_lines_do_not_lose_the_batch(capsys):
+    content = '\n'.join([
+        output_line('1', 'Happy'),
+        json.dumps({'custom_id': '2', 'response': {'status_code': 200, 'body': {}}}),
+        json.dumps({'custom_id': '3', 'response': {'status_code': 200, 'body': {'choices': []}}}),
+        json.dumps({'response': {'status_code': 200, 'body': {'choices': [{'message': {'content': 'Sad'}}]}}}),
+        '{not json',
+        output_line('6', 'Sad'),
+    ])
+    assert parse_results(content, LABELS) == {'1': 'Happy', '6': 'Sad'}
+    assert capsys.readouterr().err.count('Skipping malformed batch output line') == 4
+
+
+def test_resubmit_skips_rows_already_labelled(tmp_path, monkeypatch):
+    source = tmp_path / 'reviews.jsonl'
+    source.write_text('{"text": "great"}\n{"text": "awful"}\n{"text": "fine"}\n')
+    output = tmp_path / 'labelled.jsonl'
+    # A collected earlier run at temperature 0.7, which the response cache does not hold
+    output.write_text('{"text": "great", "emotion": "Happy"}\n{"text": "awful", "emotion": "N/A"}\n'
+                      '{"text": "fine", "emotion": "Happy"}\n')
+    args = ['submit', str(source), '-o', str(output), '--emotions', 'Happy, Sad', '--temperature', '0.7']
+    state = {field: value for field, value in vars(batch_job.build_parser().parse_args(args)).items()
+             if field in batch_job.JOB_FIELDS}
+    state.update(input=str(source), batches=[{'id': 'batch_1', 'collected': True}])
+    with open(state_path(str(output)), 'w') as f:
+        json.dump(state, f)
+
+    uploaded = []
+
+    class Client:
+        class files:
+            @staticmethod
+            def create(file, purpose, timeout):
+                uploaded.extend(json.loads(line)['custom_id'] for line in file)
+                return type('File', (), {'id': 'file_2'})
+
+        class batches:
+            @staticmethod
+            def create(**kwargs):
+                return type('Batch', (), {'id': 'batch_2'})
+
+    monkeypatch.setattr(batch_job, 'get_client', Client)
+    assert batch_job.main(args) == 0
+    assert uploaded == ['1']
+    assert [batch['id'] for batch in json.load(open(state_path(str(output))))['batches']] == ['batch_1', 'batch_2']
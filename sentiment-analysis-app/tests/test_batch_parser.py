@@ -0,0 +1,29 @@
+import pytest
+
+from classifier import parse_batch_response
+
+LABELS = ['Happy', 'Sad', 'Neutral']
+
+
+def test_numbered_lines():
+    content = "1: Happy\n2) sad\n[3] - Neutral."
+    assert parse_batch_response(content, {1, 2, 3}, LABELS) == {1: 'Happy', 2: 'Sad', 3: 'Neutral'}
+
+
+def test_unexpected_duplicate_and_invalid_rows_are_dropped():
+    content = "1: Happy\n1: Sad\n2: Furious\n7: Sad\nSure, here you go:"
+    assert parse_batch_response(content, {1, 2}, LABELS) == {1: 'Happy'}
+
+
+@pytest.mark.parametrize('content', ["Happy", "happy.", " \"Happy\"\n", "1: Happy"])
+def test_single_text_accepts_a_bare_label(content):
+    assert parse_batch_response(content, {1}, LABELS) == {1: 'Happy'}
+
+
+def test_single_text_rejects_free_text():
+    assert parse_batch_response("I think it is happy", {1}, LABELS) == {}
+    assert parse_batch_response(None, {1}, LABELS) == {}
+
+
+def test_bare_label_is_ambiguous_for_several_texts():
+    assert parse_batch_response("Happy", {1, 2}, LABELS) == {}
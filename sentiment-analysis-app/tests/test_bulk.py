@@ -0,0 +1,53 @@
+import csv
+
+from bulk import OUTPUT_COLUMNS, run_bulk_job, truncate_partial_row
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row for row in csv.DictReader(f)]
+
+
+def write_output(path, rows, tail=''):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_COLUMNS)
+        writer.writerows(rows)
+        f.write(tail)
+
+
+def test_resume_drops_a_half_written_row(tmp_path):
+    output = str(tmp_path / 'out.csv')
+    write_output(output, [[0, 'good', 'Happy']], tail='1,"bad day\nall ')
+
+    summary = run_bulk_job([(0, ['good', 'bad day\nall day'])], 2, output, lambda texts: ['Sad'] * len(texts))
+
+    assert summary['resumed_from'] == 1
+    assert [(row['row_id'], row['text'], row['emotion']) for row in read_rows(output)] == [
+        ('0', 'good', 'Happy'), ('1', 'bad day\nall day', 'Sad')]
+
+
+def test_truncate_keeps_complete_rows_with_line_breaks(tmp_path):
+    output = str(tmp_path / 'out.csv')
+    write_output(output, [[0, 'line one\nline "two"', 'Happy']])
+    size = (tmp_path / 'out.csv').stat().st_size
+    truncate_partial_row(output)
+    assert (tmp_path / 'out.csv').stat().st_size == size
+
+
+def test_empty_rows_are_skipped_not_failed(tmp_path):
+    output = str(tmp_path / 'out.csv')
+    calls = []
+
+    def classify(texts):
+        calls.append(texts)
+        return ['Happy'] * len(texts)
+
+    first = run_bulk_job([(0, ['great', '', '   '])], 3, output, classify)
+    assert (first['done'], first['skipped'], first['failed']) == (3, 2, 0)
+    assert calls == [['great']]
+
+    # Nothing is left to retry
+    second = run_bulk_job([(0, ['great', '', '   '])], 3, output, classify)
+    assert (second['resumed_from'], second['skipped'], second['failed']) == (3, 2, 0)
+    assert len(calls) == 1
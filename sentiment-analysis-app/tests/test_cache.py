@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from cache import ResponseCache, request_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_key_ignores_field_order():
+    assert request_key({'model': 'a', 'text': 'b'}) == request_key({'text': 'b', 'model': 'a'})
+    assert request_key({'model': 'a', 'text': 'b'}) != request_key({'model': 'a', 'text': 'c'})
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    responses = ResponseCache(':memory:', max_entries=2)
+    responses.set({'n': 1}, 'one')
+    clock.value += 1
+    responses.set({'n': 2}, 'two')
+    clock.value += 1
+    assert responses.get({'n': 1}) == 'one'
+    clock.value += 1
+    responses.set({'n': 3}, 'three')
+
+    assert responses.get({'n': 2}) is None
+    assert responses.get({'n': 1}) == 'one'
+    assert responses.get({'n': 3}) == 'three'
+    assert responses.stats()['entries'] == 2
+
+
+def test_expired_entries_are_misses(clock):
+    responses = ResponseCache(':memory:', ttl_seconds=60)
+    responses.set({'n': 1}, 'one')
+    clock.value += 59
+    assert responses.get({'n': 1}) == 'one'
+    clock.value += 2
+    assert responses.get({'n': 1}) is None
+    assert responses.stats()['entries'] == 0
+
+
+def test_hit_and_miss_counters():
+    responses = ResponseCache(':memory:')
+    responses.set({'n': 1}, 'one')
+    responses.get({'n': 1})
+    responses.get({'n': 1})
+    responses.get({'n': 2})
+    assert responses.stats() == {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3, 'entries': 1}
+
+    responses.clear()
+    assert responses.stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'entries': 0}
@@ -0,0 +1,56 @@
+import chunking
+from chunking import aggregate_labels, classify_long_text, split_text
+from rate_limit import estimate_tokens
+
+
+def test_chunks_stay_within_the_budget():
+    text = '\n\n'.join(['Short paragraph.', 'word ' * 400, 'x' * 3000, 'https://example.com/' + 'a' * 2000])
+    chunks = split_text(text, max_tokens=100)
+    assert chunks
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+
+def test_cjk_text_is_split_at_sentence_ends():
+    sentence = '今天的天气非常好我们去公园散步了。'
+    chunks = split_text(sentence * 100, max_tokens=20)
+    assert all(estimate_tokens(chunk) <= 20 for chunk in chunks)
+    # Cuts fall on sentence ends when sentences fit the budget
+    assert all(chunk.endswith('。') for chunk in chunks)
+
+
+def test_chunks_cover_the_text_without_overlap():
+    sentences = [f"Sentence number {i} is here." for i in range(60)]
+    chunks = split_text(' '.join(sentences), max_tokens=30)
+    assert len(chunks) > 1
+    assert ' '.join(chunks).split() == ' '.join(sentences).split()
+
+
+def test_short_text_is_one_chunk():
+    assert split_text('One small review.') == ['One small review.']
+    assert split_text('') == []
+
+
+def test_aggregation_weights_and_ties():
+    chunks = [{'label': 'Happy', 'tokens': 10, 'confidence': 0.5},
+              {'label': 'Sad', 'tokens': 5, 'confidence': 1.0},
+              {'label': 'Sad', 'tokens': 5, 'confidence': 1.0},
+              {'label': 'N/A', 'tokens': 100, 'confidence': None}]
+    assert aggregate_labels(chunks, 'majority') == ('Sad', {'Sad': 2 / 3, 'Happy': 1 / 3})
+    # A tie goes to the label seen first
+    assert aggregate_labels(chunks, 'length') == ('Happy', {'Happy': 0.5, 'Sad': 0.5})
+    assert aggregate_labels(chunks, 'confidence')[0] == 'Sad'
+    assert aggregate_labels(chunks[3:]) == ('N/A', {})
+
+
+def test_classify_long_text_passes_the_limiter(monkeypatch):
+    seen = []
+
+    def classify_with_confidence(chunk, emotions, model, temperature, limiter):
+        seen.append(limiter)
+        return 'Happy', 0.9, {'Happy': 0.9}
+
+    monkeypatch.setattr(chunking, 'classify_with_confidence', classify_with_confidence)
+    limiter = object()
+    result = classify_long_text('Good. ' * 200, 'Happy, Sad', chunk_tokens=50, method='confidence', limiter=limiter)
+    assert result['label'] == 'Happy' and len(result['chunks']) > 1
+    assert seen and all(item is limiter for item in seen)
@@ -0,0 +1,12 @@
+import io
+
+from cli import iter_records
+
+
+def test_non_object_lines_are_skipped(capsys):
+    lines = io.StringIO('{"text": "good"}\n[1, 2]\nnot json\n"just a string"\n\n{"text": "bad"}\n')
+    assert list(iter_records(lines, 'jsonl')) == [{'text': 'good'}, {'text': 'bad'}]
+    errors = capsys.readouterr().err
+    assert 'line 2: expected a JSON object, got list' in errors
+    assert 'invalid JSON on line 3' in errors
+    assert 'line 4: expected a JSON object, got str' in errors
@@ -0,0 +1,27 @@
+import compare
+
+
+def fake_request(answers):
+    def request_sentiment(client, text, emotions, model, *args, **kwargs):
+        answer = answers[model]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return request_sentiment
+
+
+def test_na_label_is_not_an_error(monkeypatch):
+    monkeypatch.setattr(compare, 'get_client', lambda: None)
+    monkeypatch.setattr(compare, 'request_sentiment', fake_request({'a': 'N/A', 'b': TimeoutError()}))
+    comparison = compare.compare_models(['one', 'two'], 'Happy, Sad, N/A', ['a', 'b'])
+    assert comparison['models']['a']['errors'] == 0
+    assert comparison['models']['b']['errors'] == 2
+
+
+def test_empty_input(monkeypatch, capsys):
+    monkeypatch.setattr(compare, 'get_client', lambda: None)
+    comparison = compare.compare_models([], 'Happy, Sad', ['a', 'b'])
+    assert comparison['agreement'] == {('a', 'b'): None}
+    assert comparison['consensus'] is None
+    compare.print_report(comparison)
+    assert 'all models agree: -' in capsys.readouterr().out
@@ -0,0 +1,63 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+import constraints
+from constraints import label_constraints, label_distribution, resolve_label
+
+
+class FakeEncoding:
+    # One token per word piece: 'Happy' -> [1], ' Happy' -> [2], ...
+    vocabulary = {'Happy': 1, ' Happy': 2, 'Sad': 3, ' Sad': 4, 'Sur': 5, ' Sur': 6, 'prised': 7}
+
+    def encode(self, text):
+        if text.strip() == 'Surprised':
+            return [self.vocabulary[text[:-6]], self.vocabulary['prised']]
+        return [self.vocabulary[text]]
+
+
+@pytest.fixture(autouse=True)
+def fresh_constraints():
+    label_constraints.cache_clear()
+    yield
+    label_constraints.cache_clear()
+
+
+def test_label_tokens_are_biased(monkeypatch):
+    monkeypatch.setattr(constraints, '_encoding_for', lambda model: FakeEncoding())
+    bias, max_tokens = label_constraints(('Happy', 'Sad', 'Surprised'), 'gpt-3.5-turbo')
+    assert bias == {str(token): constraints.LABEL_TOKEN_BIAS for token in range(1, 8)}
+    assert max_tokens == 2
+
+
+def test_without_tiktoken_output_is_only_capped(monkeypatch):
+    monkeypatch.setattr(constraints, '_encoding_for', lambda model: None)
+    bias, max_tokens = label_constraints(('Happy', 'Surprised'), 'gpt-3.5-turbo')
+    assert bias is None and max_tokens >= 2
+
+
+def test_resolve_label():
+    labels = ('Happy', 'Sad', 'Surprised')
+    assert resolve_label(' "happy". ', labels) == 'Happy'
+    assert resolve_label('Surprised!', labels) == 'Surprised'
+    assert resolve_label('Confused', labels) is None
+    assert resolve_label(None, labels) is None
+
+
+def logprob(token, probability):
+    return SimpleNamespace(token=token, logprob=math.log(probability))
+
+
+def test_distribution_is_normalized_over_labels():
+    labels = ('Happy', 'Sad', 'Surprised')
+    distribution = label_distribution(
+        [logprob('Happy', 0.5), logprob(' S', 0.2), logprob('Sad', 0.1), logprob('Meh', 0.2)], labels)
+    # 'S' is shared by Sad and Surprised; 'Meh' matches no label and is left out
+    assert distribution == pytest.approx({'Happy': 0.625, 'Sad': 0.25, 'Surprised': 0.125})
+    assert list(distribution) == ['Happy', 'Sad', 'Surprised']
+    assert sum(distribution.values()) == pytest.approx(1.0)
+
+
+def test_unknown_tokens_give_no_distribution():
+    assert label_distribution([logprob('Meh', 0.9), logprob(' ', 0.1)], ('Happy', 'Sad')) == {}
@@ -0,0 +1,34 @@
+import pytest
+
+from dedup import deduplicate, near_duplicate_groups, normalize_text
+
+
+def test_normalize_text():
+    assert normalize_text("  Great   phone!!!  ") == normalize_text("great phone!")
+    assert normalize_text("It’s fine — really") == "it's fine - really"
+
+
+def test_exact_duplicates_share_a_representative():
+    groups = deduplicate(["Great phone!", "great   phone!!", "", "Bad phone"])
+    assert groups['representatives'] == [0, 3]
+    assert groups['assignments'] == [0, 0, None, 1]
+    assert groups['exact_duplicates'] == 1
+
+
+def test_near_duplicates_are_grouped():
+    texts = ["The room was clean and the staff were friendly and helpful all week long",
+             "The room was clean and the staff were friendly and helpful all week long :)"]
+    assert deduplicate(texts, near_duplicates=True)['near_duplicates'] == 1
+
+
+@pytest.mark.parametrize('a, b', [
+    ("The room was clean and the staff were friendly and helpful all week long",
+     "The room was not clean and the staff were friendly and helpful all week long"),
+    ("Absolutely loved the hotel, the breakfast was great and the pool was warm",
+     "Absolutely loved the hotel, the breakfast was not great and the pool was warm"),
+    ("I love this phone, the battery lasts all day and the screen is sharp",
+     "I hate this phone, the battery lasts all day and the screen is sharp"),
+])
+def test_negated_and_opposite_texts_are_not_grouped(a, b):
+    first, second = near_duplicate_groups([normalize_text(a), normalize_text(b)])
+    assert first != second
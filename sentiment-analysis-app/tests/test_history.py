@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+import history as history_module
+from history import BUCKET_SECONDS, AnalysisHistory
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=10 * BUCKET_SECONDS)
+    monkeypatch.setattr(history_module, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def entry(text, result, model='gpt-3.5-turbo', source='gpt'):
+    return {'timestamp': '2024-01-01 12:00:00', 'text': text, 'emotions': 'Happy, Sad', 'result': result,
+            'model': model, 'source': source}
+
+
+def test_counters_follow_every_add():
+    history = AnalysisHistory(':memory:')
+    history.add('alice', entry('good', 'Happy'))
+    history.add('alice', entry('fine', 'Happy', source='local', model='local-model'))
+    assert history.add('alice', entry('bad', 'Sad')) == 3
+    history.add('bob', entry('meh', 'Sad'))
+
+    assert history.counts('alice', 'result') == {'Happy': 2, 'Sad': 1}
+    assert history.counts('alice', 'model') == {'gpt-3.5-turbo': 2, 'local-model': 1}
+    assert history.counts('alice', 'source') == {'gpt': 2, 'local': 1}
+    assert history.count('alice') == 3 and history.count('bob') == 1
+
+    history.clear('alice')
+    assert history.count('alice') == 0 and history.counts('alice', 'result') == {}
+    assert history.count('bob') == 1
+
+
+def test_pages_are_newest_first_and_numbered():
+    history = AnalysisHistory(':memory:')
+    for i in range(5):
+        history.add('alice', entry(f'text {i}', 'Happy'))
+
+    first, second, third = (history.page('alice', page, page_size=2) for page in range(3))
+    assert [(row['number'], row['text']) for row in first] == [(5, 'text 4'), (4, 'text 3')]
+    assert [(row['number'], row['text']) for row in second] == [(3, 'text 2'), (2, 'text 1')]
+    assert [(row['number'], row['text']) for row in third] == [(1, 'text 0')]
+    assert history.page('alice', 3, page_size=2) == []
+
+
+def test_timeline_sums_hourly_buckets(clock):
+    history = AnalysisHistory(':memory:')
+    start = clock.value
+    history.add('alice', entry('a', 'Happy'))
+    clock.value += 60
+    history.add('alice', entry('b', 'Happy'))
+    clock.value += BUCKET_SECONDS
+    history.add('alice', entry('c', 'Sad'))
+
+    assert history.timeline('alice') == [(start, 'Happy', 2), (start + BUCKET_SECONDS, 'Sad', 1)]
+    day = 24 * BUCKET_SECONDS
+    assert sorted(history.timeline('alice', bucket_seconds=day)) == [(start // day * day, 'Happy', 2),
+                                                                     (start // day * day, 'Sad', 1)]
@@ -0,0 +1,28 @@
+import classifier
+from local_model import LocalSentimentModel
+
+
+def trained_model():
+    # Skewed so the class prior alone would be confident
+    texts = ['great happy day'] * 30 + ['awful sad day'] * 2
+    labels = ['Happy'] * 30 + ['Sad'] * 2
+    return LocalSentimentModel(min_examples=10).fit(texts, labels)
+
+
+def test_known_tokens_are_predicted():
+    label, confidence = trained_model().predict('a great day')
+    assert label == 'Happy' and confidence > 0.9
+
+
+def test_unknown_or_empty_text_is_not_predicted():
+    model = trained_model()
+    assert model.predict('') == (None, 0.0)
+    assert model.predict('zxq qqv') == (None, 0.0)
+
+
+def test_unknown_text_escalates_to_the_api(monkeypatch):
+    calls = []
+    monkeypatch.setattr(classifier, 'gpt_classify_sentiment',
+                        lambda prompt, emotions, **kwargs: calls.append(prompt) or 'Sad')
+    label, source, _, _ = classifier.classify_with_fallback('zxq qqv', 'Happy, Sad', trained_model(), threshold=0.5)
+    assert (label, source, calls) == ('Sad', 'gpt', ['zxq qqv'])
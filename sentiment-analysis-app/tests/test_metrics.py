@@ -0,0 +1,67 @@
+import json
+import threading
+import time
+import urllib.request
+
+from metrics import RequestMetrics
+
+
+def test_log_directory_is_created_on_first_write(tmp_path):
+    path = tmp_path / 'logs' / 'metrics.jsonl'
+    metrics = RequestMetrics(str(path))
+    assert not path.parent.exists()
+
+    with metrics.track('classify'):
+        pass
+    metrics.flush()
+    assert json.loads(path.read_text())['operation'] == 'classify'
+
+
+def test_log_is_rotated_at_the_size_cap(tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    metrics = RequestMetrics(str(path), max_log_bytes=1000)
+    for _ in range(30):
+        with metrics.track('classify', model='gpt-3.5-turbo'):
+            pass
+    metrics.flush()
+
+    rotated = tmp_path / 'metrics.jsonl.1'
+    assert rotated.exists()
+    assert path.stat().st_size < 1000 + 200
+    assert rotated.stat().st_size < 1000 + 200
+    lines = rotated.read_text().splitlines() + path.read_text().splitlines()
+    assert all(json.loads(line)['operation'] == 'classify' for line in lines)
+
+
+def test_requests_only_queue_the_log_line(tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    metrics = RequestMetrics(str(path), flush_seconds=60)
+    with metrics.track('classify'):
+        pass
+    assert not path.exists() and len(metrics.pending) == 1
+    metrics.flush()
+    assert json.loads(path.read_text())['operation'] == 'classify'
+
+
+def test_queued_lines_are_written_in_the_background(tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    metrics = RequestMetrics(str(path), flush_seconds=0.01)
+    with metrics.track('classify'):
+        pass
+    deadline = time.monotonic() + 5
+    while not (path.exists() and path.read_text()) and time.monotonic() < deadline:
+        threading.Event().wait(0.01)
+    assert json.loads(path.read_text())['operation'] == 'classify'
+
+
+def test_server_binds_localhost_by_default():
+    metrics = RequestMetrics('')
+    server = metrics.start_server(0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            assert b'openai_requests_total' in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
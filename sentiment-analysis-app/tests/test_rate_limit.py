@@ -0,0 +1,39 @@
+import classifier
+from rate_limit import RateLimiter, get_rate_limiter
+
+
+def test_one_limiter_per_budget_per_process():
+    assert get_rate_limiter(60, 1000) is get_rate_limiter(60, 1000)
+    assert get_rate_limiter(60, 1000) is not get_rate_limiter(120, 1000)
+
+
+def test_consecutive_calls_share_the_budget(monkeypatch):
+    limiters = []
+    acquire = RateLimiter.acquire
+
+    def tracking_acquire(self, tokens=0):
+        limiters.append(self)
+        return acquire(self, tokens)
+
+    monkeypatch.setattr(classifier, 'get_client', lambda: None)
+    monkeypatch.setattr(classifier, 'request_sentiment', lambda *args, **kwargs: 'Happy')
+    monkeypatch.setattr(classifier, 'store_sentiment', lambda *args: None)
+    monkeypatch.setattr(RateLimiter, 'acquire', tracking_acquire)
+
+    # Like the CLI, one call per chunk (temperature 0.5 skips the caches)
+    for chunk in (['good day'], ['bad day'], ['fine day']):
+        classifier.classify_concurrent(chunk, 'Happy, Sad', temperature=0.5)
+    assert len(limiters) == 3
+    assert all(limiter is limiters[0] for limiter in limiters)
+
+
+def test_injected_limiter_is_used(monkeypatch):
+    limiter = RateLimiter(60, 1000)
+    monkeypatch.setattr(classifier, 'get_client', lambda: None)
+    monkeypatch.setattr(classifier, 'request_sentiment', lambda *args, **kwargs: 'Sad')
+    monkeypatch.setattr(classifier, 'store_sentiment', lambda *args: None)
+
+    assert classifier.classify_concurrent(['rain again', 'lost my keys'], 'Happy, Sad', temperature=0.5,
+                                          limiter=limiter) == ['Sad', 'Sad']
+    # Two requests were taken from the injected limiter's 60 a minute
+    assert limiter.requests.tokens < 59
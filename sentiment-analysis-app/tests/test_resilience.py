@@ -0,0 +1,132 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openai
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+
+def api_error(status):
+    response = httpx.Response(status, request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+    error_class = openai.RateLimitError if status == 429 else openai.InternalServerError
+    return error_class(f"HTTP {status}", response=response, body=None)
+
+
+def failing(error):
+    def call(timeout):
+        raise error
+    return call
+
+
+def ok(timeout):
+    return 'ok'
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience.time, 'sleep', lambda seconds: None)
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=2, breaker=breaker)
+    assert breaker.state == 'open'
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(lambda timeout: calls.append(timeout), breaker=breaker)
+    assert calls == []
+
+
+def test_trial_success_closes_and_trial_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=1, breaker=breaker)
+    assert breaker.state == 'half-open'
+
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=1, breaker=breaker)
+    assert breaker.opened_at is not None and not breaker.trial_in_flight
+
+    assert call_with_resilience(ok, breaker=breaker) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_only_one_trial_at_a_time():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_rate_limited_trial_is_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(openai.InternalServerError):
+        call_with_resilience(failing(api_error(500)), max_attempts=1, breaker=breaker)
+    with pytest.raises(openai.RateLimitError):
+        call_with_resilience(failing(api_error(429)), max_attempts=1, breaker=breaker)
+
+    for _ in range(3):
+        assert call_with_resilience(ok, breaker=breaker) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_interrupted_trial_is_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    with pytest.raises(KeyboardInterrupt):
+        call_with_resilience(failing(KeyboardInterrupt()), breaker=breaker)
+    assert not breaker.trial_in_flight
+    assert call_with_resilience(ok, breaker=breaker) == 'ok'
+
+
+def test_non_retryable_error_is_raised_without_retry():
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_with_resilience(call, breaker=CircuitBreaker())
+    assert len(calls) == 1
+
+
+def test_hedged_calls_are_not_capped_process_wide():
+    # More concurrent callers than any fixed pool: every first attempt must start at once
+    callers = 40
+    started = threading.Barrier(callers, timeout=5)
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        started.wait()
+        return 'ok'
+
+    breaker = CircuitBreaker()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(lambda _: call_with_resilience(call, hedge_after=10, breaker=breaker),
+                                range(callers)))
+    assert results == ['ok'] * callers
+    assert len(calls) == callers
+
+
+def test_slow_call_is_hedged():
+    slow = threading.Event()
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            slow.wait(5)
+            return 'slow'
+        return 'fast'
+
+    assert call_with_resilience(call, hedge_after=0.05, breaker=CircuitBreaker()) == 'fast'
+    slow.set()
+    assert len(calls) == 2
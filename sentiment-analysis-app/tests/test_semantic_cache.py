@@ -0,0 +1,60 @@
+import pytest
+
+from polarity import polarity_differs
+from semantic_cache import SUGGESTED_THRESHOLD, SemanticCache
+
+NAMESPACE = 'gpt-3.5-turbo'
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(':memory:', threshold=0.92)
+
+
+def test_off_by_default():
+    assert not SemanticCache(':memory:').enabled
+
+
+def test_reuses_label_of_near_duplicate(cache):
+    cache.set(NAMESPACE, "I am very happy with this phone!", 'Happy')
+    assert cache.get(NAMESPACE, "i am very happy with this phone 😀") == 'Happy'
+
+
+@pytest.mark.parametrize('threshold', [0.92, SUGGESTED_THRESHOLD])
+@pytest.mark.parametrize('stored, query', [
+    ("I am very happy with this phone.", "I am not very happy with this phone."),
+    ("I love this phone", "I hate this phone"),
+    ("The room was clean", "The room wasn't clean"),
+    ("Great service, would recommend", "Great service, would never recommend"),
+])
+def test_negated_and_opposite_texts_miss(stored, query, threshold):
+    cache = SemanticCache(':memory:', threshold=threshold)
+    cache.set(NAMESPACE, stored, 'Happy')
+    assert cache.get(NAMESPACE, query) is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_guard_survives_reload(tmp_path):
+    path = str(tmp_path / 'semantic.sqlite3')
+    SemanticCache(path, threshold=0.92).set(NAMESPACE, "I love this phone", 'Happy')
+    reloaded = SemanticCache(path, threshold=0.92)
+    assert reloaded.get(NAMESPACE, "I hate this phone") is None
+    assert reloaded.get(NAMESPACE, "I LOVE this phone!!") == 'Happy'
+
+
+def test_threshold_per_call_leaves_the_shared_cache_alone():
+    cache = SemanticCache(':memory:')
+    cache.set(NAMESPACE, "I am very happy with this phone!", 'Happy')
+    assert cache.get(NAMESPACE, "i am very happy with this phone 😀") is None
+    assert cache.get(NAMESPACE, "i am very happy with this phone 😀", threshold=0.92) == 'Happy'
+    assert cache.threshold == 0 and not cache.enabled
+
+    strict = SemanticCache(':memory:', threshold=0.92)
+    strict.set(NAMESPACE, "I am very happy with this phone!", 'Happy')
+    assert strict.get(NAMESPACE, "i am very happy with this phone 😀", threshold=0) is None
+
+
+def test_polarity_differs():
+    assert polarity_differs("very happy", "not very happy")
+    assert polarity_differs("I don’t like it", "I like it")
+    assert not polarity_differs("Great phone!!", "great phone")